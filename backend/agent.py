@@ -1,16 +1,25 @@
-import json
+import metrics  # imported first so it can time the remaining imports
 import os
+import sys
 import openai
-import logging
 import asyncio
+import random
 import pandas as pd
 from dotenv import load_dotenv
-from pydantic_ai import Agent, RunContext, ModelRetry
-from pydantic_ai.messages import ModelMessage
-from pydantic import BaseModel
-from typing import List, Union
-from dataclasses import dataclass
+from typing import List
+from pydantic_ai.usage import Usage
 import logfire
+from repair import log_repair_stats
+from events import EVENTS_ENABLED, RecipeEventEmitter
+from step_timing import recipe_timing
+from logging_setup import configure_logging
+from mock_model import MOCK_MODEL_ENABLED
+from profiling import profile_request, request_id
+from deadline import run_until_deadline
+from result_channel import build_result, new_ingredients, result_channel_enabled, write_result
+from recipe_store import STORE_FIRST, get_store
+from engine import Deps, NoRecipeFound, RecipeDetails, activate_variant, get_engine  # noqa: F401 (re-exported)
+from variants import DEFAULT_VARIANT, VARIANTS, choose_variant
 
 logfire.configure()
 
@@ -18,74 +27,16 @@ logfire.configure()
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-if not openai.api_key:
+if not openai.api_key and not MOCK_MODEL_ENABLED:
     raise EnvironmentError("OPENAI_API_KEY not found. Please set it in environment variables.")
 
-# Configure logging with rotation
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("recipe_generation.log"),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger()
-
-# Recipe Details Model
-class RecipeDetails(BaseModel):
-    recipe_name: str
-    ingredients: List[str]
-    steps: List[str]
-    step_times: List[str]
-
-class NoRecipeFound(BaseModel):
-    pass
-
-@dataclass
-class Deps:
-    available_ingredients: List[str]
-    user_inputs: dict
-    specific_ingredients: List[str]
-
-# Recipe generation agent
-recipe_agent = Agent[Deps, Union[RecipeDetails, NoRecipeFound]](
-    model='openai:gpt-4o-mini',
-    system_prompt='''
-        You are an AI Chef creating recipes based on user preferences and available ingredients. 
-        Select the best ingredients to craft an innovative, simple, and clear recipe respecting dietary requirements.
-    '''
-)
-
-# Tool: Extract ingredients
-@recipe_agent.tool
-async def extract_ingredients(ctx: RunContext[Deps]) -> List[str]:
-    return ctx.deps.specific_ingredients
-
-# Result validator for recipe validation
-@recipe_agent.result_validator
-async def validate_recipe_result(ctx: RunContext[Deps], result: Union[RecipeDetails, NoRecipeFound]) -> Union[RecipeDetails, NoRecipeFound]:
-    if isinstance(result, NoRecipeFound):
-        logger.info('No valid recipe found, retrying...')
-        return ModelRetry("Retry due to no recipe found.")
-    
-    missing_ingredients = [i for i in ctx.deps.specific_ingredients if i not in result.ingredients]
-    if missing_ingredients:
-        raise ModelRetry(f"Missing required ingredients: {', '.join(missing_ingredients)}")
-    
-    if not result.ingredients or not result.steps:
-        raise ModelRetry("Incomplete recipe data detected.")
-    
-    return result
-
-# Helper: Generate recipe prompt
-def generate_recipe_prompt(diet: str, cuisine: str, specific_ingredients: List[str], available_ingredients: List[str]) -> str:
-    return f'''
-    **Diet:** {diet}
-    **Cuisine:** {cuisine}
-    **Specific Ingredients:** {", ".join(specific_ingredients)}
-    **Available Ingredients:** {", ".join(available_ingredients)}
-    '''
+# Configure queued logging with rotation (file and console I/O happen on a background thread)
+logger = configure_logging()
+
+# The default variant's agent and prompt, as used by benchmark_variants.py; prompts, rules and
+# history policy of every variant live in variants.py, the generation loop in engine.py
+recipe_agent = get_engine(DEFAULT_VARIANT).agent
+generate_recipe_prompt = VARIANTS[DEFAULT_VARIANT].build_prompt
 
 # Helper: Read ingredients from Excel
 def get_available_ingredients(file_path: str) -> List[str]:
@@ -99,49 +50,112 @@ def get_available_ingredients(file_path: str) -> List[str]:
         logger.error(f"Error reading ingredients: {e}")
         return []
 
-# Main function to run recipe generation
-async def generate_recipe():
-    # Mock input for testing; replace with sys.argv or user inputs in production
-    diet = "vegetarian"
-    cuisine = "Italian"
-    specific_ingredients = ["tomato", "basil", "mozzarella"]
-    available_ingredients = get_available_ingredients("ingredients.xlsx")
-
-    deps = Deps(
-        available_ingredients=available_ingredients,
-        user_inputs={"diet": diet, "cuisine": cuisine},
-        specific_ingredients=specific_ingredients
-    )
-
-    while True:
-        prompt = generate_recipe_prompt(diet, cuisine, specific_ingredients, available_ingredients)
-        logger.debug(f"Generated prompt: {prompt.strip()}")
-
-        try:
-            result = await recipe_agent.run(prompt, deps=deps)
-            recipe = result.data
-            
-            if isinstance(recipe, NoRecipeFound):
-                logger.info("No recipe found, generating another...")
-                continue
-            
-            logger.info(f"Recipe generated: {recipe.recipe_name}")
+# Print (or emit) a generated recipe with its parsed timing
+def render_recipe(recipe: RecipeDetails, emitter=None, quiet: bool = False):
+    with metrics.stage("render"):
+        # Unparsable step times are flagged here rather than sent back to the model
+        timing = recipe_timing(recipe.steps, recipe.step_times)
+        if timing.unparsed_steps:
+            logger.info(f"Could not parse step times for steps {timing.unparsed_steps}")
+        if emitter:
+            emitter.final(recipe, timing)
+        elif not quiet:
             print(f"Recipe Name: {recipe.recipe_name}")
             print("Ingredients:", ", ".join(recipe.ingredients))
             print("Steps:")
-            for idx, (step, time) in enumerate(zip(recipe.steps, recipe.step_times), 1):
-                print(f"{idx}. {step} (Time: {time})")
+            for idx, (step, step_time) in enumerate(zip(recipe.steps, recipe.step_times), 1):
+                print(f"{idx}. {step} (Time: {step_time})")
+            print(f"Total time: {timing.total_minutes:.0f} min (about {timing.critical_path_minutes:.0f} min with passive steps overlapped)")
+    return timing
 
-            # User choice to continue or finalize
-            if input("Finalize recipe? (yes/no): ").strip().lower() == 'yes':
-                logger.info("Recipe finalized successfully.")
-                break
-
-        except ModelRetry as retry:
-            logger.warning(f"Retry triggered: {retry}")
-        except Exception as e:
-            logger.error(f"Unexpected error: {e}")
-            break
+# Main function to run recipe generation
+async def generate_recipe():
+    metrics.record_process_start()
+    # Inputs come from server.js as argv; fall back to mock input for local testing
+    if len(sys.argv) >= 3:
+        diet, cuisine = sys.argv[1], sys.argv[2]
+        specific_ingredients = [i.strip() for i in sys.argv[3].split(",") if i.strip()] if len(sys.argv) > 3 else []
+    else:
+        diet = "vegetarian"
+        cuisine = "Italian"
+        specific_ingredients = ["tomato", "basil", "mozzarella"]
+
+    # Computed once: without RECIPE_REQUEST_ID the fallback ID changes with the clock
+    rid = request_id()
+    # Traffic split between variants (RECIPE_VARIANT_WEIGHTS), sticky per request ID
+    variant = choose_variant(rid)
+    activate_variant(variant)
+    engine = get_engine(variant)
+    logger.info(f"Serving variant {variant}")
+
+    # Spawned by the server there is nobody to answer the finalize prompt
+    interactive = sys.stdin.isatty() and not EVENTS_ENABLED
+    emitter = RecipeEventEmitter() if EVENTS_ENABLED else None
+    with metrics.stage("inventory_load"):
+        available_ingredients = get_available_ingredients("ingredients.xlsx")
+        deps = engine.make_deps(diet, cuisine, specific_ingredients, available_ingredients)
+
+    # With a result channel (server.js) the recipe goes out as one JSON document, not as printed text
+    quiet = result_channel_enabled()
+    timings = {}
+    # Every validated recipe is kept in the persistent store (recipe_store.py)
+    store = get_store()
+    if store is not None:
+        # Request frequencies tell warmup.py which combinations to pre-generate
+        store.record_request(diet, cuisine, specific_ingredients)
+
+    def on_recipe(recipe: RecipeDetails, stored: bool = False) -> bool:
+        timings["recipe"] = render_recipe(recipe, emitter, quiet)
+        if store is not None and not stored:
+            with metrics.stage("store_write"):
+                store.add(recipe, cuisine)
+        # User choice to continue or finalize
+        return not interactive or input("Finalize recipe? (yes/no): ").strip().lower() == 'yes'
+
+    recipe, usage, source, error = None, Usage(), "model", "Recipe generation failed, please try again."
+    with metrics.stage("request"):
+        if store is not None and STORE_FIRST:
+            # Answer from previously validated recipes before paying for a model call
+            with metrics.stage("store_lookup"):
+                matches = store.search(specific_ingredients, deps.diet_mask, cuisine, limit=5)
+            random.shuffle(matches)
+            for match in matches:
+                candidate = RecipeDetails(**match["recipe"])
+                if on_recipe(candidate, stored=True):
+                    recipe, source = candidate, "store"
+                    break
+                if deps.session is not None:
+                    deps.session.add(candidate)
+        if recipe is None:
+            try:
+                # Stops the model call and any pending retry when the deadline passes or the client goes away
+                recipe, usage = await run_until_deadline(engine.generate(deps, on_recipe, emitter))
+            except asyncio.TimeoutError:
+                logger.warning("Request deadline passed, generation cancelled")
+                error = "Recipe generation took too long, please try again."
+                if emitter:
+                    emitter.error(error)
+            except asyncio.CancelledError:
+                logger.info("Client disconnected, generation cancelled")
+                error = "Request cancelled."
+
+    if quiet:
+        write_result(build_result(
+            recipe,
+            timings.get("recipe"),
+            new_ingredients(recipe.ingredients, specific_ingredients, available_ingredients) if recipe else [],
+            usage,
+            metrics.request_timings(),
+            variant=variant,
+            request_id=rid,
+            source=source,
+            error=None if recipe else error,
+        ))
+
+    log_repair_stats()
 
 if __name__ == "__main__":
-    asyncio.run(generate_recipe())
+    # No-op unless RECIPE_PROFILE=1 or the request is sampled (see profiling.py)
+    # Tracked explicitly: a periodic metrics flush empties the process histograms mid-request
+    with profile_request(), metrics.track_request():
+        asyncio.run(generate_recipe())
@@ -0,0 +1,230 @@
+"""Benchmark every agent_v* variant against a deterministic mock model.
+
+Usage: python benchmark_variants.py [--variants agent,agent_v14] [--repeat 3] [--latency 0.002] [--json out.json]
+
+The mock model (mock_model.py) never touches the network. It answers with a RecipeDetails tool call
+whose quality depends on the prompt in a fixed, seeded way, and charges simulated latency per output
+token, so prompt/retry differences show up in wall time as they would against the real API.
+
+"engine:<name>" rows are served by RecipeEngine.generate like a real request: streaming with early
+abort, retry feedback, the rate limiter and engine.MAX_ATTEMPTS (tok/ok counts completed runs only, as
+the engine does; aborted streams report no usage). The agent_v* modules predate the engine and are
+driven with a plain recipe_agent.run retry loop (no streaming, up to 5 attempts), so their rows
+measure prompt quality only and their wall times are not comparable to the engine rows.
+"""
+import argparse
+import asyncio
+import contextvars
+import dataclasses
+import importlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+import types
+from typing import Callable, Dict, List, Optional, Tuple
+
+os.environ.setdefault("OPENAI_API_KEY", "mock-key-for-benchmark")
+# Keep benchmark runs out of the production validation analytics and recipe store (no exemplars)
+os.environ.setdefault("RECIPE_ANALYTICS", "0")
+os.environ.setdefault("RECIPE_STORE", "0")
+# Variants call logfire.configure() at import; keep it local
+os.environ.setdefault("LOGFIRE_SEND_TO_LOGFIRE", "false")
+os.environ.setdefault("LOGFIRE_IGNORE_NO_CONFIG", "1")
+os.environ.setdefault("LOGFIRE_CONSOLE", "false")
+
+from mock_model import MockStats, make_mock_model
+
+VARIANTS = [
+    "agent", "agent_v2", "agent_v3", "agent_v4", "agent_v5", "agent_v6", "agent_v7", "agent_v8_1",
+    "agent_v9", "agent_v10_2", "agent_v10_2_1", "agent_v10_2_retry", "agent_v12_half_deprecated",
+    "agent_v13_half_deprecated", "agent_v14", "engine:agent", "engine:v10_2", "engine:v14",
+]
+# "engine:<name>" benchmarks a variant registered in variants.py through the shared engine
+# agent_v1_deprecated and agent_v11_deprecated are fully commented out and have no recipe_agent
+
+# Fixed request corpus: (diet, cuisine, specific ingredients)
+CORPUS = [
+    ("vegetarian", "Indian", ["Potatoes", "Onions", "Garam Masala"]),
+    ("vegan", "Indian", ["Toor Dal", "Tomatoes", "Garlic"]),
+    ("vegetarian", "Italian", ["tomato", "basil", "mozzarella"]),
+    ("gluten-free", "Mexican", ["Rice", "Green Chilies", "Lemon"]),
+    ("vegetarian, no eggs", "Indian", ["Curd (Yogurt)", "Moong Dal"]),
+    ("vegan", "Thai", ["Coconut Powder/Desiccated Coconut", "Ginger"]),
+    ("vegetarian", "Chinese", ["Maggi Noodles/Instant Noodles", "Garlic", "Green Chilies"]),
+    ("jain", "Indian", ["Rice", "Toor Dal"]),
+]
+INVENTORY = [
+    "Rice", "Wheat Flour (Atta)", "Toor Dal", "Moong Dal", "Masoor Dal", "Turmeric Powder", "Red Chili Powder",
+    "Coriander Powder", "Cumin Seeds (Jeera)", "Mustard Seeds (Rai)", "Garam Masala", "Asafoetida (Hing)", "Salt",
+    "Refined Oil/Mustard Oil", "Ghee", "Potatoes", "Onions", "Tomatoes", "Green Chilies", "Garlic", "Ginger",
+    "Tea Powder/Tea Bags", "Sugar", "Coffee Powder (optional)", "Biscuits or Snacks", "Maggi Noodles/Instant Noodles",
+    "Ready-to-Eat Curry Mixes", "Pickles (Mango/Lime)", "Milk", "Curd (Yogurt)", "Tamarind Paste",
+    "Coconut Powder/Desiccated Coconut", "Bread", "Lemon", "Green Coriander (Dhaniya)",
+]
+
+# Variants v2-v9 build their prompt inline in main(); these mirror those f-strings
+INLINE_PROMPTS: Dict[str, Callable] = {
+    "agent_v2": lambda d: f'Generate a recipe with ingredients: {d.available_ingredients} and preferences: {d.user_inputs}',
+    "agent_v3": lambda d: f'Generate a recipe with ingredients: {d.available_ingredients} and preferences: {d.user_inputs}',
+    "agent_v4": lambda d: f'Generate a recipe with ingredients: {d.available_ingredients} and preferences: {d.user_inputs}.',
+    "agent_v5": lambda d: f'Generate a recipe with the following specific ingredients: {", ".join(d.specific_ingredients)} and preferences: {d.user_inputs}. Ensure that all user-provided ingredients are included.',
+    "agent_v6": lambda d: f'Generate a recipe with the following specific ingredients: {", ".join(d.specific_ingredients)} and preferences: {d.user_inputs}. Ensure that all user-provided ingredients are included. Be creative and innovative with the recipe name.',
+    "agent_v7": lambda d: f'Generate a recipe with the following specific ingredients: {", ".join(d.specific_ingredients)} and preferences: {d.user_inputs}. Ensure that all user-provided ingredients are included. Only add additional ingredients if absolutely necessary and list any new ingredients that are not in the provided list.',
+    "agent_v8_1": lambda d: f'Generate a recipe with the following specific ingredients: {", ".join(d.specific_ingredients)} and preferences: {d.user_inputs}. Ensure that all user-provided ingredients are included. Only add additional ingredients if absolutely necessary and list any new ingredients that are not in the provided list. Please provide times for each step and format the steps as 1. 2. 3.',
+    "agent_v9": lambda d: f'Generate a recipe with the following specific ingredients: {", ".join(d.specific_ingredients)} and preferences: {d.user_inputs}. Ensure that all user-provided ingredients are included. Only add additional ingredients if absolutely necessary and list any new ingredients that are not in the provided list. Please provide times for each step and format the steps as 1. 2. 3. without repeating step numbers, and include time only once in the format (Time: x min).',
+}
+
+MAX_ATTEMPTS = 5
+_current_request: contextvars.ContextVar = contextvars.ContextVar("current_request")
+
+
+def build_prompt(name: str, module, deps, diet: str, cuisine: str, specific: List[str]) -> str:
+    if hasattr(module, "generate_recipe_prompt"):
+        return module.generate_recipe_prompt(diet, cuisine, specific, INVENTORY)
+    if callable(getattr(module, "generate_recipe", None)) and not asyncio.iscoroutinefunction(module.generate_recipe):
+        return module.generate_recipe(diet, cuisine, specific, INVENTORY)
+    return INLINE_PROMPTS[name](deps)
+
+
+def make_deps(module, diet: str, cuisine: str, specific: List[str]):
+    values = {
+        "available_ingredients": list(INVENTORY),
+        "user_inputs": {"diet": diet, "cuisine": cuisine, "specific_ingredients": specific},
+        "specific_ingredients": list(specific),
+    }
+    accepted = {f.name for f in dataclasses.fields(module.Deps)}
+    return module.Deps(**{k: v for k, v in values.items() if k in accepted})
+
+
+def load_variant(name: str):
+    """The agent_v* module, or an engine factory taking the mock model for "engine:<name>"."""
+    if name.startswith("engine:"):
+        import engine
+        from variants import VARIANTS
+        config = VARIANTS[name.split(":", 1)[1]]
+        return types.SimpleNamespace(make_engine=lambda model: engine.RecipeEngine(config, model=model))
+    return importlib.import_module(name)
+
+
+async def run_module(name: str, module, diet: str, cuisine: str, specific: List[str]) -> Tuple[bool, int, int, int]:
+    """One request against a legacy module: (succeeded, attempts, prompt tokens, prompt chars)."""
+    deps = make_deps(module, diet, cuisine, specific)
+    prompt = build_prompt(name, module, deps, diet, cuisine, specific)
+    prompt_tokens = 0
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            result = await module.recipe_agent.run(prompt, deps=deps)
+        except Exception:
+            continue
+        prompt_tokens += result.usage().request_tokens or 0
+        if hasattr(result.data, "recipe_name"):
+            return True, attempt, prompt_tokens, len(prompt)
+    return False, MAX_ATTEMPTS, prompt_tokens, len(prompt)
+
+
+async def run_engine(recipe_engine, diet: str, cuisine: str, specific: List[str]) -> Tuple[bool, Optional[int], int, int]:
+    """One request through RecipeEngine.generate; its attempts stay inside the engine (reported as None)."""
+    deps = recipe_engine.make_deps(diet, cuisine, specific, INVENTORY)
+    prompt = recipe_engine.config.build_prompt(diet, cuisine, specific, deps.available_ingredients)
+    recipe, usage = await recipe_engine.generate(deps, lambda recipe: True)
+    return recipe is not None, None, usage.request_tokens or 0, len(prompt)
+
+
+async def bench_variant(name: str, repeat: int, latency_per_token: float) -> Optional[dict]:
+    try:
+        module = load_variant(name)
+    except Exception as e:
+        print(f"Skipping {name}: import failed ({e})", file=sys.stderr)
+        return None
+    if not hasattr(module, "recipe_agent") and not hasattr(module, "make_engine"):
+        return None
+
+    stats = MockStats()
+    model = make_mock_model(stats, latency_per_token, request_provider=_current_request.get)
+    warmup_model = make_mock_model(MockStats(), 0.0, request_provider=_current_request.get)
+    if hasattr(module, "make_engine"):
+        timed_engine, warmup_engine = module.make_engine(model), module.make_engine(warmup_model)
+        run = lambda request: run_engine(timed_engine, *request)
+        warmup = lambda request: run_engine(warmup_engine, *request)
+    else:
+        async def run(request):
+            with module.recipe_agent.override(model=model):
+                return await run_module(name, module, *request)
+
+        async def warmup(request):
+            with module.recipe_agent.override(model=warmup_model):
+                return await run_module(name, module, *request)
+
+    # Untimed warm-up so lazy schema building doesn't land on the first request
+    _current_request.set(CORPUS[0])
+    try:
+        await warmup(CORPUS[0])
+    except Exception:
+        pass
+
+    successes = prompt_tokens = prompt_chars = 0
+    attempts: Optional[int] = 0
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for request in CORPUS:
+            _current_request.set(request)
+            succeeded, request_attempts, request_tokens, request_chars = await run(request)
+            successes += succeeded
+            attempts = None if request_attempts is None else attempts + request_attempts
+            prompt_tokens += request_tokens
+            prompt_chars += request_chars
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    requests = repeat * len(CORPUS)
+    return {
+        "variant": name,
+        "requests": requests,
+        "success_rate": successes / requests,
+        "avg_prompt_chars": prompt_chars / requests,
+        "prompt_tokens_per_success": prompt_tokens / successes if successes else float("nan"),
+        "model_calls_per_success": stats.calls / successes if successes else float("nan"),
+        "retry_rate": stats.retry_calls / stats.calls if stats.calls else 0.0,
+        "outer_attempts_per_request": attempts / requests if attempts is not None else None,
+        "wall_s": wall,
+        "peak_mem_kb": peak / 1024,
+    }
+
+
+def print_table(rows: List[dict]) -> None:
+    header = f"{'variant':28} {'ok%':>5} {'prompt ch':>9} {'tok/ok':>8} {'calls/ok':>8} {'retry%':>7} {'wall s':>7} {'peak KB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in sorted(rows, key=lambda r: (-r["success_rate"], r["model_calls_per_success"])):
+        print(
+            f"{r['variant']:28} {r['success_rate'] * 100:>5.0f} {r['avg_prompt_chars']:>9.0f} "
+            f"{r['prompt_tokens_per_success']:>8.0f} {r['model_calls_per_success']:>8.2f} "
+            f"{r['retry_rate'] * 100:>7.1f} {r['wall_s']:>7.2f} {r['peak_mem_kb']:>8.0f}"
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated seconds per output token")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    rows = []
+    for name in args.variants.split(","):
+        row = await bench_variant(name.strip(), args.repeat, args.latency)
+        if row:
+            rows.append(row)
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
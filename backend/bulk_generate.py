@@ -0,0 +1,208 @@
+import metrics  # imported first so it can time the remaining imports
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pydantic_ai.usage import Usage
+
+import failure_analytics
+from agent import get_available_ingredients, logger
+from engine import RecipeDetails, activate_variant, get_engine
+from recipe_store import get_store
+from repair import log_repair_stats
+from result_channel import build_result, new_ingredients
+from step_timing import recipe_timing
+from variants import DEFAULT_VARIANT, VARIANTS
+
+# python bulk_generate.py rows.csv --out recipes.jsonl [--concurrency 8] [--variant agent] [--retry-failed]
+#
+# Input rows have diet, cuisine and ingredients (comma-separated, or a list in JSONL). Each finished row is
+# appended to the output as one result document (result_channel.build_result) plus "row" and "input". The
+# output doubles as the checkpoint: rerunning the same command skips rows already in it, so a crash or
+# Ctrl-C loses only the rows that were in flight.
+#
+# --retry-failed appends a new line for each retried row and leaves the failed one in place: when a row
+# appears more than once, the last line wins (load_checkpoint, and anything else reading the output, should
+# keep only the last line per "row").
+
+# A row still generating after this many seconds is written as failed (timed out); 0 means no limit
+BULK_ROW_TIMEOUT = float(os.getenv("RECIPE_BULK_ROW_TIMEOUT", "300"))
+
+
+def _ingredients(value) -> List[str]:
+    if isinstance(value, list):
+        return [str(i).strip() for i in value if str(i).strip()]
+    return [i.strip() for i in str(value or "").split(",") if i.strip()]
+
+
+def read_rows(path: str) -> Iterator[Tuple[int, dict]]:
+    """(row number, {"diet", "cuisine", "ingredients"}) from a CSV with a header or a JSONL file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = csv.DictReader(f)
+        for number, record in enumerate(records):
+            yield number, {
+                "diet": (record.get("diet") or "").strip(),
+                "cuisine": (record.get("cuisine") or "").strip(),
+                "ingredients": _ingredients(record.get("ingredients")),
+            }
+
+
+def load_checkpoint(path: str) -> Dict[int, dict]:
+    """Rows already written to the output, by row number, last line winning; a torn last line (crash mid-write) is cut off."""
+    done: Dict[int, dict] = {}
+    if not os.path.exists(path):
+        return done
+    good_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            good_bytes += len(line)
+            done[result["row"]] = result
+    if good_bytes < os.path.getsize(path):
+        logger.warning(f"Dropping a partial line at the end of {path}")
+        with open(path, "r+b") as f:
+            f.truncate(good_bytes)
+    return done
+
+
+class Progress:
+    """Live throughput on stderr, redrawn every second."""
+
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.ok = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.tokens = 0
+        self.started = time.perf_counter()
+
+    def line(self) -> str:
+        done = self.ok + self.failed
+        elapsed = time.perf_counter() - self.started
+        rate = done / elapsed * 60 if elapsed else 0.0
+        remaining = self.total - self.skipped - done
+        eta = f"{remaining / rate:.1f} min" if rate else "?"
+        return (f"\r {self.skipped + done}/{self.total} rows  ok={self.ok} failed={self.failed} in-flight={self.in_flight}  "
+                f"{rate:.1f} recipes/min  {self.tokens} tokens  ETA {eta}   ")
+
+    async def run(self) -> None:
+        while True:
+            sys.stderr.write(self.line())
+            sys.stderr.flush()
+            await asyncio.sleep(1)
+
+
+async def generate_row(engine, available: List[str], number: int, row: dict, variant: str,
+                       request_id: str = "", timeout: Optional[float] = None) -> Tuple[dict, Usage]:
+    """One result document for a row; a generation running past `timeout` seconds is cancelled and fails."""
+    store = get_store()
+    started = time.perf_counter()
+    deps = engine.make_deps(row["diet"], row["cuisine"], row["ingredients"], available)
+
+    def on_recipe(recipe: RecipeDetails) -> bool:
+        if store is not None:
+            store.add(recipe, row["cuisine"])
+        # Nobody to ask: the first recipe that passes validation is the answer
+        return True
+
+    request_id = request_id or f"bulk-{number}"
+    # Stage timings and validation events of this row only, although several rows share the process
+    error = "Recipe generation failed"
+    with metrics.track_request(), failure_analytics.track_request(request_id):
+        try:
+            recipe, usage = await asyncio.wait_for(engine.generate(deps, on_recipe), timeout or None)
+        except asyncio.TimeoutError:
+            logger.warning(f"{request_id} timed out after {timeout:g} s")
+            recipe, usage, error = None, Usage(), "Recipe generation timed out"
+        timings = {**metrics.request_timings(), "request": time.perf_counter() - started}
+    result = build_result(
+        recipe,
+        recipe_timing(recipe.steps, recipe.step_times) if recipe else None,
+        new_ingredients(recipe.ingredients, row["ingredients"], available) if recipe else [],
+        usage,
+        timings,
+        variant=variant,
+        request_id=request_id,
+        error=None if recipe else error,
+    )
+    return {"row": number, "input": row, **result}, usage
+
+
+async def bulk_generate(input_path: str, output_path: str, concurrency: int, variant: str, retry_failed: bool) -> Progress:
+    activate_variant(variant)
+    engine = get_engine(variant)
+    available = get_available_ingredients("ingredients.xlsx")
+
+    done = load_checkpoint(output_path)
+    rows = list(read_rows(input_path))
+    pending = [(n, row) for n, row in rows if n not in done or (retry_failed and done[n]["status"] != "ok")]
+    progress = Progress(len(rows), len(rows) - len(pending))
+    logger.info(f"{len(rows)} rows, {len(rows) - len(pending)} already done, {len(pending)} to generate with {concurrency} workers")
+
+    queue = iter(pending)
+    with open(output_path, "a", encoding="utf-8") as out:
+
+        async def worker() -> None:
+            # Workers pull rows one at a time, so at most `concurrency` generations are in flight
+            for number, row in queue:
+                progress.in_flight += 1
+                try:
+                    result, usage = await generate_row(engine, available, number, row, variant, timeout=BULK_ROW_TIMEOUT)
+                finally:
+                    progress.in_flight -= 1
+                # Written and synced as soon as it finishes; the next run skips it
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+                progress.tokens += usage.total_tokens or 0
+                if result["status"] == "ok":
+                    progress.ok += 1
+                else:
+                    progress.failed += 1
+
+        reporter = asyncio.create_task(progress.run())
+        try:
+            await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        finally:
+            reporter.cancel()
+            sys.stderr.write(progress.line() + "\n")
+    return progress
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate recipes for every row of a CSV/JSONL file.")
+    parser.add_argument("input", help="CSV with a diet,cuisine,ingredients header, or JSONL with those keys")
+    parser.add_argument("--out", required=True, help="output JSONL; also the checkpoint for resuming")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("RECIPE_BULK_CONCURRENCY", "4")))
+    parser.add_argument("--variant", default=DEFAULT_VARIANT, choices=sorted(VARIANTS))
+    parser.add_argument("--retry-failed", action="store_true", help="generate again for rows that failed last time")
+    args = parser.parse_args(argv)
+
+    metrics.record_process_start()
+    try:
+        progress = asyncio.run(bulk_generate(args.input, args.out, args.concurrency, args.variant, args.retry_failed))
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; finished rows are in {args.out}, rerun the same command to resume.", file=sys.stderr)
+        return 130
+    finally:
+        log_repair_stats()
+    print(f"{progress.ok} ok, {progress.failed} failed, {progress.skipped} skipped (already in {args.out})")
+    return 0 if not progress.failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
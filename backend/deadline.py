@@ -0,0 +1,39 @@
+import asyncio
+import os
+import signal
+import time
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Absolute request deadline (epoch milliseconds) set by server.js; unset means no deadline
+DEADLINE_MS = os.getenv("RECIPE_DEADLINE_MS")
+
+
+def remaining_seconds() -> Optional[float]:
+    """Time left before the request deadline, never negative; None without a deadline."""
+    if not DEADLINE_MS:
+        return None
+    return max(0.0, int(DEADLINE_MS) / 1000 - time.time())
+
+
+async def run_until_deadline(coro: Awaitable[T]) -> T:
+    """Await coro, cancelling it when the request deadline passes (asyncio.TimeoutError) or SIGTERM arrives
+    (asyncio.CancelledError).
+
+    Cancellation reaches whatever the generation is awaiting (the model call, a retry or the rate limiter),
+    so the process stops at once instead of finishing work nobody will read.
+    """
+    task = asyncio.ensure_future(coro)
+    loop = asyncio.get_running_loop()
+    try:
+        # server.js sends SIGTERM when the client disconnects
+        loop.add_signal_handler(signal.SIGTERM, task.cancel)
+        handled = True
+    except (NotImplementedError, AttributeError, RuntimeError):
+        handled = False
+    try:
+        return await asyncio.wait_for(task, remaining_seconds())
+    finally:
+        if handled:
+            loop.remove_signal_handler(signal.SIGTERM)
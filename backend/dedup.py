@@ -0,0 +1,98 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Set
+
+from normalize import normalize_ingredient
+
+# Weighted Jaccard: recipes sharing a name-ish title and most ingredients are "the same recipe"
+NAME_WEIGHT = 0.3
+INGREDIENT_WEIGHT = 0.5
+STEP_WEIGHT = 0.2
+DUPLICATE_THRESHOLD = 0.6
+SHINGLE_SIZE = 3
+
+_STOPWORDS = {"a", "an", "and", "the", "with", "of", "in", "style", "recipe", "on", "to", "for"}
+
+
+def _words(text: str) -> List[str]:
+    return [w for w in re.findall(r"[a-z]+", text.lower()) if w not in _STOPWORDS]
+
+
+def _jaccard(a: FrozenSet, b: FrozenSet) -> float:
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass(frozen=True)
+class RecipeFingerprint:
+    recipe_name: str
+    key_ingredients: tuple
+    name_tokens: FrozenSet[str]
+    ingredients: FrozenSet[str]
+    step_shingles: FrozenSet[int]
+
+    @classmethod
+    def build(cls, recipe_name: str, ingredients: List[str], steps: Optional[List[str]] = None) -> "RecipeFingerprint":
+        shingles: Set[int] = set()
+        for step in steps or []:
+            words = _words(step)
+            for idx in range(max(len(words) - SHINGLE_SIZE + 1, 1)):
+                shingles.add(hash(tuple(words[idx:idx + SHINGLE_SIZE])))
+        normalized = tuple(filter(None, (normalize_ingredient(i) for i in ingredients)))
+        return cls(
+            recipe_name=recipe_name,
+            key_ingredients=normalized,
+            name_tokens=frozenset(_words(recipe_name)),
+            # Word tokens, so 'fresh basil' and 'basil' still overlap
+            ingredients=frozenset(word for name in normalized for word in name.split()),
+            step_shingles=frozenset(shingles),
+        )
+
+    def similarity(self, other: "RecipeFingerprint") -> float:
+        score = NAME_WEIGHT * _jaccard(self.name_tokens, other.name_tokens)
+        score += INGREDIENT_WEIGHT * _jaccard(self.ingredients, other.ingredients)
+        if self.step_shingles and other.step_shingles:
+            score += STEP_WEIGHT * _jaccard(self.step_shingles, other.step_shingles)
+        else:
+            # Steps not known yet (streaming): judge on name and ingredients alone
+            score /= NAME_WEIGHT + INGREDIENT_WEIGHT
+        return score
+
+
+@dataclass
+class SessionRecipeIndex:
+    """Recipes already suggested in this session, with an inverted ingredient index for candidate lookup."""
+    threshold: float = DUPLICATE_THRESHOLD
+    recipes: List[RecipeFingerprint] = field(default_factory=list)
+    by_token: Dict[str, Set[int]] = field(default_factory=dict)
+
+    def add(self, recipe) -> None:
+        fingerprint = RecipeFingerprint.build(recipe.recipe_name, recipe.ingredients, recipe.steps)
+        recipe_id = len(self.recipes)
+        self.recipes.append(fingerprint)
+        for token in fingerprint.ingredients | fingerprint.name_tokens:
+            self.by_token.setdefault(token, set()).add(recipe_id)
+
+    def find_duplicate(self, recipe_name: str, ingredients: List[str], steps: Optional[List[str]] = None) -> Optional[str]:
+        """Name of an earlier recipe this one is a near-duplicate of, if any."""
+        if not self.recipes:
+            return None
+        fingerprint = RecipeFingerprint.build(recipe_name, ingredients, steps)
+        candidates: Set[int] = set()
+        for token in fingerprint.ingredients | fingerprint.name_tokens:
+            candidates |= self.by_token.get(token, set())
+        for recipe_id in candidates:
+            if fingerprint.similarity(self.recipes[recipe_id]) >= self.threshold:
+                return self.recipes[recipe_id].recipe_name
+        return None
+
+    def exclusion_prompt(self, max_ingredients: int = 4) -> str:
+        """Compact 'do not repeat' list for the next prompt instead of the whole message history."""
+        if not self.recipes:
+            return ""
+        lines = [
+            f"{r.recipe_name} ({', '.join(r.key_ingredients[:max_ingredients])})"
+            for r in self.recipes
+        ]
+        return "\n    **Already suggested, propose something clearly different:** " + "; ".join(lines) + "\n"
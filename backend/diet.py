@@ -0,0 +1,194 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+from normalize import normalize_ingredient
+
+# "Contains" properties of an ingredient, one bit each
+MEAT = 1 << 0
+FISH = 1 << 1
+EGG = 1 << 2
+DAIRY = 1 << 3
+GLUTEN = 1 << 4
+HONEY = 1 << 5
+ONION_GARLIC = 1 << 6
+ROOT_VEG = 1 << 7
+NUTS = 1 << 8
+
+# Diet tag -> properties it forbids. Add new tags here; each gets its own bit in DIET_BITS.
+DIET_FORBIDS: Dict[str, int] = {
+    "vegetarian": MEAT | FISH,
+    "eggless": EGG,
+    "pescatarian": MEAT,
+    "vegan": MEAT | FISH | EGG | DAIRY | HONEY,
+    "gluten-free": GLUTEN,
+    "dairy-free": DAIRY,
+    "nut-free": NUTS,
+    "jain": MEAT | FISH | EGG | HONEY | ONION_GARLIC | ROOT_VEG,
+    "satvik": MEAT | FISH | EGG | ONION_GARLIC,
+}
+DIET_BITS: Dict[str, int] = {diet: 1 << idx for idx, diet in enumerate(DIET_FORBIDS)}
+ALL_DIETS = (1 << len(DIET_BITS)) - 1
+
+# How users spell the diets in the form; an alias may stand for several tags ("vegetarian+eggless")
+DIET_ALIASES: Dict[str, str] = {
+    "veg": "vegetarian",
+    "vegetarian": "vegetarian",
+    "lacto vegetarian": "vegetarian+eggless",
+    "no egg": "eggless",
+    "no eggs": "eggless",
+    "eggless": "eggless",
+    "egg free": "eggless",
+    "pescatarian": "pescatarian",
+    "vegan": "vegan",
+    "plant based": "vegan",
+    "gluten free": "gluten-free",
+    "no gluten": "gluten-free",
+    "celiac": "gluten-free",
+    "dairy free": "dairy-free",
+    "no dairy": "dairy-free",
+    "lactose free": "dairy-free",
+    "nut free": "nut-free",
+    "no nuts": "nut-free",
+    "jain": "jain",
+    "satvik": "satvik",
+    "sattvic": "satvik",
+    "no onion garlic": "satvik",
+}
+_ALIASES_BY_LENGTH: List[Tuple[str, ...]] = sorted((tuple(alias.split()) for alias in DIET_ALIASES), key=len, reverse=True)
+# A word right before a diet that turns it around: "non-veg", "not vegan"
+_NEGATIONS = {"non", "not", "no"}
+
+# Keyword (singular token) -> properties
+_KEYWORDS: Dict[str, int] = {}
+for _words, _prop in [
+    ("chicken mutton lamb beef pork bacon ham sausage turkey duck goat meat keema mince prosciutto salami "
+     "pepperoni chorizo veal venison gelatin lard", MEAT),
+    ("fish salmon tuna prawn shrimp crab lobster anchovy sardine squid oyster clam mussel cod tilapia "
+     "mackerel seafood surimi", FISH),
+    ("egg mayonnaise mayo meringue", EGG),
+    ("milk cheese butter ghee cream curd yogurt yoghurt paneer mozzarella parmesan cheddar ricotta khoa "
+     "khoya buttermilk whey malai feta mascarpone dahi lassi", DAIRY),
+    ("wheat atta maida bread pasta spaghetti noodle semolina rava suji sooji barley rye couscous biscuit "
+     "cracker seitan breadcrumb macaroni penne tortilla naan roti chapati paratha asafoetida hing "
+     "vermicelli pizza", GLUTEN),
+    ("honey", HONEY),
+    ("onion garlic shallot leek scallion chive", ONION_GARLIC),
+    ("potato carrot beetroot beet radish ginger turnip yam", ROOT_VEG),
+    ("almond cashew peanut walnut pistachio hazelnut pecan macadamia", NUTS),
+]:
+    for _word in _words.split():
+        _KEYWORDS[_word] = _KEYWORDS.get(_word, 0) | _prop
+# Onion and garlic are also root vegetables for jain cooking
+_KEYWORDS["onion"] |= ROOT_VEG
+_KEYWORDS["garlic"] |= ROOT_VEG
+
+_PLANT_BASED = {"coconut", "almond", "soy", "soya", "oat", "rice", "cashew", "peanut", "cocoa", "vegan"}
+_GLUTEN_FREE_FLOURS = {"rice", "gram", "besan", "corn", "almond", "coconut", "chickpea", "millet", "ragi",
+                       "jowar", "bajra", "buckwheat", "tapioca", "potato"}
+
+
+@lru_cache(maxsize=65536)
+def _properties_for_key(key: str) -> int:
+    tokens = set(key.split())
+    props = 0
+    for token in tokens:
+        props |= _KEYWORDS.get(token, 0)
+    if props & DAIRY and (tokens & _PLANT_BASED or "tartar" in tokens):
+        # coconut milk, peanut butter, cocoa butter, cream of tartar, ...
+        props &= ~DAIRY
+    if tokens & {"soy", "soya"} and "sauce" in tokens:
+        # Soy sauce is brewed with wheat (tamari is the wheat-free one)
+        props |= GLUTEN
+    if "flour" in tokens and not tokens & _GLUTEN_FREE_FLOURS:
+        props |= GLUTEN
+    if "gluten" in tokens and "free" in tokens:
+        props &= ~GLUTEN
+    return props
+
+
+def _compatible_diets(props: int) -> int:
+    mask = 0
+    for diet, forbids in DIET_FORBIDS.items():
+        if not props & forbids:
+            mask |= DIET_BITS[diet]
+    return mask
+
+
+def ingredient_properties(name: str) -> int:
+    return _properties_for_key(normalize_ingredient(name))
+
+
+class DietTable:
+    """Precomputed ingredient -> compatible-diet bitset table.
+
+    Built once per inventory; lookups are a dict hit plus one AND per ingredient.
+    Ingredients outside the inventory are classified on first use and memoized.
+    """
+
+    def __init__(self, ingredients: Iterable[str] = ()):
+        self.table: Dict[str, int] = {}
+        for name in ingredients:
+            key = normalize_ingredient(name)
+            self.table[key] = _compatible_diets(_properties_for_key(key))
+
+    def diets_for(self, name: str) -> int:
+        key = normalize_ingredient(name)
+        mask = self.table.get(key)
+        if mask is None:
+            mask = self.table[key] = _compatible_diets(_properties_for_key(key))
+        return mask
+
+    def is_compatible(self, name: str, diet_mask: int) -> bool:
+        return self.diets_for(name) & diet_mask == diet_mask
+
+    def filter(self, ingredients: List[str], diet_mask: int) -> List[str]:
+        if not diet_mask:
+            return list(ingredients)
+        return [i for i in ingredients if self.is_compatible(i, diet_mask)]
+
+    def violations(self, ingredients: List[str], diet_mask: int) -> List[str]:
+        if not diet_mask:
+            return []
+        return [i for i in ingredients if not self.is_compatible(i, diet_mask)]
+
+
+def _phrase_tags(words: List[str]) -> List[str]:
+    """Diet tags named in one phrase: whole-word aliases, longest first, skipping negated ones."""
+    tags: List[str] = []
+    taken = [False] * len(words)
+    for alias in _ALIASES_BY_LENGTH:
+        size = len(alias)
+        for start in range(len(words) - size + 1):
+            if any(taken[start:start + size]) or tuple(words[start:start + size]) != alias:
+                continue
+            taken[start:start + size] = [True] * size
+            # "not vegan", "non vegetarian": the negation word is consumed with the alias and adds nothing
+            if start and words[start - 1] in _NEGATIONS and not taken[start - 1]:
+                taken[start - 1] = True
+                continue
+            tags.extend(DIET_ALIASES[" ".join(alias)].split("+"))
+    return tags
+
+
+def parse_diet(diet: str) -> int:
+    """Diet bitmask for free-text form input like 'Vegetarian, no eggs'. Unknown tags are ignored.
+
+    "non-veg" and "not vegan" put no restriction on the recipe rather than the one they negate.
+    """
+    mask = 0
+    for part in re.split(r",|/|;|\band\b|\+", diet.lower()):
+        words = re.findall(r"[a-z]+", part)
+        if not words:
+            continue
+        phrase = " ".join(words)
+        if phrase in DIET_BITS:
+            mask |= DIET_BITS[phrase]
+            continue
+        for tag in _phrase_tags(words):
+            mask |= DIET_BITS[tag]
+    return mask
+
+
+def diet_names(diet_mask: int) -> List[str]:
+    return [diet for diet, bit in DIET_BITS.items() if diet_mask & bit]
@@ -0,0 +1,295 @@
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import openai
+from pydantic import BaseModel
+from pydantic_ai import Agent, ModelRetry, RunContext
+from pydantic_ai.exceptions import UnexpectedModelBehavior
+from pydantic_ai.usage import Usage
+
+import failure_analytics
+import metrics
+from dedup import SessionRecipeIndex
+from diet import DietTable, parse_diet
+from logging_setup import log_payload
+from mock_model import MOCK_MODEL_ENABLED, make_mock_model
+from rate_limiter import estimate_tokens, get_rate_limiter, retry_after_seconds
+from recipe_store import get_store
+from repair import record_retry, repair_recipe
+from retrieval import format_exemplars
+from streaming import STREAMING_ENABLED, EarlyAbort, stream_recipe
+from variants import DEFAULT_VARIANT, VARIANTS, Rejection, VariantConfig
+
+logger = logging.getLogger()
+
+DEFAULT_MODEL = 'openai:gpt-4o-mini'
+# Failed attempts (rejected, aborted, empty or rate-limited) before generate() gives up on a request;
+# an unsatisfiable request would otherwise loop and spend tokens forever
+MAX_ATTEMPTS = int(os.getenv("RECIPE_MAX_ATTEMPTS", "4"))
+
+
+# Recipe Details Model
+class RecipeDetails(BaseModel):
+    recipe_name: str
+    ingredients: List[str]
+    steps: List[str]
+    step_times: List[str]
+
+class NoRecipeFound(BaseModel):
+    pass
+
+@dataclass
+class Deps:
+    available_ingredients: List[str]
+    user_inputs: dict
+    specific_ingredients: List[str]
+    diet_mask: int = 0
+    diet_table: DietTable = field(default_factory=DietTable)
+    session: Optional[SessionRecipeIndex] = None
+    # Message of the validator's latest rejection, for retry feedback when agent.run gives up without it
+    last_rejection: str = ""
+
+
+def default_model(config: VariantConfig):
+    # RECIPE_MOCK_MODEL=1 swaps in an offline model for load tests and local development
+    if MOCK_MODEL_ENABLED:
+        return make_mock_model()
+    return config.model or DEFAULT_MODEL
+
+
+class Attempts:
+    """Failed-attempt bookkeeping shared by the generate/validate/retry loops (RecipeEngine.generate, meal_plan.py).
+
+    Rejected, aborted and rate-limited attempts are retried (rate limits after the provider's backoff) up to
+    MAX_ATTEMPTS; anything else ends the request.
+    """
+
+    def __init__(self, rate_limiter, emitter=None):
+        self.rate_limiter = rate_limiter
+        self.emitter = emitter
+        self.failed = 0
+        self.started = time.perf_counter()
+        # Why the last attempt was rejected, for the next prompt; "" after a rate limit
+        self.feedback = ""
+
+    def start(self, model) -> None:
+        self.started = time.perf_counter()
+        failure_analytics.start_attempt(model)
+
+    def exhausted(self) -> bool:
+        if self.failed < MAX_ATTEMPTS:
+            return False
+        logger.error(f"Giving up after {self.failed} failed attempts")
+        failure_analytics.record_event("error", "max_attempts")
+        if self.emitter:
+            self.emitter.error("Recipe generation failed, please try again.")
+        return True
+
+    def failed_attempt(self, error: Exception, last_rejection: str = "") -> bool:
+        """Count a failed attempt; False when the error is not worth a retry and the request should end."""
+        if isinstance(error, (ModelRetry, EarlyAbort, UnexpectedModelBehavior)):
+            # Without streaming, agent.run raises UnexpectedModelBehavior once the validator's retries run
+            # out; last_rejection is the validator's message then
+            reason = last_rejection if isinstance(error, UnexpectedModelBehavior) and last_rejection else str(error)
+            logger.warning(f"Retry triggered: {reason}")
+            self.failed += 1
+            metrics.record("retry", time.perf_counter() - self.started)
+            self.feedback = reason
+            if self.emitter:
+                self.emitter.retry(reason)
+            return True
+        if isinstance(error, openai.RateLimitError):
+            failure_analytics.record_event("error", "RateLimitError")
+            self.failed += 1
+            self.feedback = ""
+            self.rate_limiter.backoff(retry_after_seconds(error))
+            return True
+        logger.error(f"Unexpected error: {error}")
+        failure_analytics.record_event("error", type(error).__name__)
+        if self.emitter:
+            self.emitter.error("Recipe generation failed, please try again.")
+        return False
+
+
+class RecipeEngine:
+    """One agent plus the generate/validate/retry loop, parameterized by a VariantConfig."""
+
+    def __init__(self, config: VariantConfig, model=None):
+        self.config = config
+        self.agent = Agent[Deps, Union[RecipeDetails, NoRecipeFound]](
+            model=model or default_model(config),
+            result_type=Union[RecipeDetails, NoRecipeFound],  # type: ignore
+            system_prompt=config.system_prompt,
+        )
+
+        # Tool: Extract ingredients
+        @self.agent.tool
+        async def extract_ingredients(ctx: RunContext[Deps]) -> List[str]:
+            with metrics.stage("tool:extract_ingredients"):
+                return ctx.deps.specific_ingredients
+
+        # Result validator for recipe validation
+        @self.agent.result_validator
+        async def validate_recipe_result(ctx: RunContext[Deps], result: Union[RecipeDetails, NoRecipeFound]) -> Union[RecipeDetails, NoRecipeFound]:
+            with metrics.stage("validate"):
+                return self.check_recipe(ctx, result)
+
+    @staticmethod
+    def reject(ctx: RunContext[Deps], rejection: Rejection):
+        """Count the rejection, record a structured event and send the reason back to the model."""
+        record_retry(rejection.reason)
+        failure_analytics.record_event("retry", rejection.reason, rejection.missing, usage=ctx.usage, model=ctx.model, model_retry=ctx.retry)
+        ctx.deps.last_rejection = rejection.message
+        raise ModelRetry(rejection.message)
+
+    def check_recipe(self, ctx: RunContext[Deps], result: Union[RecipeDetails, NoRecipeFound]) -> Union[RecipeDetails, NoRecipeFound]:
+        if isinstance(result, NoRecipeFound):
+            logger.info('No valid recipe found, retrying...')
+            self.reject(ctx, Rejection("no_recipe", "Retry due to no recipe found."))
+
+        if self.config.repair:
+            # Fix cosmetic issues locally; only genuinely wrong recipes go back to the model
+            result, _ = repair_recipe(result, ctx.deps.specific_ingredients)
+
+        for rule in self.config.rules:
+            rejection = rule(ctx.deps, result)
+            if rejection is not None:
+                self.reject(ctx, rejection)
+
+        failure_analytics.record_event("accepted", "ok", usage=ctx.usage, model=ctx.model, model_retry=ctx.retry)
+        return result
+
+    def make_deps(self, diet: str, cuisine: str, specific_ingredients: List[str], available_ingredients: List[str]) -> Deps:
+        # Drop inventory items the diet rules out so the model never sees them
+        diet_mask = parse_diet(diet)
+        diet_table = DietTable(available_ingredients)
+        return Deps(
+            available_ingredients=diet_table.filter(available_ingredients, diet_mask),
+            user_inputs={"diet": diet, "cuisine": cuisine},
+            specific_ingredients=specific_ingredients,
+            diet_mask=diet_mask,
+            diet_table=diet_table,
+            session=SessionRecipeIndex() if self.config.history == "session" else None,
+        )
+
+    def exemplar_prompt(self, deps: Deps) -> str:
+        """Prompt block with the variant's share of close past recipes, or "" when there are none."""
+        store = get_store()
+        if store is None:
+            return ""
+        return format_exemplars(store.similar(deps.specific_ingredients, deps.diet_mask, deps.user_inputs["cuisine"], self.config.exemplars))
+
+    async def generate(self, deps: Deps, on_recipe: Callable[[RecipeDetails], bool], emitter=None) -> Tuple[Optional[RecipeDetails], Usage]:
+        """Generate recipes until on_recipe accepts one (returns True).
+
+        Returns (recipe, usage summed over completed model runs); recipe is None when generation failed,
+        including after MAX_ATTEMPTS failed attempts. Recipes the caller declines don't count as failures.
+        """
+        config = self.config
+        diet, cuisine = deps.user_inputs["diet"], deps.user_inputs["cuisine"]
+        rate_limiter = get_rate_limiter()
+        streaming = STREAMING_ENABLED and config.streaming
+        message_history = None
+        total_usage = Usage()
+        exemplars = ""
+        attempts = Attempts(rate_limiter, emitter)
+        if config.exemplars:
+            with metrics.stage("retrieval"):
+                exemplars = self.exemplar_prompt(deps)
+
+        while not attempts.exhausted():
+            attempts.start(self.agent.model)
+            with metrics.stage("prompt_build"):
+                prompt = config.build_prompt(diet, cuisine, deps.specific_ingredients, deps.available_ingredients)
+                prompt += exemplars
+                if deps.session is not None:
+                    prompt += deps.session.exclusion_prompt()
+                if config.retry_feedback and attempts.feedback:
+                    prompt += f"\n    **Previous attempt was rejected:** {attempts.feedback}\n"
+            log_payload(logger, "Generated prompt", prompt.strip())
+
+            try:
+                # Queue behind other calls instead of hitting the provider's RPM/TPM limits
+                with metrics.stage("rate_limit_wait"):
+                    reservation = await rate_limiter.acquire(estimate_tokens(prompt))
+                with metrics.stage("model_call"):
+                    if streaming:
+                        # Validates the partial recipe as it streams and aborts early when it can't pass
+                        on_partial = emitter.on_partial if emitter else None
+                        recipe, usage, result = await stream_recipe(self.agent, prompt, deps, message_history=message_history, on_partial=on_partial)
+                    else:
+                        result = await self.agent.run(prompt, deps=deps, message_history=message_history)
+                        recipe, usage = result.data, result.usage()
+                await rate_limiter.record_usage(reservation, usage)
+                total_usage = total_usage + usage
+                attempts.feedback = ""
+
+                if isinstance(recipe, NoRecipeFound):
+                    logger.info("No recipe found, generating another...")
+                    attempts.failed += 1
+                    continue
+
+                logger.info(f"Recipe generated: {recipe.recipe_name}")
+                if on_recipe(recipe):
+                    logger.info("Recipe finalized successfully.")
+                    return recipe, total_usage
+                if deps.session is not None:
+                    deps.session.add(recipe)
+                if config.history == "messages":
+                    message_history = result.all_messages(result_tool_return_content='Please suggest another recipe')
+
+            except Exception as e:
+                retry = attempts.failed_attempt(e, deps.last_rejection)
+                deps.last_rejection = ""
+                if not retry:
+                    return None, total_usage
+        return None, total_usage
+
+
+_engines: Dict[str, RecipeEngine] = {}
+
+
+def get_engine(name: str = DEFAULT_VARIANT) -> RecipeEngine:
+    """The engine for a registered variant, built on first use."""
+    engine = _engines.get(name)
+    if engine is None:
+        engine = _engines[name] = RecipeEngine(VARIANTS[name])
+    return engine
+
+
+def activate_variant(name: str) -> None:
+    """Label the metrics and validation events of this task (and tasks it creates) with the variant serving the request."""
+    metrics.set_variant(name)
+    failure_analytics.set_variant(name)
+
+
+def variant_report() -> List[dict]:
+    """Per-variant latency (metrics file), retry rate and tokens (analytics store) for comparing a rollout."""
+    latency = metrics.summary()
+    rows = {}
+    for group in failure_analytics.failure_summary(group_by=("variant", "outcome")):
+        row = rows.setdefault(group["variant"], {"variant": group["variant"], "events": 0, "retries": 0, "accepted": 0, "tokens_per_accepted": 0.0})
+        row["events"] += group["events"]
+        if group["outcome"] in ("retry", "early_abort"):
+            row["retries"] += group["events"]
+        elif group["outcome"] == "accepted":
+            row["accepted"] = group["events"]
+            row["tokens_per_accepted"] = group["avg_tokens"]
+    for name, row in rows.items():
+        request = latency.get(f"request|{name}", {})
+        row["requests"] = request.get("count", 0)
+        row["p50_ms"] = request.get("p50_ms", 0.0)
+        row["p95_ms"] = request.get("p95_ms", 0.0)
+        row["retry_rate"] = row["retries"] / row["events"] if row["events"] else 0.0
+    return sorted(rows.values(), key=lambda r: r["variant"])
+
+
+if __name__ == "__main__":
+    # python engine.py  -> compare variants served so far
+    print(f"{'variant':12} {'requests':>8} {'p50 ms':>9} {'p95 ms':>9} {'retry%':>7} {'tok/ok':>8}")
+    for row in variant_report():
+        print(f"{row['variant']:12} {row['requests']:>8} {row['p50_ms']:>9.0f} {row['p95_ms']:>9.0f} "
+              f"{row['retry_rate'] * 100:>7.1f} {row['tokens_per_accepted']:>8.0f}")
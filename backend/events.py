@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+from typing import Any, Dict
+
+# server.js sets RECIPE_EVENTS=1 for the streaming endpoint; stdout then carries one JSON event per line
+EVENTS_ENABLED = os.getenv("RECIPE_EVENTS") == "1"
+
+
+def emit(event: str, data: Any) -> None:
+    sys.stdout.write(json.dumps({"event": event, "data": data}) + "\n")
+    sys.stdout.flush()
+
+
+class RecipeEventEmitter:
+    """Turns partial RecipeDetails snapshots into incremental name/ingredient/step events."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.name_sent = False
+        self.ingredients_sent = 0
+        self.steps_sent = 0
+
+    async def on_partial(self, args: Dict[str, Any]) -> None:
+        # Partial parsing drops half-written strings, so everything present here is final
+        if not self.name_sent and isinstance(args.get("recipe_name"), str):
+            emit("name", args["recipe_name"])
+            self.name_sent = True
+
+        ingredients = args.get("ingredients") or []
+        for ingredient in ingredients[self.ingredients_sent:]:
+            emit("ingredient", ingredient)
+        self.ingredients_sent = max(self.ingredients_sent, len(ingredients))
+
+        steps = args.get("steps") or []
+        for idx in range(self.steps_sent, len(steps)):
+            emit("step", {"index": idx + 1, "text": steps[idx]})
+        self.steps_sent = max(self.steps_sent, len(steps))
+
+    def retry(self, reason: str) -> None:
+        # Tell the browser to discard what it rendered for the rejected attempt
+        emit("retry", reason)
+        self.reset()
+
+    def final(self, recipe, timing=None) -> None:
+        emit("recipe", {**recipe.model_dump(), "timing": timing.model_dump() if timing else None})
+
+    def error(self, message: str) -> None:
+        emit("failure", message)
@@ -0,0 +1,224 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import astuple, dataclass, field
+from typing import List, Optional, Sequence
+
+logger = logging.getLogger()
+
+# One row per validation outcome, appended to a local SQLite file in batches; RECIPE_ANALYTICS=0 turns it off
+ANALYTICS_ENABLED = os.getenv("RECIPE_ANALYTICS", "1") != "0"
+ANALYTICS_DB = os.getenv("RECIPE_ANALYTICS_DB", "recipe_analytics.db")
+# Request ID for processes serving one request (agent.py); track_request() overrides it per job or row
+REQUEST_ID = os.getenv("RECIPE_REQUEST_ID") or f"pid-{os.getpid()}"
+# Buffered events are written once this many are waiting or this many seconds passed, and at exit
+FLUSH_EVENTS = int(os.getenv("RECIPE_ANALYTICS_FLUSH_EVENTS", "100"))
+FLUSH_SECONDS = float(os.getenv("RECIPE_ANALYTICS_FLUSH_SECONDS", "30"))
+PROMPT_VARIANT = os.getenv("RECIPE_PROMPT_VARIANT", "agent")
+
+# Reason codes: no_recipe, missing_ingredients, incomplete, diet_violation, duplicate (validator and stream),
+# ok (accepted), plus the exception class name for outcome "error"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS validation_events (
+    ts REAL NOT NULL,
+    request_id TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    model TEXT,
+    attempt INTEGER NOT NULL,
+    model_retry INTEGER NOT NULL,
+    outcome TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    missing TEXT,
+    request_tokens INTEGER,
+    response_tokens INTEGER,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS validation_events_ts ON validation_events (ts);
+"""
+
+
+@dataclass
+class ValidationEvent:
+    ts: float
+    request_id: str
+    variant: str
+    model: Optional[str]
+    attempt: int
+    model_retry: int
+    outcome: str  # accepted | retry | early_abort | error
+    reason: str
+    missing: Optional[str]  # JSON list of required ingredients the recipe lacked
+    request_tokens: Optional[int]
+    response_tokens: Optional[int]
+    latency_ms: float
+
+
+@dataclass
+class _Attempt:
+    number: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    model: Optional[str] = None
+
+
+# Request and attempt of the current task; asyncio tasks copy them when created, so concurrent jobs stay apart
+_request_id: contextvars.ContextVar[str] = contextvars.ContextVar("analytics_request_id", default=REQUEST_ID)
+_current: contextvars.ContextVar[_Attempt] = contextvars.ContextVar("analytics_attempt", default=_Attempt())
+_variant: contextvars.ContextVar[str] = contextvars.ContextVar("analytics_variant", default=PROMPT_VARIANT)
+# Buffered in memory and written in one transaction by flush()
+events: List[ValidationEvent] = []
+_last_flush = time.monotonic()
+
+
+def model_name(model) -> Optional[str]:
+    if model is None or isinstance(model, str):
+        return model
+    return model.name() if hasattr(model, "name") else type(model).__name__
+
+
+def set_variant(name: str) -> None:
+    """Variant label for later events in this task (and tasks it creates)."""
+    _variant.set(name)
+
+
+@contextmanager
+def track_request(request_id: str):
+    """Charge the events inside to request_id, with attempts counted from 1 (one job or bulk row)."""
+    id_token = _request_id.set(request_id)
+    attempt_token = _current.set(_Attempt())
+    try:
+        yield
+    finally:
+        _current.reset(attempt_token)
+        _request_id.reset(id_token)
+
+
+def start_attempt(model=None) -> int:
+    """Mark the start of an outer generation attempt; later events are charged to it."""
+    current = _current.get()
+    current.number += 1
+    current.started = time.perf_counter()
+    if model is not None:
+        current.model = model_name(model)
+    return current.number
+
+
+def record_event(outcome: str, reason: str, missing: Sequence[str] = (), usage=None, model=None, model_retry: int = 0) -> None:
+    if not ANALYTICS_ENABLED:
+        return
+    current = _current.get()
+    events.append(ValidationEvent(
+        ts=time.time(),
+        request_id=_request_id.get(),
+        variant=_variant.get(),
+        model=model_name(model) or current.model,
+        attempt=current.number,
+        model_retry=model_retry,
+        outcome=outcome,
+        reason=reason,
+        missing=json.dumps(list(missing)) if missing else None,
+        # usage is cumulative for the agent run so far
+        request_tokens=getattr(usage, "request_tokens", None),
+        response_tokens=getattr(usage, "response_tokens", None),
+        latency_ms=(time.perf_counter() - current.started) * 1000,
+    ))
+    # Long-running workers write as they go instead of holding every event until exit
+    if len(events) >= FLUSH_EVENTS or time.monotonic() - _last_flush >= FLUSH_SECONDS:
+        flush()
+
+
+def connect(path: str = ANALYTICS_DB) -> sqlite3.Connection:
+    # Concurrent agent processes wait on SQLite's file lock instead of failing
+    conn = sqlite3.connect(path, timeout=10)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def flush(path: str = ANALYTICS_DB) -> None:
+    global _last_flush
+    _last_flush = time.monotonic()
+    if not events:
+        return
+    try:
+        with connect(path) as conn:
+            conn.executemany(
+                f"INSERT INTO validation_events VALUES ({', '.join('?' * len(astuple(events[0])))})",
+                [astuple(e) for e in events],
+            )
+        conn.close()
+    except sqlite3.Error as e:
+        logger.error(f"Could not write validation analytics: {e}")
+    events.clear()
+
+
+_GROUP_COLUMNS = {"reason", "outcome", "variant", "model"}
+
+
+def failure_summary(path: str = ANALYTICS_DB, group_by: Sequence[str] = ("outcome", "reason"), since_hours: Optional[float] = None) -> List[dict]:
+    """Count, latency and token cost per group, costliest (total latency) first."""
+    columns = [c for c in group_by if c in _GROUP_COLUMNS] or ["reason"]
+    cols = ", ".join(columns)
+    where, params = "", []
+    if since_hours is not None:
+        where, params = "WHERE ts >= ?", [time.time() - since_hours * 3600]
+    query = f"""
+        SELECT {cols}, COUNT(*) AS events, COUNT(DISTINCT request_id) AS requests,
+               AVG(latency_ms) AS avg_latency_ms, SUM(latency_ms) AS total_latency_ms,
+               AVG(COALESCE(request_tokens, 0) + COALESCE(response_tokens, 0)) AS avg_tokens,
+               SUM(COALESCE(request_tokens, 0) + COALESCE(response_tokens, 0)) AS total_tokens
+        FROM validation_events {where}
+        GROUP BY {cols}
+        ORDER BY total_latency_ms DESC
+    """
+    conn = connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute(query, params)]
+    finally:
+        conn.close()
+
+
+def top_missing_ingredients(path: str = ANALYTICS_DB, limit: int = 10) -> List[dict]:
+    """Required ingredients the model most often leaves out."""
+    conn = connect(path)
+    try:
+        rows = conn.execute(
+            """
+            SELECT LOWER(j.value) AS ingredient, COUNT(*) AS times
+            FROM validation_events, json_each(validation_events.missing) AS j
+            WHERE missing IS NOT NULL
+            GROUP BY ingredient ORDER BY times DESC LIMIT ?
+            """,
+            (limit,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [{"ingredient": ingredient, "times": times} for ingredient, times in rows]
+
+
+atexit.register(flush)
+
+
+if __name__ == "__main__":
+    # python failure_analytics.py [--by variant,reason] [--since 24] [--json]
+    args = sys.argv[1:]
+    by = args[args.index("--by") + 1].split(",") if "--by" in args else ["outcome", "reason"]
+    since = float(args[args.index("--since") + 1]) if "--since" in args else None
+    rows = failure_summary(group_by=by, since_hours=since)
+    missing = top_missing_ingredients()
+    if "--json" in args:
+        print(json.dumps({"groups": rows, "missing_ingredients": missing}, indent=2))
+    else:
+        label = "|".join(c for c in by if c in _GROUP_COLUMNS) or "reason"
+        print(f"{label:40} {'events':>7} {'reqs':>6} {'avg ms':>9} {'total s':>9} {'avg tok':>8} {'total tok':>10}")
+        for row in rows:
+            key = "|".join(str(row[c]) for c in by if c in row)
+            print(f"{key:40} {row['events']:>7} {row['requests']:>6} {row['avg_latency_ms']:>9.0f} "
+                  f"{row['total_latency_ms'] / 1000:>9.1f} {row['avg_tokens']:>8.0f} {row['total_tokens']:>10}")
+        if missing:
+            print("\nMost often missing: " + ", ".join(f"{m['ingredient']} ({m['times']})" for m in missing))
@@ -0,0 +1,153 @@
+import json
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from typing import Dict, Optional
+
+# Durable queue for the asynchronous job API (POST /jobs): server.js enqueues, job_worker.py processes
+JOBS_PATH = os.getenv("RECIPE_JOBS_PATH", "recipe_jobs.db")
+# A running job whose worker has not finished it or renewed the lease (heartbeat) in time is handed to
+# another worker
+JOB_LEASE_SECONDS = float(os.getenv("RECIPE_JOB_LEASE_SECONDS", "300"))
+# Attempts before a job that keeps losing its worker is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv("RECIPE_JOB_MAX_ATTEMPTS", "3"))
+# Finished jobs are kept this long for polling, then deleted
+JOB_RETENTION_SECONDS = float(os.getenv("RECIPE_JOB_RETENTION_SECONDS", str(24 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    -- queued -> running -> done | failed
+    status TEXT NOT NULL,
+    request TEXT NOT NULL,
+    result TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+
+
+class JobQueue:
+    """SQLite job queue; every state change is one short transaction, so any number of processes can share it."""
+
+    def __init__(self, path: str = JOBS_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def enqueue(self, request: dict) -> str:
+        job_id = uuid.uuid4().hex
+        self.conn.execute("INSERT INTO jobs (id, status, request, created) VALUES (?, 'queued', ?, ?)",
+                          (job_id, json.dumps(request), time.time()))
+        return job_id
+
+    def claim(self, worker: str) -> Optional[dict]:
+        """Take the oldest queued job (or one whose lease ran out); None when there is nothing to do."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs of a crashed worker go back to the queue, or fail once they have used up their attempts
+            self.conn.execute("UPDATE jobs SET status = 'failed', finished = ?, result = ? "
+                              "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                              (now, json.dumps({"status": "failed", "error": "Worker lost the job too many times"}), now, JOB_MAX_ATTEMPTS))
+            self.conn.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND lease_until < ?", (now,))
+            row = self.conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, lease_until = ?, started = ? "
+                "WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1) "
+                "RETURNING id, request, attempts",
+                (worker, now + JOB_LEASE_SECONDS, now),
+            ).fetchone()
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return {"id": row[0], "request": json.loads(row[1]), "attempts": row[2]}
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """Extend the lease of a job this worker is still running; False once it was handed to someone else."""
+        cursor = self.conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                                   (time.time() + JOB_LEASE_SECONDS, job_id, worker))
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: str, worker: str, result: dict) -> bool:
+        """Store the result; False (and nothing written) when the job is no longer this worker's."""
+        status = "done" if result.get("status") == "ok" else "failed"
+        cursor = self.conn.execute("UPDATE jobs SET status = ?, result = ?, finished = ?, lease_until = NULL "
+                                   "WHERE id = ? AND worker = ? AND status = 'running'",
+                                   (status, json.dumps(result), time.time(), job_id, worker))
+        return cursor.rowcount == 1
+
+    def release(self, job_id: str, worker: str) -> None:
+        """Return a job a stopping worker did not finish to the queue, in its original place."""
+        self.conn.execute("UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, attempts = attempts - 1 "
+                          "WHERE id = ? AND worker = ? AND status = 'running'", (job_id, worker))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self.conn.execute("SELECT status, result, created, started, finished FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        status, result, created, started, finished = row
+        job = {"id": job_id, "status": status, "created": created, "started": started, "finished": finished,
+               "result": json.loads(result) if result else None}
+        if status == "queued":
+            job["position"] = self.conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created <= ?",
+                                                (created,)).fetchone()[0]
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in ("queued", "running", "done", "failed")}
+
+    def purge(self, older_than: float = JOB_RETENTION_SECONDS) -> int:
+        cursor = self.conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished < ?", (time.time() - older_than,))
+        return cursor.rowcount
+
+
+def serve_jobs() -> None:
+    """Answer one JSON request per stdin line ({"id", "op": "enqueue" | "get" | "stats", ...}) with one JSON line.
+
+    server.js keeps a single long-lived process on this loop, like recipe_store.py --serve.
+    """
+    queue = JobQueue()
+    queue.purge()
+    for line in sys.stdin:
+        request = {}
+        try:
+            request = json.loads(line)
+            op = request.get("op")
+            if op == "enqueue":
+                response = {"job": queue.enqueue(request["request"])}
+            elif op == "get":
+                response = {"job": queue.get(str(request.get("job", "")))}
+            elif op == "stats":
+                response = {"stats": queue.stats()}
+            else:
+                raise ValueError(f"unknown op {op!r}")
+            response["id"] = request.get("id")
+        except (ValueError, TypeError, KeyError, sqlite3.Error) as e:
+            response = {"id": request.get("id") if isinstance(request, dict) else None, "error": str(e)}
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    # python job_queue.py          -> job counts by status
+    # python job_queue.py --serve  -> JSON-lines queue access for server.js
+    if "--serve" in sys.argv:
+        serve_jobs()
+        sys.exit(0)
+    print(json.dumps(JobQueue().stats()))
@@ -0,0 +1,125 @@
+import metrics  # imported first so it can time the remaining imports
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from agent import get_available_ingredients, logger
+from bulk_generate import generate_row
+from engine import activate_variant, get_engine
+from job_queue import JOB_LEASE_SECONDS, JobQueue
+from recipe_store import get_store
+from repair import log_repair_stats
+from variants import VARIANTS, choose_variant
+
+# python job_worker.py [--concurrency 2] [--variant agent]
+#
+# Pulls jobs from the queue (job_queue.py) at its own pace and writes each result document back to it.
+# Each job is served by the variant choose_variant picks for its job ID (the RECIPE_VARIANT_WEIGHTS split,
+# like direct requests); --variant pins one instead.
+# Any number of workers, on this machine, can share one queue. SIGTERM or Ctrl-C stops taking new jobs
+# and puts the unfinished ones back in the queue for the next worker. While a job runs its lease is
+# renewed every third of RECIPE_JOB_LEASE_SECONDS; a job whose lease went to another worker is dropped.
+
+JOB_WORKER_CONCURRENCY = int(os.getenv("RECIPE_JOB_WORKER_CONCURRENCY", "2"))
+# How long an idle worker waits before looking at the queue again
+JOB_POLL_SECONDS = float(os.getenv("RECIPE_JOB_POLL_SECONDS", "0.5"))
+# A generation still running after this many seconds fails the job (timed out); 0 means no limit
+JOB_TIMEOUT_SECONDS = float(os.getenv("RECIPE_JOB_TIMEOUT_SECONDS", "300"))
+
+
+async def run_worker(concurrency: int, pinned: Optional[str] = None) -> None:
+    available = get_available_ingredients("ingredients.xlsx")
+    store = get_store()
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    # Queue calls can wait seconds on another process's SQLite lock; one dedicated thread keeps them off the
+    # event loop (heartbeats and generations keep running) and in order on the connection it owns
+    queue_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-queue")
+
+    async def in_queue_thread(call, *args):
+        return await loop.run_in_executor(queue_thread, call, *args)
+
+    queue = await in_queue_thread(JobQueue)
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except (NotImplementedError, AttributeError):
+            pass
+
+    async def work() -> None:
+        while not stopping.is_set():
+            job = await in_queue_thread(queue.claim, name)
+            if job is None:
+                try:
+                    await asyncio.wait_for(stopping.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            request = job["request"]
+            variant = pinned or choose_variant(job["id"])
+            # Labels this job's metrics and validation events; the generation task copies it
+            activate_variant(variant)
+            logger.info(f"Job {job['id']} started (attempt {job['attempts']}, variant {variant})")
+            if store is not None:
+                # Job requests count toward warm-up frequencies like direct ones
+                store.record_request(request["diet"], request["cuisine"], request["ingredients"])
+            task = asyncio.ensure_future(generate_row(get_engine(variant), available, 0, request, variant, request_id=job["id"],
+                                                      timeout=JOB_TIMEOUT_SECONDS))
+            stop = asyncio.ensure_future(stopping.wait())
+            lost = False
+            while not (task.done() or stop.done()):
+                await asyncio.wait([task, stop], timeout=JOB_LEASE_SECONDS / 3, return_when=asyncio.FIRST_COMPLETED)
+                if not (task.done() or stop.done()) and not await in_queue_thread(queue.heartbeat, job["id"], name):
+                    lost = True
+                    break
+            stop.cancel()
+            if lost:
+                task.cancel()
+                logger.warning(f"Job {job['id']} lost its lease to another worker, dropped")
+                continue
+            if not task.done():
+                task.cancel()
+                await in_queue_thread(queue.release, job["id"], name)
+                logger.info(f"Job {job['id']} returned to the queue")
+                return
+            try:
+                result, _ = task.result()
+                result.pop("row", None)
+            except Exception as e:
+                logger.error(f"Job {job['id']} failed: {e}")
+                result = {"status": "failed", "request_id": job["id"], "input": request, "error": "Recipe generation failed"}
+            if not await in_queue_thread(queue.finish, job["id"], name, result):
+                logger.warning(f"Job {job['id']} lost its lease to another worker, result dropped")
+                continue
+            logger.info(f"Job {job['id']} {result['status']}")
+            # One line per finished job for whoever started the worker (server.js pushes it to SSE listeners)
+            print(json.dumps({"job": job["id"], "status": result["status"]}), flush=True)
+
+    try:
+        await asyncio.gather(*(work() for _ in range(max(1, concurrency))))
+    finally:
+        queue_thread.shutdown()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Process recipe jobs from the job queue.")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY)
+    parser.add_argument("--variant", default=None, choices=sorted(VARIANTS), help="serve every job with this variant")
+    args = parser.parse_args(argv)
+    metrics.record_process_start()
+    try:
+        asyncio.run(run_worker(args.concurrency, args.variant))
+    finally:
+        log_repair_stats()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+// Load generator for the recipe server.
+//
+// Start the server offline first:   RECIPE_MOCK_MODEL=1 node server.js
+// Then:                             node load_test.js --rate 2 --duration 60
+//                                   node load_test.js --concurrency 8 --duration 60
+//
+// --rate N         open loop: N requests/second regardless of how fast the server answers
+// --concurrency N  closed loop: N clients, each sending its next request as soon as the last returns
+// --url URL        target (default http://localhost:3000/submit)
+// --timeout S      per-request timeout in seconds (default 120)
+// --json FILE      also write the full report to FILE
+// --cache 1        let the server answer repeated payloads from its result cache (default: bypass it)
+//
+// Every second the number of python processes and their total RSS are sampled with `ps`, so the
+// report shows how the spawn-per-request design scales, not just how fast it answers.
+const http = require('http');
+const { execFile } = require('child_process');
+
+// Realistic form payloads, mirroring what people type into frontend/form.html
+const PAYLOADS = [
+    { diet: 'vegetarian', cuisine: 'Indian', ingredients: 'Potatoes, Onions, Garam Masala' },
+    { diet: 'vegan', cuisine: 'Indian', ingredients: 'Toor Dal, Tomatoes, Garlic' },
+    { diet: 'vegetarian', cuisine: 'Italian', ingredients: 'tomato, basil, mozzarella' },
+    { diet: 'gluten-free', cuisine: 'Mexican', ingredients: 'Rice, Green Chilies, Lemon' },
+    { diet: 'vegetarian, no eggs', cuisine: 'Indian', ingredients: 'Curd (Yogurt), Moong Dal' },
+    { diet: 'vegan', cuisine: 'Thai', ingredients: 'Coconut Powder/Desiccated Coconut, Ginger' },
+    { diet: 'vegetarian', cuisine: 'Chinese', ingredients: 'Maggi Noodles/Instant Noodles, Garlic, Green Chilies' },
+    { diet: 'jain', cuisine: 'Indian', ingredients: 'Rice, Toor Dal' },
+    { diet: '', cuisine: 'South Indian', ingredients: 'Rice, Moong Dal, Mustard Seeds (Rai)' },
+    { diet: 'pescatarian', cuisine: 'Bengali', ingredients: 'Mustard Seeds (Rai), Turmeric Powder, Green Chilies' },
+];
+
+function parseArgs(argv) {
+    const args = { url: 'http://localhost:3000/submit', rate: 0, concurrency: 0, duration: 30, timeout: 120, json: null, cache: 0 };
+    for (let i = 0; i < argv.length; i += 2) {
+        const key = argv[i].replace(/^--/, '');
+        if (!(key in args)) {
+            console.error(`Unknown option --${key}`);
+            process.exit(2);
+        }
+        args[key] = typeof args[key] === 'number' ? Number(argv[i + 1]) : argv[i + 1];
+    }
+    if (!args.rate && !args.concurrency) args.concurrency = 1;
+    return args;
+}
+
+function percentile(sorted, p) {
+    if (!sorted.length) return 0;
+    return sorted[Math.min(sorted.length - 1, Math.ceil((p / 100) * sorted.length) - 1)];
+}
+
+// POST one form payload; resolves to { ok, status, error, ms } and never rejects
+function sendRequest(url, payload, timeoutMs, useCache = false) {
+    const body = new URLSearchParams(payload).toString();
+    const started = process.hrtime.bigint();
+    const elapsed = () => Number(process.hrtime.bigint() - started) / 1e6;
+    return new Promise((resolve) => {
+        const req = http.request(url, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'Content-Length': Buffer.byteLength(body),
+                ...(useCache ? {} : { 'Cache-Control': 'no-cache' })
+            },
+            timeout: timeoutMs,
+        }, (res) => {
+            let text = '';
+            res.on('data', (chunk) => { text += chunk; });
+            res.on('end', () => {
+                if (res.statusCode !== 200) {
+                    resolve({ ok: false, status: res.statusCode, error: `http_${res.statusCode}`, ms: elapsed() });
+                } else if (!text.includes('Recipe Name:')) {
+                    // Guard against pages that are not a rendered recipe
+                    resolve({ ok: false, status: 200, error: 'no_recipe', ms: elapsed() });
+                } else {
+                    resolve({ ok: true, status: 200, error: null, ms: elapsed() });
+                }
+            });
+        });
+        req.on('timeout', () => req.destroy(new Error('timeout')));
+        req.on('error', (err) => {
+            resolve({ ok: false, status: 0, error: err.message === 'timeout' ? 'timeout' : (err.code || 'network'), ms: elapsed() });
+        });
+        req.end(body);
+    });
+}
+
+// Count python processes and sum their RSS (KB); zeros where ps is unavailable
+function sampleProcesses() {
+    return new Promise((resolve) => {
+        execFile('ps', ['-eo', 'rss=,comm='], (err, stdout) => {
+            if (err) return resolve({ pythonProcs: 0, pythonRssKb: 0 });
+            let pythonProcs = 0;
+            let pythonRssKb = 0;
+            for (const line of stdout.split('\n')) {
+                const match = line.trim().match(/^(\d+)\s+(.*)$/);
+                if (match && /python/.test(match[2])) {
+                    pythonProcs += 1;
+                    pythonRssKb += Number(match[1]);
+                }
+            }
+            resolve({ pythonProcs, pythonRssKb });
+        });
+    });
+}
+
+async function run(args) {
+    const results = [];
+    const timeline = [];
+    const inFlight = new Set();
+    const startedAt = Date.now();
+    const deadline = startedAt + args.duration * 1000;
+    let sent = 0;
+
+    const fire = () => {
+        const payload = PAYLOADS[sent % PAYLOADS.length];
+        sent += 1;
+        const promise = sendRequest(args.url, payload, args.timeout * 1000, Boolean(args.cache)).then((result) => {
+            result.completedAt = Date.now() - startedAt;
+            results.push(result);
+            inFlight.delete(promise);
+        });
+        inFlight.add(promise);
+        return promise;
+    };
+
+    const sampler = setInterval(async () => {
+        const t = Math.round((Date.now() - startedAt) / 1000);
+        const procs = await sampleProcesses();
+        const done = results.length;
+        timeline.push({ t, inFlight: inFlight.size, completed: done, ...procs });
+        process.stderr.write(`\r t=${t}s in-flight=${inFlight.size} done=${done} python=${procs.pythonProcs} rss=${(procs.pythonRssKb / 1024).toFixed(0)}MB   `);
+    }, 1000);
+
+    if (args.rate) {
+        // Open loop: schedule arrivals on a fixed clock so a slow server builds a backlog
+        const interval = 1000 / args.rate;
+        let next = Date.now();
+        while (next < deadline) {
+            fire();
+            next += interval;
+            await new Promise((r) => setTimeout(r, Math.max(0, next - Date.now())));
+        }
+    } else {
+        const client = async () => {
+            while (Date.now() < deadline) await fire();
+        };
+        await Promise.all(Array.from({ length: args.concurrency }, client));
+    }
+    await Promise.all(inFlight);
+    clearInterval(sampler);
+    process.stderr.write('\n');
+    return { results, timeline, wallS: (Date.now() - startedAt) / 1000, sent };
+}
+
+function report(args, { results, timeline, wallS, sent }) {
+    const ok = results.filter((r) => r.ok);
+    const latencies = ok.map((r) => r.ms).sort((a, b) => a - b);
+    const errors = {};
+    for (const r of results) if (!r.ok) errors[r.error] = (errors[r.error] || 0) + 1;
+
+    const summary = {
+        mode: args.rate ? `open loop, ${args.rate} req/s` : `closed loop, ${args.concurrency} clients`,
+        url: args.url,
+        sent,
+        completed: results.length,
+        succeeded: ok.length,
+        errorRate: results.length ? (results.length - ok.length) / results.length : 0,
+        errors,
+        throughputRps: ok.length / wallS,
+        latencyMs: {
+            p50: percentile(latencies, 50),
+            p95: percentile(latencies, 95),
+            p99: percentile(latencies, 99),
+            max: latencies.length ? latencies[latencies.length - 1] : 0,
+        },
+        peakPythonProcs: Math.max(0, ...timeline.map((s) => s.pythonProcs)),
+        peakPythonRssMb: Math.max(0, ...timeline.map((s) => s.pythonRssKb)) / 1024,
+        wallS,
+    };
+
+    console.log(`Mode:        ${summary.mode} against ${summary.url}`);
+    console.log(`Requests:    ${summary.sent} sent, ${summary.completed} completed, ${summary.succeeded} ok in ${wallS.toFixed(1)}s`);
+    console.log(`Throughput:  ${summary.throughputRps.toFixed(2)} recipes/s`);
+    console.log(`Latency ms:  p50 ${summary.latencyMs.p50.toFixed(0)}  p95 ${summary.latencyMs.p95.toFixed(0)}  p99 ${summary.latencyMs.p99.toFixed(0)}  max ${summary.latencyMs.max.toFixed(0)}`);
+    console.log(`Errors:      ${(summary.errorRate * 100).toFixed(1)}% ${JSON.stringify(errors)}`);
+    console.log(`Python:      peak ${summary.peakPythonProcs} processes, ${summary.peakPythonRssMb.toFixed(0)} MB RSS`);
+    console.log('\n   t  in-flight  done  python  rss MB');
+    for (const s of timeline) {
+        console.log(`${String(s.t).padStart(4)}  ${String(s.inFlight).padStart(9)}  ${String(s.completed).padStart(4)}  ${String(s.pythonProcs).padStart(6)}  ${(s.pythonRssKb / 1024).toFixed(0).padStart(6)}`);
+    }
+    return { ...summary, timeline };
+}
+
+if (require.main === module) {
+    const args = parseArgs(process.argv.slice(2));
+    run(args).then((outcome) => {
+        const full = report(args, outcome);
+        if (args.json) require('fs').writeFileSync(args.json, JSON.stringify(full, null, 2));
+    });
+}
+
+module.exports = { sendRequest, sampleProcesses, PAYLOADS };
@@ -0,0 +1,136 @@
+import atexit
+import hashlib
+import logging
+import logging.handlers
+import os
+import queue
+import random
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOG_FILE = os.getenv("RECIPE_LOG_FILE", "recipe_generation.log")
+LOG_LEVEL = os.getenv("RECIPE_LOG_LEVEL", "DEBUG")
+CONSOLE_LOG_LEVEL = os.getenv("RECIPE_CONSOLE_LOG_LEVEL", "INFO")
+LOG_MAX_BYTES = int(os.getenv("RECIPE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("RECIPE_LOG_BACKUPS", "5"))
+# "1" gives every process its own recipe_generation.<pid>.log instead of one shared, locked file
+LOG_PER_PROCESS = os.getenv("RECIPE_LOG_PER_PROCESS") == "1"
+# Large payloads (prompts) are logged in full for this fraction of calls, otherwise as hash + preview
+PAYLOAD_SAMPLE_RATE = float(os.getenv("RECIPE_LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+PAYLOAD_PREVIEW_CHARS = 200
+MAX_MESSAGE_CHARS = 4096
+
+FORMAT = "%(asctime)s - %(process)d - %(levelname)s - %(message)s"
+
+_listener = None
+
+
+class LockedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Size-rotating file handler that several processes can share.
+
+    Writes and rollovers happen under an flock on a sidecar lock file, and the stream is reopened
+    when another process has rotated the file underneath us.
+    """
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, **kwargs)
+        self._lock_file = open(filename + ".lock", "a") if fcntl is not None else None
+
+    def _rotated_elsewhere(self) -> bool:
+        try:
+            return os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except (FileNotFoundError, AttributeError, ValueError):
+            return True
+
+    def emit(self, record):
+        if self._lock_file is None:
+            return super().emit(record)
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            if self.stream is not None and self._rotated_elsewhere():
+                self.stream.close()
+                self.stream = None
+            if self.stream is None:
+                self.stream = self._open()
+            super().emit(record)
+            self.flush()
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def close(self):
+        super().close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class TruncateLargeMessages(logging.Filter):
+    """Safety net: no single record writes more than MAX_MESSAGE_CHARS."""
+
+    def filter(self, record):
+        message = record.getMessage()
+        if len(message) > MAX_MESSAGE_CHARS:
+            record.msg = f"{message[:MAX_MESSAGE_CHARS]}... [truncated {len(message) - MAX_MESSAGE_CHARS} chars]"
+            record.args = None
+        return True
+
+
+def log_payload(logger: logging.Logger, label: str, payload: str, level: int = logging.DEBUG) -> None:
+    """Log a large payload (e.g. a prompt) cheaply: sampled in full, otherwise as sha1 + length + preview."""
+    if not logger.isEnabledFor(level):
+        return
+    digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+    if random.random() < PAYLOAD_SAMPLE_RATE:
+        logger.log(level, "%s [sha1=%s, %d chars]: %s", label, digest, len(payload), payload)
+    else:
+        preview = " ".join(payload[:PAYLOAD_PREVIEW_CHARS].split())
+        logger.log(level, "%s [sha1=%s, %d chars]: %s...", label, digest, len(payload), preview)
+
+
+def configure_logging() -> logging.Logger:
+    """Route the root logger through a queue; a background listener thread does the disk and console I/O."""
+    global _listener
+    logger = logging.getLogger()
+    if _listener is not None:
+        return logger
+
+    filename = LOG_FILE
+    if LOG_PER_PROCESS:
+        root, ext = os.path.splitext(LOG_FILE)
+        filename = f"{root}.{os.getpid()}{ext}"
+        file_handler = logging.handlers.RotatingFileHandler(filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    else:
+        file_handler = LockedRotatingFileHandler(filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    file_handler.setFormatter(logging.Formatter(FORMAT))
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(CONSOLE_LOG_LEVEL)
+    console_handler.setFormatter(logging.Formatter(FORMAT))
+
+    # Unbounded queue: logging calls never wait on the disk
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(TruncateLargeMessages())
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    logger.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return logger
+
+
+def stop_logging() -> None:
+    """Drain the queue and close the handlers."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,256 @@
+import metrics  # imported first so it can time the remaining imports
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from pydantic_ai import Agent, ModelRetry, RunContext
+from pydantic_ai.usage import Usage
+
+import failure_analytics
+from agent import logger
+from dedup import SessionRecipeIndex
+from diet import DietTable, diet_names, parse_diet
+from engine import DEFAULT_MODEL, Attempts, RecipeDetails
+from logging_setup import log_payload
+from mock_model import MOCK_MODEL_ENABLED, make_mock_model
+from quantity import InventoryIndex, Quantity, describe_inventory, format_quantity, load_inventory, parse_quantity
+from rate_limiter import estimate_tokens, get_rate_limiter
+from recipe_store import get_store
+from repair import record_retry, repair_recipe
+
+# Recipes requested per model call; a week of dinners fits one call, longer plans take a few
+MEAL_PLAN_BATCH = int(os.getenv("RECIPE_MEAL_PLAN_BATCH", "7"))
+# Expected output per planned recipe, for the rate limiter's token reservation
+_TOKENS_PER_RECIPE = 350
+
+
+class PlannedRecipe(BaseModel):
+    recipe_name: str
+    ingredients: List[str]
+    # Amount of each ingredient for the whole dish, same order as ingredients ("200 g", "2 tbsp", "3")
+    quantities: List[str]
+    steps: List[str]
+    step_times: List[str]
+
+    def details(self) -> RecipeDetails:
+        return RecipeDetails(recipe_name=self.recipe_name, ingredients=self.ingredients, steps=self.steps, step_times=self.step_times)
+
+
+class MealPlan(BaseModel):
+    recipes: List[PlannedRecipe]
+
+
+@dataclass
+class PlanDeps:
+    meals: int
+    diet_mask: int
+    diet_table: DietTable
+    inventory: InventoryIndex
+    # What is left of each inventory item for this batch (earlier batches already took their share)
+    remaining: Dict[str, Optional[Quantity]]
+    session: SessionRecipeIndex = field(default_factory=SessionRecipeIndex)
+    specific_ingredients: List[str] = field(default_factory=list)
+    # Message of the validator's latest rejection, for the next attempt's prompt
+    last_rejection: str = ""
+
+
+SYSTEM_PROMPT = '''
+    You are an AI Chef planning several meals at once from one shared pantry.
+    Every recipe must be different, respect the diet, and give the amount used of each ingredient.
+    Together the recipes must not use more of a pantry item than is available.
+'''
+
+
+def plan_prompt(deps: PlanDeps, diet: str, cuisine: str, specific_ingredients: List[str]) -> str:
+    return f'''
+    **Meals:** {deps.meals}
+    **Diet:** {diet}
+    **Cuisine:** {cuisine}
+    **Use where possible:** {", ".join(specific_ingredients)}
+    **Pantry (shared by all meals):** {", ".join(describe_inventory(deps.remaining))}
+    '''
+
+
+def plan_usage(recipes: List[PlannedRecipe], inventory: InventoryIndex) -> Dict[str, Dict[str, float]]:
+    """Inventory item -> {base unit: total amount} the recipes use; unparsable amounts are skipped."""
+    used: Dict[str, Dict[str, float]] = {}
+    for recipe in recipes:
+        for ingredient, amount in zip(recipe.ingredients, recipe.quantities):
+            item = inventory.find(ingredient)
+            quantity = parse_quantity(amount)
+            if item is None or quantity is None:
+                continue
+            by_unit = used.setdefault(item, {})
+            by_unit[quantity.unit] = by_unit.get(quantity.unit, 0.0) + quantity.high
+    return used
+
+
+def check_plan(deps: PlanDeps, plan: MealPlan) -> List[str]:
+    """Everything wrong with a plan, as messages for the model; empty when it can be served."""
+    problems = []
+    if len(plan.recipes) != deps.meals:
+        problems.append(f"The plan must have exactly {deps.meals} recipes, not {len(plan.recipes)}.")
+    seen = SessionRecipeIndex()
+    for recipe in plan.recipes:
+        if not recipe.ingredients or not recipe.steps:
+            problems.append(f"'{recipe.recipe_name}' is incomplete.")
+        if len(recipe.quantities) != len(recipe.ingredients):
+            problems.append(f"'{recipe.recipe_name}' needs one quantity per ingredient.")
+        violations = deps.diet_table.violations(recipe.ingredients, deps.diet_mask)
+        if violations:
+            problems.append(f"'{recipe.recipe_name}' is not {', '.join(diet_names(deps.diet_mask))}: {', '.join(violations)}.")
+        duplicate = seen.find_duplicate(recipe.recipe_name, recipe.ingredients, recipe.steps) or \
+            deps.session.find_duplicate(recipe.recipe_name, recipe.ingredients, recipe.steps)
+        if duplicate:
+            problems.append(f"'{recipe.recipe_name}' is too similar to '{duplicate}'.")
+        seen.add(recipe)
+
+    # Aggregate check against the lower end of the pantry range (what is surely there)
+    for item, by_unit in plan_usage(plan.recipes, deps.inventory).items():
+        available = deps.remaining.get(item)
+        if available is None or available.unit not in by_unit:
+            continue
+        if by_unit[available.unit] > available.low:
+            problems.append(f"Together the recipes use {format_quantity(by_unit[available.unit], available.unit)} of {item}, "
+                            f"but only {format_quantity(available.low, available.unit)} is available.")
+    return problems
+
+
+def subtract_usage(remaining: Dict[str, Optional[Quantity]], used: Dict[str, Dict[str, float]]) -> Dict[str, Optional[Quantity]]:
+    left = dict(remaining)
+    for item, by_unit in used.items():
+        quantity = left.get(item)
+        if quantity is not None and quantity.unit in by_unit:
+            amount = by_unit[quantity.unit]
+            left[item] = replace(quantity, low=max(0.0, quantity.low - amount), high=max(0.0, quantity.high - amount), text="")
+    return left
+
+
+def build_plan_agent(model=None) -> Agent:
+    # RECIPE_MOCK_MODEL=1 plans offline like agent.py
+    agent = Agent[PlanDeps, MealPlan](
+        model=model or (make_mock_model() if MOCK_MODEL_ENABLED else DEFAULT_MODEL),
+        result_type=MealPlan,
+        system_prompt=SYSTEM_PROMPT,
+        result_retries=3,
+    )
+
+    @agent.result_validator
+    async def validate_plan(ctx: RunContext[PlanDeps], plan: MealPlan) -> MealPlan:
+        with metrics.stage("validate"):
+            # Cosmetic fixes locally, like single recipes (RecipeEngine.check_recipe); ingredients keep their
+            # positions, so the quantities still line up
+            plan = plan.model_copy(update={"recipes": [repair_recipe(recipe, ctx.deps.specific_ingredients)[0] for recipe in plan.recipes]})
+            problems = check_plan(ctx.deps, plan)
+        if problems:
+            logger.info(f"Meal plan rejected: {' '.join(problems)}")
+            record_retry("meal_plan")
+            failure_analytics.record_event("retry", "meal_plan", usage=ctx.usage, model=ctx.model, model_retry=ctx.retry)
+            ctx.deps.last_rejection = "Fix the plan: " + " ".join(problems)
+            raise ModelRetry(ctx.deps.last_rejection)
+        failure_analytics.record_event("accepted", "ok", usage=ctx.usage, model=ctx.model, model_retry=ctx.retry)
+        return plan
+
+    return agent
+
+
+async def generate_meal_plan(meals: int, diet: str, cuisine: str, specific_ingredients: List[str],
+                             inventory_path: str = "ingredients.xlsx", agent: Optional[Agent] = None) -> Tuple[List[PlannedRecipe], Usage, Dict[str, Optional[Quantity]]]:
+    """Plan `meals` recipes in ceil(meals / MEAL_PLAN_BATCH) structured calls against one pantry snapshot.
+
+    Each batch is retried like a single recipe (engine.Attempts: rejections, rate limits, MAX_ATTEMPTS).
+    Returns (recipes, usage, pantry left afterwards); fewer recipes than asked for when a batch failed.
+    """
+    agent = agent or build_plan_agent()
+    with metrics.stage("inventory_load"):
+        diet_mask = parse_diet(diet)
+        inventory = load_inventory(inventory_path)
+        diet_table = DietTable(inventory)
+        # Items the diet rules out are not offered at all
+        remaining = {name: quantity for name, quantity in inventory.items() if diet_table.is_compatible(name, diet_mask)}
+    index = InventoryIndex(list(remaining))
+    session = SessionRecipeIndex()
+    rate_limiter = get_rate_limiter()
+    recipes: List[PlannedRecipe] = []
+    total_usage = Usage()
+
+    for batch in range(math.ceil(meals / MEAL_PLAN_BATCH)):
+        deps = PlanDeps(min(MEAL_PLAN_BATCH, meals - len(recipes)), diet_mask, diet_table, index, remaining, session,
+                        specific_ingredients)
+        attempts = Attempts(rate_limiter)
+        plan: Optional[MealPlan] = None
+        while plan is None and not attempts.exhausted():
+            attempts.start(agent.model)
+            with metrics.stage("prompt_build"):
+                prompt = plan_prompt(deps, diet, cuisine, specific_ingredients) + session.exclusion_prompt()
+                if attempts.feedback:
+                    prompt += f"\n    **Previous plan was rejected:** {attempts.feedback}\n"
+            log_payload(logger, "Meal plan prompt", prompt.strip())
+            try:
+                with metrics.stage("rate_limit_wait"):
+                    reservation = await rate_limiter.acquire(estimate_tokens(prompt, _TOKENS_PER_RECIPE * deps.meals))
+                with metrics.stage("model_call"):
+                    result = await agent.run(prompt, deps=deps)
+            except Exception as e:
+                retry = attempts.failed_attempt(e, deps.last_rejection)
+                deps.last_rejection = ""
+                if not retry:
+                    break
+                continue
+            await rate_limiter.record_usage(reservation, result.usage())
+            total_usage = total_usage + result.usage()
+            plan = result.data
+        if plan is None:
+            logger.error(f"Meal plan batch {batch + 1} failed")
+            break
+        recipes.extend(plan.recipes)
+        for recipe in plan.recipes:
+            session.add(recipe)
+        remaining = subtract_usage(remaining, plan_usage(plan.recipes, index))
+    return recipes, total_usage, remaining
+
+
+def print_plan(recipes: List[PlannedRecipe], remaining: Dict[str, Optional[Quantity]]) -> None:
+    for day, recipe in enumerate(recipes, 1):
+        print(f"Meal {day}: {recipe.recipe_name}")
+        print("  Ingredients: " + ", ".join(f"{amount} {ingredient}" for ingredient, amount in zip(recipe.ingredients, recipe.quantities)))
+        for idx, (step, step_time) in enumerate(zip(recipe.steps, recipe.step_times), 1):
+            print(f"  {idx}. {step} (Time: {step_time})")
+    print("Pantry left: " + ", ".join(describe_inventory(remaining)))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Plan several meals from one shared pantry.")
+    parser.add_argument("meals", type=int)
+    parser.add_argument("diet")
+    parser.add_argument("cuisine")
+    parser.add_argument("ingredients", nargs="?", default="", help="comma-separated ingredients to use where possible")
+    parser.add_argument("--json", action="store_true", help="print the plan as JSON")
+    args = parser.parse_args(argv)
+
+    specific = [i.strip() for i in args.ingredients.split(",") if i.strip()]
+    with metrics.stage("request"):
+        recipes, usage, remaining = asyncio.run(generate_meal_plan(args.meals, args.diet, args.cuisine, specific))
+    store = get_store()
+    if store is not None:
+        with metrics.stage("store_write"):
+            store.add_many((recipe.details(), args.cuisine) for recipe in recipes)
+    if args.json:
+        print(json.dumps({
+            "recipes": [recipe.model_dump() for recipe in recipes],
+            "usage": {"requests": usage.requests, "total_tokens": usage.total_tokens or 0},
+        }, indent=2))
+    else:
+        print_plan(recipes, remaining)
+        print(f"{len(recipes)}/{args.meals} meals, {usage.requests} model calls, {usage.total_tokens or 0} tokens")
+    return 0 if len(recipes) == args.meals else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import atexit
+import contextvars
+import json
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Imported first by agent.py so this marks the start of module imports
+IMPORT_STARTED = time.perf_counter()
+
+METRICS_FILE = os.getenv("RECIPE_METRICS_FILE", "recipe_metrics.json")
+PROMPT_VARIANT = os.getenv("RECIPE_PROMPT_VARIANT", "agent")
+# Long-running processes (job_worker.py, bulk_generate.py) merge their histograms into the file this often
+FLUSH_INTERVAL_SECONDS = float(os.getenv("RECIPE_METRICS_FLUSH_SECONDS", "30"))
+
+# Log-scale buckets: 1ms * 1.25^i, i.e. ~25% resolution from 1ms up to hours
+_BUCKET_BASE = 0.001
+_BUCKET_GROWTH = 1.25
+
+
+def _bucket(seconds: float) -> int:
+    if seconds <= _BUCKET_BASE:
+        return 0
+    return int(math.log(seconds / _BUCKET_BASE, _BUCKET_GROWTH)) + 1
+
+
+def _bucket_upper(idx: int) -> float:
+    return _BUCKET_BASE * _BUCKET_GROWTH ** idx
+
+
+class LatencyHistogram:
+    """Sparse log-bucket histogram; mergeable across processes by adding counts."""
+
+    def __init__(self, counts: Optional[Dict[int, int]] = None, total: float = 0.0, count: int = 0, maximum: float = 0.0):
+        self.counts = counts or {}
+        self.total = total
+        self.count = count
+        self.maximum = maximum
+
+    def record(self, seconds: float) -> None:
+        idx = _bucket(seconds)
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.total += seconds
+        self.count += 1
+        self.maximum = max(self.maximum, seconds)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for idx, n in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + n
+        self.total += other.total
+        self.count += other.count
+        self.maximum = max(self.maximum, other.maximum)
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return min(_bucket_upper(idx), self.maximum)
+        return self.maximum
+
+    def to_dict(self) -> dict:
+        return {"counts": {str(k): v for k, v in self.counts.items()}, "total": self.total, "count": self.count, "max": self.maximum}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        return cls({int(k): v for k, v in data["counts"].items()}, data["total"], data["count"], data["max"])
+
+
+# (stage, variant) -> histogram for this process
+histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+_last_flush = time.monotonic()
+# Variant label of the current task's measurements; per task, so a worker can serve several variants at once
+_variant: contextvars.ContextVar[str] = contextvars.ContextVar("metrics_variant", default=PROMPT_VARIANT)
+# Stage -> seconds for the request the current task is serving (see track_request)
+_request_totals: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("request_totals", default=None)
+
+
+def set_variant(name: str) -> None:
+    """Default variant label for later measurements in this task (and tasks it creates)."""
+    _variant.set(name)
+
+
+def record(stage: str, seconds: float, variant: Optional[str] = None) -> None:
+    key = (stage, variant or _variant.get())
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = LatencyHistogram()
+    histogram.record(seconds)
+    totals = _request_totals.get()
+    if totals is not None:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    if time.monotonic() - _last_flush >= FLUSH_INTERVAL_SECONDS:
+        flush()
+
+
+@contextmanager
+def track_request():
+    """Collect request_timings() for one request in this task, so concurrent requests in one process stay apart.
+
+    asyncio tasks copy the context when created, so each worker task keeps its own totals.
+    """
+    token = _request_totals.set({})
+    try:
+        yield
+    finally:
+        _request_totals.reset(token)
+
+
+@contextmanager
+def stage(name: str, variant: Optional[str] = None):
+    """Time a pipeline stage into the in-process histograms (and a logfire span when logfire is configured).
+
+    Spans are debug level: they reach the logfire backend but not the console, which would print every stage.
+    """
+    try:
+        import logfire
+        span = logfire.span(name, _level="debug", stage=name, variant=variant or _variant.get())
+    except ImportError:
+        span = None
+    start = time.perf_counter()
+    try:
+        if span is not None:
+            with span:
+                yield
+        else:
+            yield
+    finally:
+        record(name, time.perf_counter() - start, variant)
+
+
+def request_timings() -> Dict[str, float]:
+    """Seconds spent per stage on the current request (inside track_request), summed across variants.
+
+    Outside track_request this is everything recorded in the process since the last flush, which is the
+    request itself for a one-request process like agent.py.
+    """
+    current = _request_totals.get()
+    if current is not None:
+        return dict(current)
+    totals: Dict[str, float] = {}
+    for (stage_name, _), histogram in histograms.items():
+        totals[stage_name] = totals.get(stage_name, 0.0) + histogram.total
+    return totals
+
+
+def record_process_start() -> None:
+    """Spawn latency (server.js passes RECIPE_SPAWNED_AT in epoch ms) and import time up to now."""
+    spawned_at = os.getenv("RECIPE_SPAWNED_AT")
+    if spawned_at:
+        import_wall_start = time.time() - (time.perf_counter() - IMPORT_STARTED)
+        record("process_start", max(import_wall_start - int(spawned_at) / 1000, 0.0))
+    record("imports", time.perf_counter() - IMPORT_STARTED)
+
+
+def _decode(raw: dict) -> Dict[Tuple[str, str], LatencyHistogram]:
+    return {tuple(key.split("|", 1)): LatencyHistogram.from_dict(value) for key, value in raw.items()}
+
+
+def _load(path: str) -> Dict[Tuple[str, str], LatencyHistogram]:
+    try:
+        with open(path) as f:
+            return _decode(json.load(f))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def flush(path: str = METRICS_FILE) -> None:
+    """Merge this process's histograms into the shared metrics file (flock-protected where available)."""
+    global _last_flush
+    _last_flush = time.monotonic()
+    if not histograms:
+        return
+    with open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            raw = f.read()
+            merged = _decode(json.loads(raw)) if raw.strip() else {}
+            for key, histogram in histograms.items():
+                merged.setdefault(key, LatencyHistogram()).merge(histogram)
+            f.seek(0)
+            f.truncate()
+            json.dump({"|".join(key): h.to_dict() for key, h in merged.items()}, f)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    histograms.clear()
+
+
+def summary(path: str = METRICS_FILE) -> Dict[str, dict]:
+    """p50/p95/p99 per stage and variant from the metrics file."""
+    return {
+        f"{stage_name}|{variant}": {
+            "count": h.count,
+            "mean_ms": h.total / h.count * 1000 if h.count else 0.0,
+            "p50_ms": h.percentile(50) * 1000,
+            "p95_ms": h.percentile(95) * 1000,
+            "p99_ms": h.percentile(99) * 1000,
+            "max_ms": h.maximum * 1000,
+        }
+        for (stage_name, variant), h in sorted(_load(path).items())
+    }
+
+
+atexit.register(flush)
+
+
+if __name__ == "__main__":
+    # python metrics.py [--json]  -> latency table for every recorded stage
+    stats = summary()
+    if "--json" in sys.argv:
+        print(json.dumps(stats, indent=2))
+    else:
+        print(f"{'stage|variant':40} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+        for key, s in stats.items():
+            print(f"{key:40} {s['count']:>7} {s['p50_ms']:>10.1f} {s['p95_ms']:>10.1f} {s['p99_ms']:>10.1f} {s['max_ms']:>10.1f}")
@@ -0,0 +1,181 @@
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from pydantic_ai.messages import ModelResponse, RetryPromptPart, TextPart, ToolCallPart, ToolReturnPart
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+# RECIPE_MOCK_MODEL=1 makes agent.py use this offline model (benchmarks, load tests, local dev)
+MOCK_MODEL_ENABLED = os.getenv("RECIPE_MOCK_MODEL") == "1"
+# Simulated generation speed; ~0.01 s/token is in the range of gpt-4o-mini
+MOCK_LATENCY_PER_TOKEN = float(os.getenv("RECIPE_MOCK_LATENCY_PER_TOKEN", "0.01"))
+
+PANTRY = [
+    "Rice", "Toor Dal", "Moong Dal", "Turmeric Powder", "Red Chili Powder", "Coriander Powder", "Cumin Seeds (Jeera)",
+    "Mustard Seeds (Rai)", "Garam Masala", "Salt", "Refined Oil/Mustard Oil", "Potatoes", "Tomatoes", "Green Chilies",
+    "Ginger", "Sugar", "Tamarind Paste", "Lemon", "Green Coriander (Dhaniya)",
+]
+
+
+@dataclass
+class MockStats:
+    calls: int = 0
+    retry_calls: int = 0
+    output_tokens: int = 0
+
+
+def _prompt_text(messages) -> str:
+    texts = []
+    for message in messages:
+        for part in getattr(message, "parts", []):
+            content = getattr(part, "content", None)
+            if isinstance(content, str):
+                texts.append(content)
+    return "\n".join(texts)
+
+
+def _tool_call(tool_name: str, args: dict) -> ToolCallPart:
+    if hasattr(ToolCallPart, "from_raw_args"):
+        return ToolCallPart.from_raw_args(tool_name, args)
+    return ToolCallPart(tool_name=tool_name, args=args)
+
+
+def _request_from_messages(messages) -> Tuple[str, str, List[str]]:
+    """Best-effort (diet, cuisine, required ingredients) from the prompt and the extract_ingredients result."""
+    prompt = _prompt_text(messages)
+    diet = re.search(r"diet\W*\s*(.+)", prompt, re.IGNORECASE)
+    cuisine = re.search(r"cuisine\W*\s*(.+)", prompt, re.IGNORECASE)
+    required: List[str] = []
+    for message in messages:
+        for part in getattr(message, "parts", []):
+            if isinstance(part, ToolReturnPart) and part.tool_name == "extract_ingredients" and isinstance(part.content, list):
+                required = [str(i) for i in part.content]
+    return (
+        diet.group(1).strip(" *'\",}") if diet else "",
+        cuisine.group(1).strip(" *'\",}") if cuisine else "Fusion",
+        required,
+    )
+
+
+class MockRecipeModel:
+    """Deterministic stand-in for the OpenAI model.
+
+    It calls extract_ingredients once when the agent offers it, then answers with a RecipeDetails tool
+    call. Each required ingredient is included with a probability that rises when the prompt names it
+    and asks for it to be included; sometimes it is written with a quantity prefix. A retry prompt makes
+    it fix everything. Latency is charged per output token.
+    """
+
+    def __init__(self, stats: Optional[MockStats] = None, latency_per_token: float = MOCK_LATENCY_PER_TOKEN,
+                 request_provider: Optional[Callable[[], Tuple[str, str, List[str]]]] = None):
+        self.stats = stats or MockStats()
+        self.latency_per_token = latency_per_token
+        self.request_provider = request_provider
+        self._planned = 0
+        self._plan_start = 0
+
+    def _plan(self, messages, info: AgentInfo) -> Tuple[Optional[str], dict]:
+        """(tool name, args) of the next response; tool name None means a text reply."""
+        self.stats.calls += 1
+        last_parts = messages[-1].parts if messages else []
+        is_retry = any(isinstance(p, RetryPromptPart) for p in last_parts)
+        self.stats.retry_calls += is_retry
+
+        tool_called = any(isinstance(p, ToolReturnPart) for m in messages for p in getattr(m, "parts", []))
+        if any(t.name == "extract_ingredients" for t in info.function_tools) and not tool_called:
+            return "extract_ingredients", {}
+
+        diet, cuisine, required = self.request_provider() if self.request_provider else _request_from_messages(messages)
+        prompt = _prompt_text(messages)
+        if info.result_tools and "recipes" in info.result_tools[0].parameters_json_schema.get("properties", {}):
+            return info.result_tools[0].name, self._meal_plan(prompt, cuisine, is_retry)
+        lowered = prompt.lower()
+        rng = random.Random(zlib.crc32(f"{diet}|{cuisine}|{','.join(required)}|{self.stats.calls}".encode()))
+        asks_to_include = "include" in lowered
+
+        ingredients = []
+        for item in required:
+            named = item.lower() in lowered or tool_called
+            p_include = 0.55 + 0.25 * named + 0.15 * asks_to_include
+            if is_retry:
+                ingredients.append(item)
+            elif rng.random() < p_include:
+                # Cosmetic drift: sometimes a quantity prefix or different casing
+                ingredients.append(item if rng.random() < 0.8 else f"2 cups {item.lower()}")
+        ingredients += rng.sample(PANTRY, 3)
+        # Longer guideline-heavy prompts make the (mock) model write longer steps
+        n_steps = 4 + min(len(prompt) // 1500, 4)
+        steps = [f"Step {i + 1}: cook the {rng.choice(ingredients)} for a while (Time: {5 * (i + 1)} min)" for i in range(n_steps)]
+        step_times = [f"Time: {5 * (i + 1)} min" for i in range(n_steps - (rng.random() < 0.2))]
+        args = {
+            "recipe_name": f"{cuisine} {rng.choice(['Delight', 'Bowl', 'Curry', 'Stir Fry', 'Pulao', 'Tadka'])} {self.stats.calls}",
+            "ingredients": ingredients,
+            "steps": steps,
+            "step_times": step_times,
+        }
+        result_tools = [t.name for t in info.result_tools]
+        if not result_tools:
+            return None, args
+        return next((t for t in result_tools if t.endswith("RecipeDetails")), result_tools[0]), args
+
+    def _meal_plan(self, prompt: str, cuisine: str, is_retry: bool) -> dict:
+        """meal_plan.py's MealPlan; the first answer overdraws the pantry's Toor Dal, a retry fixes it."""
+        meals = re.search(r"\*\*Meals:\*\*\s*(\d+)", prompt)
+        others = [p for p in PANTRY if p != "Toor Dal"]
+        dishes = ["Dal", "Khichdi", "Curry", "Pulao", "Tadka", "Sambar", "Upma", "Bhaji", "Halwa", "Chaat"]
+        count = int(meals.group(1)) if meals else 3
+        # A retry rewrites the same meals; a new request (or batch) gets new ones
+        if not is_retry:
+            self._plan_start, self._planned = self._planned, self._planned + count
+        combos = list(itertools.combinations(others, 3))
+        recipes = []
+        for i in range(count):
+            # Spread over the pantry's 3-item combinations so meals are not near-duplicates
+            ingredients = ["Toor Dal"] + list(combos[(self._plan_start + i) * 97 % len(combos)])
+            recipes.append({
+                "recipe_name": f"{cuisine} {dishes[i % len(dishes)]} {self.stats.calls}-{i + 1}",
+                "ingredients": ingredients,
+                "quantities": ["100 g" if is_retry else "300 g", "1 tsp", "2", "20 g"],
+                "steps": [f"Step {s + 1}: cook the {ingredients[s]} for a while" for s in range(4)],
+                "step_times": [f"{5 * (s + 1)} min" for s in range(4)],
+            })
+        return {"recipes": recipes}
+
+    async def respond(self, messages, info: AgentInfo) -> ModelResponse:
+        tool_name, args = self._plan(messages, info)
+        payload = json.dumps(args)
+        tokens = max(len(payload) // 4, 10)
+        self.stats.output_tokens += tokens
+        await asyncio.sleep(tokens * self.latency_per_token)
+        if tool_name is None:
+            return ModelResponse(parts=[TextPart(content=payload)])
+        return ModelResponse(parts=[_tool_call(tool_name, args)])
+
+    async def stream(self, messages, info: AgentInfo):
+        tool_name, args = self._plan(messages, info)
+        payload = json.dumps(args)
+        self.stats.output_tokens += max(len(payload) // 4, 10)
+        if tool_name is None:
+            for idx in range(0, len(payload), 16):
+                await asyncio.sleep(4 * self.latency_per_token)
+                yield payload[idx:idx + 16]
+            return
+        yield {0: DeltaToolCall(name=tool_name)}
+        # ~4 tokens per chunk, paced like a real token stream
+        for idx in range(0, len(payload), 16):
+            await asyncio.sleep(4 * self.latency_per_token)
+            yield {0: DeltaToolCall(json_args=payload[idx:idx + 16])}
+
+    def model(self) -> FunctionModel:
+        return FunctionModel(self.respond, stream_function=self.stream)
+
+
+def make_mock_model(stats: Optional[MockStats] = None, latency_per_token: float = MOCK_LATENCY_PER_TOKEN,
+                    request_provider=None) -> FunctionModel:
+    return MockRecipeModel(stats, latency_per_token, request_provider).model()
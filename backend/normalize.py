@@ -0,0 +1,46 @@
+import re
+from typing import List
+
+# Quantity/unit prefixes the model likes to put in front of ingredient names ("2 cups", "1/2 tsp", "200 g")
+_QUANTITY_RE = re.compile(
+    r"^\s*(?:\d+\s+\d/\d|\d+(?:[./]\d+)?|(?:a|an|few|some)\b)\s*"
+    r"(?:(?:kg|g|gm|grams?|mg|l|ml|liters?|litres?|cups?|tbsp|tablespoons?|tsp|teaspoons?|pinch(?:es)?|"
+    r"cloves?|pieces?|bunch(?:es)?|handful|packets?|packs?|cans?|slices?|sprigs?|inch(?:es)?|nos?)\b)?\.?\s*(?:of\s+)?",
+    re.IGNORECASE,
+)
+_PAREN_RE = re.compile(r"\([^)]*\)")
+_TIME_RE = re.compile(r"^\s*\(?\s*time\s*:\s*", re.IGNORECASE)
+
+
+def singularize(word: str) -> str:
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def ingredient_tokens(name: str) -> List[str]:
+    """Lowercased, singular word tokens of an ingredient with quantities and notes removed."""
+    name = _PAREN_RE.sub(" ", name)
+    name = name.split(",")[0]
+    name = _QUANTITY_RE.sub("", name)
+    return [singularize(w) for w in re.findall(r"[a-z]+", name.lower())]
+
+
+def normalize_ingredient(name: str) -> str:
+    """Canonical key for an ingredient: '2 Ripe Tomatoes, diced' -> 'ripe tomato'."""
+    return " ".join(ingredient_tokens(name))
+
+
+def ingredient_matches(required: str, candidate: str) -> bool:
+    """True when every word of the required ingredient appears in the candidate entry."""
+    required_tokens = ingredient_tokens(required)
+    return bool(required_tokens) and set(required_tokens) <= set(ingredient_tokens(candidate))
+
+
+def clean_time(time: str) -> str:
+    """Strip a duplicated 'Time:' label (and wrapping brackets) from a step time."""
+    return _TIME_RE.sub("", time).rstrip(") ").strip()
@@ -0,0 +1,101 @@
+import glob
+import logging
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger()
+
+# RECIPE_PROFILE=1 profiles this run (server.js sets it for requests with "X-Recipe-Profile: 1");
+# otherwise RECIPE_PROFILE_SAMPLE_RATE of runs are profiled. Both off by default.
+PROFILE_FORCED = os.getenv("RECIPE_PROFILE") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("RECIPE_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("RECIPE_PROFILE_DIR", "profiles")
+# Oldest artifacts are deleted beyond this many profiled requests
+PROFILE_MAX_REQUESTS = int(os.getenv("RECIPE_PROFILE_MAX_REQUESTS", "50"))
+PROFILE_TRACE_FRAMES = int(os.getenv("RECIPE_PROFILE_TRACE_FRAMES", "5"))
+PROFILE_TOP_N = 30
+
+
+def request_id() -> str:
+    """The server-assigned request ID (RECIPE_REQUEST_ID), made safe for file names."""
+    raw = os.getenv("RECIPE_REQUEST_ID") or f"{int(time.time() * 1000)}-{os.getpid()}"
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", raw)[:64]
+
+
+def should_profile() -> bool:
+    return PROFILE_FORCED or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+
+
+def _prune(directory: str, keep: int) -> None:
+    """Keep the artifacts of the newest `keep` requests."""
+    profiles = sorted(glob.glob(os.path.join(directory, "*.prof")), key=os.path.getmtime)
+    for stale in profiles[:max(len(profiles) - keep, 0)]:
+        for path in glob.glob(stale[:-len(".prof")] + ".*"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _dump(profiler, snapshot, peak: int, rid: str, directory: str, wall: float) -> str:
+    import io
+    import pstats
+
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, rid)
+    # Binary pstats for snakeviz / `python -m pstats`, plus a readable summary next to it
+    profiler.dump_stats(base + ".prof")
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    with open(base + ".cpu.txt", "w") as f:
+        f.write(f"request {rid}, wall {wall:.3f}s\n")
+        f.write(out.getvalue())
+
+    with open(base + ".alloc.txt", "w") as f:
+        f.write(f"request {rid}, peak traced memory {peak / 1024 / 1024:.1f} MiB\n")
+        f.write(f"top {PROFILE_TOP_N} allocation sites still live at the end of the run:\n")
+        for stat in snapshot.statistics("traceback")[:PROFILE_TOP_N]:
+            f.write(f"\n{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+            f.write("\n".join(stat.traceback.format()) + "\n")
+    _prune(directory, PROFILE_MAX_REQUESTS)
+    return base
+
+
+@contextmanager
+def profile_request(enabled: Optional[bool] = None, directory: str = PROFILE_DIR):
+    """Run the block under cProfile and tracemalloc when this request is selected for profiling.
+
+    Artifacts go to <directory>/<request id>.{prof,cpu.txt,alloc.txt}. When not selected this costs
+    one random() call; the profilers are not even imported.
+    """
+    if enabled is None:
+        enabled = should_profile()
+    if not enabled:
+        yield
+        return
+
+    import cProfile
+    import tracemalloc
+
+    rid = request_id()
+    tracemalloc.start(PROFILE_TRACE_FRAMES)
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        wall = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        try:
+            base = _dump(profiler, snapshot, peak, rid, directory, wall)
+            logger.info(f"Profile for request {rid} written to {base}.*")
+        except OSError as e:
+            logger.error(f"Could not write profile for request {rid}: {e}")
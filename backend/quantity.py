@@ -0,0 +1,135 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from normalize import ingredient_tokens
+
+logger = logging.getLogger()
+
+# Unit word -> (base unit, factor). Mass is kept in grams, volume in millilitres, everything else is a count.
+# Spoons and cups are volume; there is no density table, so grams and millilitres never convert into each other.
+UNITS: Dict[str, Tuple[str, float]] = {
+    "mg": ("g", 0.001), "g": ("g", 1.0), "gm": ("g", 1.0), "gms": ("g", 1.0), "gram": ("g", 1.0), "grams": ("g", 1.0),
+    "kg": ("g", 1000.0), "kgs": ("g", 1000.0), "kilo": ("g", 1000.0), "kilos": ("g", 1000.0),
+    "ml": ("ml", 1.0), "l": ("ml", 1000.0), "liter": ("ml", 1000.0), "liters": ("ml", 1000.0),
+    "litre": ("ml", 1000.0), "litres": ("ml", 1000.0),
+    "tsp": ("ml", 5.0), "teaspoon": ("ml", 5.0), "teaspoons": ("ml", 5.0),
+    "tbsp": ("ml", 15.0), "tablespoon": ("ml", 15.0), "tablespoons": ("ml", 15.0),
+    "cup": ("ml", 240.0), "cups": ("ml", 240.0),
+}
+BASE_UNITS = ("g", "ml", "count")
+
+_NUMBER = r"(\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?)"
+_PAREN_RE = re.compile(r"\([^)]*\)")
+_QUANTITY_RE = re.compile(rf"^\s*{_NUMBER}(?:\s*(?:-|to)\s*{_NUMBER})?\s*([a-zA-Z]+)?\.?", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Quantity:
+    low: float
+    high: float
+    unit: str  # one of BASE_UNITS
+    # The text it was parsed from ("1-2 packets"), kept for prompts; empty for computed amounts
+    text: str = field(default="", compare=False)
+
+
+def _number(text: str) -> float:
+    whole, _, fraction = text.strip().rpartition(" ")
+    if "/" in fraction:
+        numerator, denominator = fraction.split("/")
+        return (float(whole) if whole else 0.0) + float(numerator) / float(denominator)
+    return float(text)
+
+
+def parse_quantity(text: str) -> Optional[Quantity]:
+    """'5-10 kg' -> Quantity(5000, 10000, 'g'); '2 cups' -> 480 ml; '1 jar' -> 1 count. None if there is no number.
+
+    Only the first alternative of '1 liter daily OR 500 g milk powder' is read.
+    """
+    match = _QUANTITY_RE.match(str(text).split(" OR ")[0])
+    if not match:
+        return None
+    low = _number(match.group(1))
+    high = _number(match.group(2)) if match.group(2) else low
+    unit, factor = UNITS.get((match.group(3) or "").lower(), ("count", 1.0))
+    return Quantity(low * factor, high * factor, unit, str(text).strip())
+
+
+def format_quantity(amount: float, unit: str) -> str:
+    """Human-readable amount in a base unit: 1500 g -> '1.5 kg', 750 ml -> '750 ml', 3 count -> '3'."""
+    if unit == "count":
+        return f"{amount:g}"
+    big, factor = ("kg", 1000.0) if unit == "g" else ("l", 1000.0)
+    if amount >= factor:
+        return f"{amount / factor:.3g} {big}"
+    return f"{amount:.3g} {unit}"
+
+
+class InventoryIndex:
+    """Maps free-text recipe ingredients onto inventory items.
+
+    'Refined Oil/Mustard Oil' matches either alternative; an item matches when all its words appear in
+    the ingredient ('2 cups toor dal, rinsed' -> 'Toor Dal') or the ingredient is a shorter name for it
+    ('coriander leaves' does not match 'Coriander Powder', 'cumin' matches 'Cumin Seeds (Jeera)').
+    """
+
+    def __init__(self, names: List[str]):
+        self.names = list(names)
+        self._alternatives = [
+            [set(ingredient_tokens(alternative)) for alternative in _PAREN_RE.sub(" ", name).split("/") if ingredient_tokens(alternative)]
+            for name in self.names
+        ]
+        self._cache: Dict[str, Optional[str]] = {}
+
+    def find(self, ingredient: str) -> Optional[str]:
+        if ingredient in self._cache:
+            return self._cache[ingredient]
+        tokens = set(ingredient_tokens(ingredient))
+        found = None
+        if tokens:
+            found = next((name for name, alternatives in zip(self.names, self._alternatives)
+                          if any(alternative <= tokens for alternative in alternatives)), None)
+            if found is None:
+                found = next((name for name, alternatives in zip(self.names, self._alternatives)
+                              if any(tokens <= alternative for alternative in alternatives)), None)
+        self._cache[ingredient] = found
+        return found
+
+
+def load_inventory(file_path: str) -> Dict[str, Optional[Quantity]]:
+    """Inventory ingredient -> parsed 'Approx. Quantity' (None when the column is missing or unparsable)."""
+    try:
+        df = pd.read_excel(file_path)
+    except FileNotFoundError:
+        logger.error(f"Excel file not found at {file_path}")
+        return {}
+    except Exception as e:
+        logger.error(f"Error reading ingredients: {e}")
+        return {}
+    quantities = df["Approx. Quantity"] if "Approx. Quantity" in df else [None] * len(df)
+    inventory: Dict[str, Optional[Quantity]] = {}
+    for name, quantity in zip(df["Ingredient"], quantities):
+        if isinstance(name, str) and name.strip():
+            inventory[name.strip()] = parse_quantity(quantity) if isinstance(quantity, str) else None
+    return inventory
+
+
+def describe_inventory(inventory: Dict[str, Optional[Quantity]]) -> List[str]:
+    """'Rice (5-10 kg)' style entries for a prompt."""
+    entries = []
+    for name, quantity in inventory.items():
+        if quantity is None:
+            entries.append(name)
+        elif quantity.text:
+            entries.append(f"{name} ({quantity.text})")
+        elif quantity.low == quantity.high:
+            entries.append(f"{name} ({format_quantity(quantity.low, quantity.unit)})")
+        else:
+            low, high = format_quantity(quantity.low, quantity.unit), format_quantity(quantity.high, quantity.unit)
+            low_number, _, low_unit = low.partition(" ")
+            # '5-10 kg' rather than '5 kg-10 kg' when both ends use the same unit
+            entries.append(f"{name} ({low_number if low_unit == high.partition(' ')[2] else low}-{high})")
+    return entries
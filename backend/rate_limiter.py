@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, fall back to in-process limiting
+    fcntl = None
+
+logger = logging.getLogger()
+
+# Provider limits for gpt-4o-mini on our tier; override per deployment
+DEFAULT_RPM = int(os.getenv("RECIPE_RPM", "500"))
+DEFAULT_TPM = int(os.getenv("RECIPE_TPM", "200000"))
+# Rough completion size of one RecipeDetails, used until the real Usage comes back
+DEFAULT_OUTPUT_TOKENS = int(os.getenv("RECIPE_EXPECTED_OUTPUT_TOKENS", "600"))
+# Set to a file path to share the buckets between all spawned agent processes
+SHARED_STATE_PATH = os.getenv("RECIPE_RATE_LIMIT_STATE")
+
+
+def estimate_tokens(prompt: str, expected_output_tokens: int = DEFAULT_OUTPUT_TOKENS) -> int:
+    """Cheap prompt-size estimate (~4 characters per token) plus the expected completion."""
+    return len(prompt) // 4 + expected_output_tokens
+
+
+class TokenBucket:
+    """Classic token bucket; `level` may go negative when actual usage exceeds the estimate."""
+
+    def __init__(self, capacity: float, refill_per_sec: float, level: Optional[float] = None, updated: Optional[float] = None):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.level = capacity if level is None else level
+        self.updated = time.time() if updated is None else updated
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_per_sec)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is available now)."""
+        # Requests larger than the whole bucket are allowed once it is full
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.refill_per_sec
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+
+@dataclass
+class Reservation:
+    estimated_tokens: int
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter shared by every call in this process.
+
+    With `shared_state_path` set, bucket levels live in a small flock-protected JSON file so
+    concurrently spawned agent processes draw from the same budget.
+    """
+
+    def __init__(self, rpm: int = DEFAULT_RPM, tpm: int = DEFAULT_TPM, shared_state_path: Optional[str] = SHARED_STATE_PATH):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.blocked_until = 0.0
+        self.shared_state_path = shared_state_path if fcntl is not None else None
+        if shared_state_path and fcntl is None:
+            logger.warning("Shared rate limit state is not supported on this platform, limiting per process only")
+        self._lock = asyncio.Lock()
+
+    # Shared backend: read-modify-write the bucket levels under an exclusive file lock
+    def _with_shared_state(self, fn):
+        if not self.shared_state_path:
+            return fn()
+        with open(self.shared_state_path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                state = json.loads(raw) if raw.strip() else {}
+                if state:
+                    self.requests.level, self.requests.updated = state["requests"]
+                    self.tokens.level, self.tokens.updated = state["tokens"]
+                    self.blocked_until = state.get("blocked_until", 0.0)
+                value = fn()
+                f.seek(0)
+                f.truncate()
+                json.dump({
+                    "requests": [self.requests.level, self.requests.updated],
+                    "tokens": [self.tokens.level, self.tokens.updated],
+                    "blocked_until": self.blocked_until,
+                }, f)
+                return value
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    async def _with_shared_state_async(self, fn):
+        # flock waits on other processes and the file I/O blocks, so keep both off the event loop
+        if not self.shared_state_path:
+            return fn()
+        return await asyncio.to_thread(self._with_shared_state, fn)
+
+    def _try_acquire(self, estimated_tokens: int) -> float:
+        now = time.time()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        wait = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+        if wait == 0:
+            self.requests.take(1)
+            self.tokens.take(estimated_tokens)
+        return wait
+
+    async def acquire(self, estimated_tokens: int) -> Reservation:
+        """Wait (queue) until both buckets allow the call, then reserve its estimated tokens."""
+        async with self._lock:
+            while True:
+                wait = await self._with_shared_state_async(lambda: self._try_acquire(estimated_tokens))
+                if wait == 0:
+                    return Reservation(estimated_tokens)
+                logger.debug(f"Rate limit reached, waiting {wait:.2f}s")
+                await asyncio.sleep(wait)
+
+    async def record_usage(self, reservation: Reservation, usage) -> None:
+        """Correct the token bucket with the actual `Usage` of a finished call."""
+        actual = getattr(usage, "total_tokens", None)
+        if actual is None:
+            return
+        delta = actual - reservation.estimated_tokens
+        if delta:
+            await self._with_shared_state_async(lambda: self.tokens.take(delta))
+
+    def backoff(self, retry_after: Optional[float] = None) -> None:
+        """Pause every caller after the provider answered 429."""
+        pause = retry_after if retry_after is not None else 60.0 / max(self.rpm, 1) * 10
+
+        def block():
+            self.blocked_until = max(self.blocked_until, time.time() + pause)
+
+        self._with_shared_state(block)
+        logger.warning(f"Provider rate limit hit, pausing all calls for {pause:.1f}s")
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide limiter instance."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Extract the Retry-After hint from an openai 429 error, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,529 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from diet import DIET_BITS, DietTable, diet_names, parse_diet
+from normalize import ingredient_matches, ingredient_tokens, normalize_ingredient
+from retrieval import RETRIEVAL_ENABLED, VectorIndex, hash_vector
+from step_timing import add_timing_columns
+
+logger = logging.getLogger()
+
+# Every validated recipe is kept here (RECIPE_STORE=0 turns it off); RECIPE_STORE_FIRST=1 serves a
+# stored match before calling the model
+STORE_ENABLED = os.getenv("RECIPE_STORE", "1") != "0"
+STORE_FIRST = os.getenv("RECIPE_STORE_FIRST") == "1"
+STORE_PATH = os.getenv("RECIPE_STORE_PATH", "recipe_store.db")
+# Full-text search ranks at most this many of the newest matches
+TEXT_RANK_WINDOW = int(os.getenv("RECIPE_TEXT_RANK_WINDOW", "1000"))
+
+# Postings are split into blocks of 65536 recipe IDs; inside a block each ID is a 2-byte offset,
+# appended in increasing order, so a posting costs 2 bytes and an insert is an in-place append.
+_BLOCK_BITS = 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipes (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    cuisine TEXT NOT NULL,
+    diet_mask INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    created REAL NOT NULL,
+    -- Parsed from steps/step_times (step_timing.py) so time filters are numeric comparisons
+    total_minutes REAL NOT NULL DEFAULT 0,
+    critical_path_minutes REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS postings (
+    key TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (key, block)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS terms (
+    key TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+) WITHOUT ROWID;
+-- How often each canonical request (lowercased diet and cuisine, sorted ingredients) was made; drives warmup.py
+CREATE TABLE IF NOT EXISTS request_counts (
+    diet TEXT NOT NULL,
+    cuisine TEXT NOT NULL,
+    ingredients TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (diet, cuisine, ingredients)
+) WITHOUT ROWID;
+-- Full-text index over name, ingredients and steps; rowid is the recipe ID. Contentless (the text
+-- already lives in recipes.data) with 2- and 3-character prefix indexes for typeahead.
+CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+    name, ingredients, steps, content='', tokenize='porter unicode61', prefix='2 3'
+);
+"""
+# PRAGMA user_version of an up-to-date store; older stores are migrated on open
+# (1: full-text index backfilled, 2: retrieval vectors backfilled); stores created before the timing columns
+# get them added and backfilled on open
+_SCHEMA_VERSION = 2
+
+# bm25 column weights: a hit in the name counts most, one in the steps least
+_TEXT_WEIGHTS = (10.0, 4.0, 1.0)
+_WORD = re.compile(r"\w+")
+
+# Postings keys: i:<ingredient word>, c:<cuisine>, d:<diet the recipe is compatible with>
+
+
+def _cuisine_key(cuisine: str) -> str:
+    return " ".join(cuisine.lower().split())
+
+
+def _fingerprint(recipe_name: str, ingredients: List[str]) -> str:
+    canonical = "|".join([" ".join(recipe_name.lower().split())] + sorted(normalize_ingredient(i) for i in ingredients))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def recipe_minutes(recipes: List[dict]) -> List[Tuple[float, float]]:
+    """(total_minutes, critical_path_minutes) of each recipe, parsed in one vectorized pass."""
+    if not recipes:
+        return []
+    timed = add_timing_columns(pd.DataFrame({
+        "steps": [list(recipe.get("steps") or []) for recipe in recipes],
+        "step_times": [list(recipe.get("step_times") or []) for recipe in recipes],
+    }))
+    return [(float(total), float(critical)) for total, critical in zip(timed["total_minutes"], timed["critical_path_minutes"])]
+
+
+def recipe_diet_mask(ingredients: List[str], table: Optional[DietTable] = None) -> int:
+    """Diets every ingredient of the recipe is compatible with."""
+    table = table or DietTable()
+    mask = (1 << len(DIET_BITS)) - 1
+    for ingredient in ingredients:
+        mask &= table.diets_for(ingredient)
+    return mask
+
+
+def index_keys(ingredients: List[str], cuisine: str, diet_mask: int) -> List[str]:
+    keys = {f"i:{token}" for ingredient in ingredients for token in ingredient_tokens(ingredient)}
+    if cuisine.strip():
+        keys.add(f"c:{_cuisine_key(cuisine)}")
+    keys.update(f"d:{diet}" for diet in diet_names(diet_mask))
+    return sorted(keys)
+
+
+def text_query(query: str, prefix: bool = False) -> str:
+    """Free text -> FTS5 MATCH expression; every word is quoted so user input can't inject query syntax."""
+    words = _WORD.findall(query.lower())
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    if prefix:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class RecipeStore:
+    """SQLite recipe store with an inverted index from ingredient words, cuisine and diet to recipe IDs."""
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=10)
+        # WAL lets concurrent agent processes read while one of them writes
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self._add_timing_columns()
+        self.diet_table = DietTable()
+        # Hashed feature vectors of every recipe for exemplar retrieval (retrieval.py)
+        self.vectors = VectorIndex(path + ".vectors") if RETRIEVAL_ENABLED else None
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            self._backfill_text_index()
+        if version < 2 and self.vectors is not None:
+            self.rebuild_vectors()
+
+    def _backfill_text_index(self) -> None:
+        with self.conn:
+            self.conn.execute("INSERT INTO recipes_fts (recipes_fts) VALUES ('delete-all')")
+            self.conn.executemany(
+                "INSERT INTO recipes_fts (rowid, name, ingredients, steps) VALUES (?, ?, ?, ?)",
+                (self._text_row(recipe_id, json.loads(data)) for recipe_id, data in self.conn.execute("SELECT id, data FROM recipes")),
+            )
+            self.conn.execute("PRAGMA user_version = 1")
+
+    def _add_timing_columns(self) -> None:
+        if "total_minutes" in self._recipe_columns():
+            return
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            # Another process may have migrated while this one waited for the lock
+            if "total_minutes" in self._recipe_columns():
+                return
+            self.conn.execute("ALTER TABLE recipes ADD COLUMN total_minutes REAL NOT NULL DEFAULT 0")
+            self.conn.execute("ALTER TABLE recipes ADD COLUMN critical_path_minutes REAL NOT NULL DEFAULT 0")
+            last_id = 0
+            while True:
+                batch = self.conn.execute("SELECT id, data FROM recipes WHERE id > ? ORDER BY id LIMIT 10000", (last_id,)).fetchall()
+                if not batch:
+                    break
+                minutes = recipe_minutes([json.loads(data) for _, data in batch])
+                self.conn.executemany("UPDATE recipes SET total_minutes = ?, critical_path_minutes = ? WHERE id = ?",
+                                      [(total, critical, recipe_id) for (recipe_id, _), (total, critical) in zip(batch, minutes)])
+                last_id = batch[-1][0]
+
+    def _recipe_columns(self) -> List[str]:
+        return [row[1] for row in self.conn.execute("PRAGMA table_info(recipes)")]
+
+    def rebuild_vectors(self) -> None:
+        """Re-create the retrieval vectors from the stored recipes."""
+        # The write transaction keeps other processes from appending while the files are replaced
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.vectors.clear()
+            rows = self.conn.execute("SELECT id, cuisine, diet_mask, data FROM recipes ORDER BY id")
+            while True:
+                batch = rows.fetchmany(10000)
+                if not batch:
+                    break
+                self.vectors.add_many((recipe_id, cuisine, mask, json.loads(data)) for recipe_id, cuisine, mask, data in batch)
+            self.conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    @staticmethod
+    def _text_row(recipe_id: int, recipe: dict) -> Tuple[int, str, str, str]:
+        return recipe_id, recipe["recipe_name"], "\n".join(recipe["ingredients"]), "\n".join(recipe["steps"])
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _insert(self, recipe: dict, cuisine: str, minutes: Tuple[float, float]) -> Optional[Tuple[int, List[str], int]]:
+        ingredients = recipe["ingredients"]
+        diet_mask = recipe_diet_mask(ingredients, self.diet_table)
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO recipes (fingerprint, name, cuisine, diet_mask, data, created, total_minutes, critical_path_minutes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (_fingerprint(recipe["recipe_name"], ingredients), recipe["recipe_name"], _cuisine_key(cuisine),
+             diet_mask, json.dumps(recipe), time.time(), *minutes),
+        )
+        if not cursor.rowcount:
+            return None
+        self.conn.execute("INSERT INTO recipes_fts (rowid, name, ingredients, steps) VALUES (?, ?, ?, ?)",
+                          self._text_row(cursor.lastrowid, recipe))
+        return cursor.lastrowid, index_keys(ingredients, cuisine, diet_mask), diet_mask
+
+    def _append_postings(self, inserted: List[Tuple[int, List[str], int]]) -> None:
+        # One append per (key, block) per batch: appending rewrites the block, so batching keeps bulk loads linear
+        appends: Dict[Tuple[str, int], bytearray] = {}
+        frequencies: Dict[str, int] = {}
+        for recipe_id, keys, _ in inserted:
+            block, offset = recipe_id >> _BLOCK_BITS, recipe_id & ((1 << _BLOCK_BITS) - 1)
+            for key in keys:
+                appends.setdefault((key, block), bytearray()).extend(offset.to_bytes(2, "little"))
+                frequencies[key] = frequencies.get(key, 0) + 1
+        self.conn.executemany(
+            "INSERT INTO postings (key, block, data) VALUES (?, ?, ?) "
+            "ON CONFLICT (key, block) DO UPDATE SET data = CAST(data || excluded.data AS BLOB)",
+            [(key, block, bytes(data)) for (key, block), data in appends.items()],
+        )
+        self.conn.executemany(
+            "INSERT INTO terms (key, df) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET df = df + excluded.df",
+            list(frequencies.items()),
+        )
+
+    def add(self, recipe, cuisine: str) -> Optional[int]:
+        """Store a RecipeDetails (or dict); returns its ID, or None if the same recipe is already stored."""
+        data = recipe.model_dump() if hasattr(recipe, "model_dump") else dict(recipe)
+        minutes = recipe_minutes([data])[0]
+        with self.conn:
+            inserted = self._insert(data, cuisine, minutes)
+            if inserted is None:
+                return None
+            self._append_postings([inserted])
+            if self.vectors is not None:
+                self.vectors.add_many([(inserted[0], _cuisine_key(cuisine), inserted[2], data)])
+        return inserted[0]
+
+    def add_many(self, items: Iterable[Tuple[object, str]]) -> int:
+        """Bulk insert (recipe, cuisine) pairs in one transaction; returns how many were new."""
+        inserted, vector_rows = [], []
+        pairs = [(recipe.model_dump() if hasattr(recipe, "model_dump") else dict(recipe), cuisine) for recipe, cuisine in items]
+        minutes = recipe_minutes([data for data, _ in pairs])
+        with self.conn:
+            for (data, cuisine), timing in zip(pairs, minutes):
+                row = self._insert(data, cuisine, timing)
+                if row is not None:
+                    inserted.append(row)
+                    vector_rows.append((row[0], _cuisine_key(cuisine), row[2], data))
+            self._append_postings(inserted)
+            if self.vectors is not None:
+                self.vectors.add_many(vector_rows)
+        return len(inserted)
+
+    def postings(self, key: str) -> np.ndarray:
+        """Sorted recipe IDs for an index key."""
+        arrays = [
+            np.frombuffer(data, dtype="<u2").astype(np.int64) + (block << _BLOCK_BITS)
+            for block, data in self.conn.execute("SELECT block, data FROM postings WHERE key = ? ORDER BY block", (key,))
+        ]
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+    def _document_frequencies(self, keys: List[str]) -> Dict[str, int]:
+        placeholders = ", ".join("?" * len(keys))
+        return dict(self.conn.execute(f"SELECT key, df FROM terms WHERE key IN ({placeholders})", keys).fetchall())
+
+    def search(self, ingredients: List[str], diet_mask: int = 0, cuisine: str = "", limit: int = 10,
+               max_minutes: Optional[float] = None) -> List[dict]:
+        """Newest stored recipes containing all `ingredients`, compatible with `diet_mask`, of `cuisine`.
+
+        max_minutes keeps recipes whose critical-path time (passive steps overlapped) fits the budget.
+        """
+        keys = index_keys(ingredients, cuisine, diet_mask)
+        if not keys:
+            return []
+        frequencies = self._document_frequencies(keys)
+        if len(frequencies) < len(keys):
+            # Some ingredient word, cuisine or diet has never been stored
+            return []
+
+        # Walk blocks newest first so a query that finds `limit` matches early never touches older postings.
+        # Within a block, candidates from the rarest key are filtered through a 64K-entry bitmap per other key.
+        ordered = sorted(keys, key=frequencies.__getitem__)
+        wanted_cuisine = _cuisine_key(cuisine)
+        results: List[dict] = []
+        blocks = [b for (b,) in self.conn.execute("SELECT block FROM postings WHERE key = ? ORDER BY block DESC", (ordered[0],))]
+        for block in blocks:
+            offsets = self._block(ordered[0], block)
+            for key in ordered[1:]:
+                data = self._block(key, block)
+                if data is None:
+                    offsets = offsets[:0]
+                    break
+                present = np.zeros(1 << _BLOCK_BITS, dtype=bool)
+                present[data] = True
+                offsets = offsets[present[offsets]]
+                if not len(offsets):
+                    break
+            ids = [int(i) for i in offsets[::-1].astype(np.int64) + (block << _BLOCK_BITS)]
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT id, cuisine, diet_mask, data, critical_path_minutes FROM recipes "
+                    f"WHERE id IN ({', '.join('?' * len(chunk))}) ORDER BY id DESC",
+                    chunk,
+                ).fetchall()
+                for recipe_id, row_cuisine, row_mask, data, minutes in rows:
+                    if row_mask & diet_mask != diet_mask or (wanted_cuisine and row_cuisine != wanted_cuisine):
+                        continue
+                    if max_minutes is not None and minutes > max_minutes:
+                        continue
+                    recipe = json.loads(data)
+                    # Word postings only say every word occurs somewhere; check per ingredient
+                    if all(any(ingredient_matches(required, i) for i in recipe["ingredients"]) for required in ingredients):
+                        results.append({"id": recipe_id, "cuisine": row_cuisine, "recipe": recipe})
+                        if len(results) >= limit:
+                            return results
+        return results
+
+    def _block(self, key: str, block: int) -> Optional[np.ndarray]:
+        row = self.conn.execute("SELECT data FROM postings WHERE key = ? AND block = ?", (key, block)).fetchone()
+        return np.frombuffer(row[0], dtype="<u2") if row else None
+
+    def search_text(self, query: str, limit: int = 10, prefix: bool = False, diet_mask: int = 0, cuisine: str = "") -> List[dict]:
+        """Stored recipes matching every word of `query`, best BM25 score first.
+
+        prefix=True also matches words that start with the last query word (typeahead).
+        """
+        match = text_query(query, prefix)
+        if not match:
+            return []
+        # Ranking costs a bm25() call per matching row, so only the newest TEXT_RANK_WINDOW matches are ranked;
+        # the bound is a rowid range FTS5 applies while walking the index
+        bound = self.conn.execute(
+            "SELECT rowid FROM recipes_fts WHERE recipes_fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+            (match, TEXT_RANK_WINDOW - 1),
+        ).fetchone()
+        rows = self._ranked_text_matches(match, bound[0] if bound else 0, limit, diet_mask, cuisine)
+        if bound and len(rows) < limit and (diet_mask or cuisine.strip()):
+            # The filters rejected most of the window; rank every match instead
+            rows = self._ranked_text_matches(match, 0, limit, diet_mask, cuisine)
+        # bm25() is lower-is-better; report it as a positive relevance score
+        return [{"id": recipe_id, "cuisine": row_cuisine, "score": -score, "recipe": json.loads(data)}
+                for recipe_id, row_cuisine, data, score in rows]
+
+    def _ranked_text_matches(self, match: str, min_id: int, limit: int, diet_mask: int, cuisine: str) -> list:
+        where, params = "recipes_fts MATCH ? AND recipes_fts.rowid >= ?", [match, min_id]
+        join = ""
+        if diet_mask or cuisine.strip():
+            join = "JOIN recipes AS f ON f.id = recipes_fts.rowid"
+            if diet_mask:
+                where += " AND f.diet_mask & ? = ?"
+                params += [diet_mask, diet_mask]
+            if cuisine.strip():
+                where += " AND f.cuisine = ?"
+                params.append(_cuisine_key(cuisine))
+        # Rank inside FTS5 first and only fetch the recipes that made the cut
+        return self.conn.execute(
+            f"""
+            SELECT r.id, r.cuisine, r.data, top.score FROM (
+                SELECT recipes_fts.rowid AS id, bm25(recipes_fts, {', '.join(map(str, _TEXT_WEIGHTS))}) AS score
+                FROM recipes_fts {join} WHERE {where} ORDER BY score LIMIT ?
+            ) AS top JOIN recipes AS r ON r.id = top.id
+            ORDER BY top.score
+            """,
+            params + [limit],
+        ).fetchall()
+
+    def suggest(self, partial: str, limit: int = 8) -> List[str]:
+        """Recipe names for a search box typeahead."""
+        return [match["recipe"]["recipe_name"] for match in self.search_text(partial, limit, prefix=True)]
+
+    def similar(self, ingredients: List[str], diet_mask: int = 0, cuisine: str = "", k: int = 2) -> List[dict]:
+        """Up to k recent stored recipes closest to the requested ingredients (cosine over hashed vectors).
+
+        Only the newest RECIPE_RETRIEVAL_WINDOW recipes of the cuisine are scored (see retrieval.py).
+
+        Query words are weighted by inverse document frequency, so a rare requested ingredient
+        counts for more than salt or onion.
+        """
+        if self.vectors is None:
+            return []
+        words = sorted({token for ingredient in ingredients for token in ingredient_tokens(ingredient)})
+        if not words:
+            return []
+        # Recipes are never deleted, so the highest ID is the corpus size without a COUNT(*) scan
+        total = self.conn.execute("SELECT COALESCE(MAX(id), 1) FROM recipes").fetchone()[0]
+        frequencies = self._document_frequencies([f"i:{word}" for word in words])
+        query = hash_vector({key: math.log(1 + total / frequencies.get(key, 1)) for key in (f"i:{word}" for word in words)})
+        ids = [recipe_id for recipe_id, _ in self.vectors.search(query, _cuisine_key(cuisine), diet_mask, k)]
+        if not ids:
+            return []
+        rows = dict(self.conn.execute(f"SELECT id, data FROM recipes WHERE id IN ({', '.join('?' * len(ids))})", ids).fetchall())
+        # A vector whose insert was rolled back has no row; skip it
+        return [json.loads(rows[recipe_id]) for recipe_id in ids if recipe_id in rows]
+
+    def get_many(self, ids: List[int]) -> List[dict]:
+        """Stored recipes by ID, in the order asked; unknown IDs are skipped."""
+        rows: Dict[int, str] = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows.update(self.conn.execute(f"SELECT id, data FROM recipes WHERE id IN ({', '.join('?' * len(chunk))})", chunk).fetchall())
+        return [json.loads(rows[recipe_id]) for recipe_id in ids if recipe_id in rows]
+
+    def record_request(self, diet: str, cuisine: str, ingredients: List[str]) -> None:
+        """Count a request under the same canonical form server.js uses for its response cache key."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO request_counts (diet, cuisine, ingredients, count, last_seen) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT (diet, cuisine, ingredients) DO UPDATE SET count = count + 1, last_seen = excluded.last_seen",
+                (diet.strip().lower(), cuisine.strip().lower(), json.dumps(sorted(i.lower() for i in ingredients)), time.time()),
+            )
+
+    def popular_requests(self, limit: int = 20, since_days: Optional[float] = None) -> List[dict]:
+        """Most frequent canonical requests, most frequent first."""
+        where, params = "", []
+        if since_days is not None:
+            where, params = "WHERE last_seen >= ?", [time.time() - since_days * 86400]
+        rows = self.conn.execute(
+            f"SELECT diet, cuisine, ingredients, count FROM request_counts {where} ORDER BY count DESC, last_seen DESC LIMIT ?",
+            params + [limit],
+        ).fetchall()
+        return [{"diet": diet, "cuisine": cuisine, "ingredients": json.loads(ingredients), "count": count}
+                for diet, cuisine, ingredients, count in rows]
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+
+_store: Optional[RecipeStore] = None
+
+
+def get_store() -> Optional[RecipeStore]:
+    """Process-wide store, or None when RECIPE_STORE=0 or the database can't be opened."""
+    global _store
+    if _store is None and STORE_ENABLED:
+        try:
+            _store = RecipeStore()
+        except sqlite3.Error as e:
+            logger.error(f"Recipe store unavailable: {e}")
+    return _store
+
+
+def serve_text_search() -> None:
+    """Answer one JSON query per stdin line ({"q", "limit", "prefix", "diet", "cuisine"}) with one JSON line.
+
+    server.js keeps a single long-lived process on this loop so typeahead doesn't pay a Python start per keystroke.
+    {"op": "record", "diet", "cuisine", "ingredients"} counts a request server.js answered from its response cache.
+    """
+    store = RecipeStore()
+    for line in sys.stdin:
+        request = {}
+        try:
+            request = json.loads(line)
+            if request.get("op") == "record":
+                store.record_request(str(request.get("diet", "")), str(request.get("cuisine", "")),
+                                     [str(i) for i in request.get("ingredients", [])])
+                sys.stdout.write(json.dumps({"id": request.get("id"), "recorded": True}) + "\n")
+                sys.stdout.flush()
+                continue
+            started = time.perf_counter()
+            matches = store.search_text(request.get("q", ""), int(request.get("limit", 10)), bool(request.get("prefix")),
+                                        parse_diet(request.get("diet", "")), request.get("cuisine", ""))
+            response = {"id": request.get("id"), "matches": matches, "ms": (time.perf_counter() - started) * 1000}
+        except (ValueError, TypeError, sqlite3.Error) as e:
+            response = {"id": request.get("id") if isinstance(request, dict) else None, "error": str(e)}
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    # python recipe_store.py "tomato,basil" [diet] [cuisine] [max minutes]  -> stored matches and query time
+    # python recipe_store.py --text "dal tadka" [--prefix]      -> full-text matches and query time
+    # python recipe_store.py --serve                            -> JSON-lines text search (and request counts) for server.js
+    # python recipe_store.py --similar "paneer,spinach" [diet] [cuisine]  -> retrieved exemplars and query time
+    # python recipe_store.py --rebuild-vectors                  -> re-create the retrieval vectors
+    if "--serve" in sys.argv:
+        serve_text_search()
+        sys.exit(0)
+    if "--rebuild-vectors" in sys.argv:
+        store = RecipeStore()
+        store.rebuild_vectors()
+        print(f"Indexed {store.count()} recipes in {store.path}.vectors")
+        sys.exit(0)
+    if "--similar" in sys.argv:
+        store = RecipeStore()
+        args = sys.argv[sys.argv.index("--similar") + 1:]
+        started = time.perf_counter()
+        matches = store.similar([i.strip() for i in args[0].split(",") if i.strip()], parse_diet(args[1]) if len(args) > 1 else 0,
+                                args[2] if len(args) > 2 else "", k=3)
+        elapsed = (time.perf_counter() - started) * 1000
+        for recipe in matches:
+            print(f"{recipe['recipe_name']}: {', '.join(recipe['ingredients'])}")
+        print(f"{len(matches)} exemplars in {elapsed:.1f} ms")
+        sys.exit(0)
+    if "--text" in sys.argv:
+        store = RecipeStore()
+        started = time.perf_counter()
+        matches = store.search_text(sys.argv[sys.argv.index("--text") + 1], prefix="--prefix" in sys.argv)
+        elapsed = (time.perf_counter() - started) * 1000
+        for match in matches:
+            print(f"#{match['id']} {match['recipe']['recipe_name']} ({match['cuisine']}) score {match['score']:.2f}")
+        print(f"{len(matches)} matches in {elapsed:.1f} ms")
+        sys.exit(0)
+    if len(sys.argv) < 2:
+        print(f"{RecipeStore().count()} recipes in {STORE_PATH}")
+        sys.exit(0)
+    store = RecipeStore()
+    wanted = [i.strip() for i in sys.argv[1].split(",") if i.strip()]
+    started = time.perf_counter()
+    matches = store.search(wanted, parse_diet(sys.argv[2]) if len(sys.argv) > 2 else 0, sys.argv[3] if len(sys.argv) > 3 else "",
+                           max_minutes=float(sys.argv[4]) if len(sys.argv) > 4 else None)
+    elapsed = (time.perf_counter() - started) * 1000
+    for match in matches:
+        print(f"#{match['id']} {match['recipe']['recipe_name']} ({match['cuisine']}): {', '.join(match['recipe']['ingredients'])}")
+    print(f"{len(matches)} matches in {elapsed:.1f} ms")
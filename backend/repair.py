@@ -0,0 +1,98 @@
+import logging
+import re
+from collections import Counter
+from typing import List, Tuple
+
+from normalize import clean_time, normalize_ingredient
+
+logger = logging.getLogger()
+
+# How many recipes were fixed locally (per kind of fix) vs. sent back to the model
+repair_stats: Counter = Counter()
+
+# Only real list markers: "Step 3:", "3.", "3)" -- not the amount in "1.5 cups" or "350-degree oven"
+_STEP_NUMBER_RE = re.compile(r"^\s*(?:[-*•]\s*)?(?:step\s*\d+\s*[.):\-]?|\d+[.)](?=\s+\D))\s*", re.IGNORECASE)
+_INLINE_TIME_RE = re.compile(r"\s*\(\s*time\s*:\s*([^)]*?)\s*\)\s*\.?\s*$", re.IGNORECASE)
+
+
+def _repair_steps(steps: List[str], step_times: List[str]) -> Tuple[List[str], List[str], List[str]]:
+    repairs: list[str] = []
+    new_steps: list[str] = []
+    inline_times: list[str] = []
+
+    for step in steps:
+        stripped = _STEP_NUMBER_RE.sub("", step)
+        if stripped != step:
+            repairs.append("step_numbering")
+        match = _INLINE_TIME_RE.search(stripped)
+        if match:
+            repairs.append("inline_time")
+            inline_times.append(match.group(1).strip())
+            stripped = stripped[:match.start()].rstrip()
+        else:
+            inline_times.append("")
+        new_steps.append(stripped.strip())
+
+    new_times = [clean_time(t) for t in step_times]
+    if new_times != list(step_times):
+        repairs.append("time_label")
+
+    if len(new_times) != len(new_steps):
+        repairs.append("step_times_length")
+        new_times = new_times[:len(new_steps)]
+    # Fill missing times from the "(Time: x min)" text the model put inside the step
+    for idx in range(len(new_steps)):
+        if idx >= len(new_times):
+            new_times.append(inline_times[idx] or "N/A")
+        elif not new_times[idx] and inline_times[idx]:
+            new_times[idx] = inline_times[idx]
+
+    return new_steps, new_times, repairs
+
+
+def _repair_ingredients(ingredients: List[str], specific_ingredients: List[str]) -> Tuple[List[str], List[str]]:
+    repairs: list[str] = []
+    new_ingredients = list(ingredients)
+    for required in specific_ingredients:
+        if not required or required in new_ingredients:
+            continue
+        key = normalize_ingredient(required)
+        for idx, candidate in enumerate(new_ingredients):
+            # Only the same ingredient with other casing, plural or quantity prefix; "tomato paste" for
+            # "tomato" is a different ingredient and goes back to the model
+            if key and normalize_ingredient(candidate) == key:
+                new_ingredients[idx] = required
+                repairs.append("ingredient_spelling")
+                break
+    return new_ingredients, repairs
+
+
+def repair_recipe(recipe, specific_ingredients: List[str]):
+    """Deterministically fix cosmetic problems in a RecipeDetails so they don't cost a ModelRetry.
+
+    Returns the (possibly) repaired copy and the list of repairs applied.
+    """
+    steps, step_times, step_repairs = _repair_steps(recipe.steps, recipe.step_times)
+    ingredients, ingredient_repairs = _repair_ingredients(recipe.ingredients, specific_ingredients)
+    repairs = step_repairs + ingredient_repairs
+    if not repairs:
+        return recipe, repairs
+
+    repair_stats["repaired"] += 1
+    repair_stats.update(repairs)
+    logger.debug(f"Repaired recipe locally: {', '.join(sorted(set(repairs)))}")
+    return recipe.model_copy(update={
+        "ingredients": ingredients,
+        "steps": steps,
+        "step_times": step_times,
+    }), repairs
+
+
+def record_retry(reason: str) -> None:
+    repair_stats["retried"] += 1
+    repair_stats[f"retry:{reason}"] += 1
+
+
+def log_repair_stats() -> None:
+    if repair_stats:
+        logger.info(f"Repairs vs retries: {dict(repair_stats)}")
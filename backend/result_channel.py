@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from normalize import ingredient_matches
+
+logger = logging.getLogger()
+
+# server.js opens an extra pipe for the result and passes its descriptor here (RECIPE_RESULT_FD=3).
+# The agent writes exactly one JSON document to it and closes it; stdout is left to humans and logs.
+RESULT_FD = os.getenv("RECIPE_RESULT_FD")
+RESULT_VERSION = 1
+
+
+def result_channel_enabled() -> bool:
+    return bool(RESULT_FD)
+
+
+def new_ingredients(recipe_ingredients: List[str], specific_ingredients: List[str], available_ingredients: List[str]) -> List[str]:
+    """Ingredients the model added that the user neither asked for nor has in the inventory."""
+    known = list(specific_ingredients) + list(available_ingredients)
+    return [i for i in recipe_ingredients if not any(ingredient_matches(k, i) for k in known)]
+
+
+def build_result(
+    recipe=None,
+    timing=None,
+    added: Optional[List[str]] = None,
+    usage=None,
+    timings: Optional[Dict[str, float]] = None,
+    variant: str = "",
+    request_id: str = "",
+    source: str = "model",
+    error: Optional[str] = None,
+) -> Dict[str, Any]:
+    return {
+        "version": RESULT_VERSION,
+        "status": "ok" if recipe is not None else "failed",
+        "request_id": request_id,
+        "variant": variant,
+        # "model" for a fresh generation, "store" when served from recipe_store.py
+        "source": source,
+        "recipe": recipe.model_dump() if recipe is not None else None,
+        "timing": timing.model_dump() if timing is not None else None,
+        "new_ingredients": added or [],
+        "usage": {
+            "requests": getattr(usage, "requests", 0),
+            "request_tokens": getattr(usage, "request_tokens", None) or 0,
+            "response_tokens": getattr(usage, "response_tokens", None) or 0,
+            "total_tokens": getattr(usage, "total_tokens", None) or 0,
+        },
+        "timings_ms": {stage: round(seconds * 1000, 1) for stage, seconds in (timings or {}).items()},
+        "error": error,
+    }
+
+
+def write_result(result: Dict[str, Any]) -> bool:
+    """Write the result document to the result descriptor and close it; False when there is no channel."""
+    if not RESULT_FD:
+        return False
+    data = json.dumps(result).encode("utf-8")
+    try:
+        fd = int(RESULT_FD)
+        # os.write may write less than asked on a pipe; the reader waits for EOF, so no framing is needed
+        while data:
+            written = os.write(fd, data)
+            data = data[written:]
+        os.close(fd)
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not write the result to fd {RESULT_FD}: {e}")
+        return False
+    return True
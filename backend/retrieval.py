@@ -0,0 +1,132 @@
+import os
+import re
+import zlib
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from normalize import ingredient_tokens
+
+# Close recent recipes are retrieved with hashed feature vectors; RECIPE_RETRIEVAL=0 turns indexing off
+RETRIEVAL_ENABLED = os.getenv("RECIPE_RETRIEVAL", "1") != "0"
+# Recent-window retrieval, not top-k over the corpus: only the newest rows of a cuisine are scored, which
+# keeps a lookup to a few milliseconds however large the store grows. An older, closer recipe outside the
+# window is never found; exemplars only need to be close, not the closest
+RETRIEVAL_WINDOW = int(os.getenv("RECIPE_RETRIEVAL_WINDOW", "20000"))
+# Cosine similarity below which a past recipe is too far off to be a useful exemplar
+RETRIEVAL_MIN_SCORE = float(os.getenv("RECIPE_RETRIEVAL_MIN_SCORE", "0.2"))
+
+DIMENSIONS = 128
+# Per-row metadata kept next to the vectors so diet filtering needs no database round trip
+_META = np.dtype([("id", "<i8"), ("diet_mask", "<i8")])
+_ROW_BYTES = DIMENSIONS * 4
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+# Feature weights: ingredients define a recipe, name words only nudge the match
+_NAME_WEIGHT = 0.5
+
+
+def recipe_features(recipe: dict) -> Dict[str, float]:
+    features = {f"i:{token}": 1.0 for ingredient in recipe["ingredients"] for token in ingredient_tokens(ingredient)}
+    for word in ingredient_tokens(recipe["recipe_name"]):
+        features.setdefault(f"n:{word}", _NAME_WEIGHT)
+    return features
+
+
+def hash_vector(features: Dict[str, float]) -> np.ndarray:
+    """L2-normalized signed feature-hashing vector; crc32 keeps it stable across processes."""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for feature, weight in features.items():
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % DIMENSIONS] += weight if h & 0x80000000 else -weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _partition_name(cuisine_key: str) -> str:
+    return _SLUG_RE.sub("_", cuisine_key).strip("_") or "_"
+
+
+class VectorIndex:
+    """Append-only vector files, one pair (<cuisine>.vec, <cuisine>.meta) per cuisine, newest rows last.
+
+    Writers append under the recipe store's write transaction, so rows arrive in recipe ID order.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, partition: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, partition)
+        return base + ".vec", base + ".meta"
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith((".vec", ".meta")):
+                os.remove(os.path.join(self.directory, name))
+
+    def add_many(self, rows: Iterable[Tuple[int, str, int, dict]]) -> None:
+        """Index (recipe_id, cuisine_key, diet_mask, recipe) rows."""
+        grouped: Dict[str, List[Tuple[int, int, dict]]] = {}
+        for recipe_id, cuisine_key, diet_mask, recipe in rows:
+            grouped.setdefault(_partition_name(cuisine_key), []).append((recipe_id, diet_mask, recipe))
+        for partition, items in grouped.items():
+            vectors = np.stack([hash_vector(recipe_features(recipe)) for _, _, recipe in items])
+            meta = np.array([(recipe_id, diet_mask) for recipe_id, diet_mask, _ in items], dtype=_META)
+            vec_path, meta_path = self._paths(partition)
+            # Vectors first: a reader trusts only rows present in both files
+            with open(vec_path, "ab") as f:
+                f.write(vectors.astype("<f4").tobytes())
+            with open(meta_path, "ab") as f:
+                f.write(meta.tobytes())
+
+    def _window(self, partition: str, window: int):
+        vec_path, meta_path = self._paths(partition)
+        try:
+            rows = min(os.path.getsize(vec_path) // _ROW_BYTES, os.path.getsize(meta_path) // _META.itemsize)
+        except OSError:
+            return None
+        start = max(0, rows - window)
+        if rows == start:
+            return None
+        vectors = np.memmap(vec_path, dtype="<f4", mode="r", offset=start * _ROW_BYTES, shape=(rows - start, DIMENSIONS))
+        meta = np.memmap(meta_path, dtype=_META, mode="r", offset=start * _META.itemsize, shape=(rows - start,))
+        return vectors, meta
+
+    def partitions(self) -> List[str]:
+        return sorted(name[:-4] for name in os.listdir(self.directory) if name.endswith(".vec"))
+
+    def search(self, query: np.ndarray, cuisine_key: str = "", diet_mask: int = 0, k: int = 3,
+               window: int = RETRIEVAL_WINDOW, min_score: float = RETRIEVAL_MIN_SCORE) -> List[Tuple[int, float]]:
+        """(recipe_id, cosine) of the k closest diet-compatible recipes among the newest `window` rows, best first.
+
+        Without a cuisine every partition is scored, the window split evenly between them.
+        """
+        partitions = [_partition_name(cuisine_key)] if cuisine_key else self.partitions()
+        found: List[Tuple[int, float]] = []
+        for partition in partitions:
+            loaded = self._window(partition, max(k, window // len(partitions)))
+            if loaded is None:
+                continue
+            vectors, meta = loaded
+            scores = vectors @ query
+            if diet_mask:
+                scores[(meta["diet_mask"] & diet_mask) != diet_mask] = -1.0
+            top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+            found.extend((int(meta["id"][i]), float(scores[i])) for i in top if scores[i] >= min_score)
+        return sorted(found, key=lambda item: -item[1])[:k]
+
+
+def format_exemplars(recipes: List[dict], max_steps: int = 6, max_step_chars: int = 80) -> str:
+    """Compact prompt block: one line per exemplar with ingredients and clipped steps."""
+    if not recipes:
+        return ""
+    lines = []
+    for recipe in recipes:
+        steps = " / ".join(step[:max_step_chars] for step in recipe["steps"][:max_steps])
+        lines.append(f"    - {recipe['recipe_name']}: {', '.join(recipe['ingredients'])} | {steps}")
+    return (
+        "\n    **Similar recipes that passed review (match their length and style, suggest a new dish):**\n"
+        + "\n".join(lines) + "\n"
+    )
@@ -1,9 +1,12 @@
 const express = require('express');
 const path = require('path');
 const { spawn } = require('child_process'); // Import the child_process module
+const readline = require('readline');
+const crypto = require('crypto');
+const zlib = require('zlib');
 
 const app = express();
-const PORT = 3000;
+const PORT = process.env.PORT || 3000;
 
 // Middleware to parse form data
 app.use(express.urlencoded({ extended: true }));
@@ -14,25 +17,292 @@ app.get('/', (req, res) => {
     res.sendFile(path.join(__dirname, '../frontend/form.html'));
 });
 
+// Environment for an agent.py child: request ID, spawn timestamp and the opt-in profiling switch
+// ("X-Recipe-Profile: 1" writes cProfile/tracemalloc artifacts to backend/profiles/<request id>.*).
+// "X-Recipe-Variant: v14" pins a variant; otherwise RECIPE_VARIANT_WEIGHTS splits traffic.
+function agentEnv(req, res, extra = {}) {
+    const requestId = (req.get('X-Request-Id') || crypto.randomUUID()).slice(0, 64);
+    res.set('X-Request-Id', requestId);
+    const env = { ...process.env, ...extra, RECIPE_REQUEST_ID: requestId, RECIPE_SPAWNED_AT: String(Date.now()) };
+    if (req.deadline) {
+        // agent.py cancels generation itself when the request deadline (see admit) passes
+        env.RECIPE_DEADLINE_MS = String(req.deadline);
+    }
+    if (req.get('X-Recipe-Profile') === '1') {
+        env.RECIPE_PROFILE = '1';
+    }
+    if (req.get('X-Recipe-Variant')) {
+        env.RECIPE_VARIANT = req.get('X-Recipe-Variant');
+    }
+    return env;
+}
+
+// Admission control for generation work (agent.py children). At most RECIPE_MAX_GENERATIONS run at once;
+// up to RECIPE_MAX_QUEUE more wait in FIFO order until their deadline. A full queue is refused at once with
+// 429 and a request whose deadline passes while waiting gets 503, both with Retry-After. Each request's
+// deadline is RECIPE_REQUEST_TIMEOUT_MS, or sooner with an "X-Request-Timeout-Ms" header.
+const MAX_GENERATIONS = Number(process.env.RECIPE_MAX_GENERATIONS || 4);
+const MAX_QUEUE = Number(process.env.RECIPE_MAX_QUEUE || 16);
+const REQUEST_TIMEOUT_MS = Number(process.env.RECIPE_REQUEST_TIMEOUT_MS || 120 * 1000);
+const admission = {
+    running: 0,
+    waiting: [],
+    // Moving average of a generation's run time, for Retry-After
+    avgRunMs: 10 * 1000,
+    counters: { admitted: 0, queued: 0, rejectedFull: 0, rejectedDeadline: 0, abandoned: 0 }
+};
+
+function requestDeadline(req) {
+    const asked = Number(req.get('X-Request-Timeout-Ms'));
+    return Date.now() + (asked > 0 ? Math.min(asked, REQUEST_TIMEOUT_MS) : REQUEST_TIMEOUT_MS);
+}
+
+function retryAfterSeconds() {
+    // Time for the work ahead (running plus queued) to drain through the slots
+    const ahead = admission.running + admission.waiting.length;
+    return Math.max(1, Math.ceil(ahead / MAX_GENERATIONS * admission.avgRunMs / 1000));
+}
+
+function shed(res, status, message) {
+    res.set('Retry-After', String(retryAfterSeconds()));
+    res.status(status).format({
+        json: () => res.json({ status: 'rejected', error: message }),
+        default: () => res.send(`<h1>Generated Recipe</h1><p>${escapeHtml(message)}</p>`)
+    });
+}
+
+// Runs start(release) now or once a slot frees up; start must call release() exactly when its child exits
+function admit(req, res, start) {
+    req.deadline = requestDeadline(req);
+    const run = () => {
+        admission.running += 1;
+        admission.counters.admitted += 1;
+        const startedAt = Date.now();
+        let released = false;
+        start(() => {
+            if (released) return;
+            released = true;
+            admission.running -= 1;
+            admission.avgRunMs = 0.8 * admission.avgRunMs + 0.2 * (Date.now() - startedAt);
+            while (admission.running < MAX_GENERATIONS && admission.waiting.length) {
+                const next = admission.waiting.shift();
+                clearTimeout(next.timer);
+                next.run();
+            }
+        });
+    };
+    if (admission.running < MAX_GENERATIONS) {
+        return run();
+    }
+    if (admission.waiting.length >= MAX_QUEUE) {
+        admission.counters.rejectedFull += 1;
+        return shed(res, 429, 'The kitchen is busy, please try again shortly.');
+    }
+    const entry = { run };
+    const leave = () => {
+        const index = admission.waiting.indexOf(entry);
+        if (index !== -1) admission.waiting.splice(index, 1);
+        return index !== -1;
+    };
+    entry.timer = setTimeout(() => {
+        if (!leave()) return;
+        admission.counters.rejectedDeadline += 1;
+        shed(res, 503, 'The kitchen is too busy right now, please try again later.');
+    }, Math.max(0, req.deadline - Date.now()));
+    // A client that gives up while waiting frees its place
+    res.on('close', () => {
+        if (leave()) {
+            clearTimeout(entry.timer);
+            admission.counters.abandoned += 1;
+        }
+    });
+    admission.waiting.push(entry);
+    admission.counters.queued += 1;
+}
+
+// Ends a generation child early: SIGTERM when the client goes away (agent.py cancels the in-flight model call
+// and exits), SIGKILL if it is somehow still running a grace period after the deadline
+const DEADLINE_GRACE_MS = 2000;
+
+function superviseChild(child, req, res) {
+    const kill = (signal) => {
+        if (child.exitCode === null && child.signalCode === null) child.kill(signal);
+    };
+    res.on('close', () => {
+        if (!res.writableFinished) kill('SIGTERM');
+    });
+    const timer = setTimeout(() => kill('SIGKILL'), Math.max(0, req.deadline - Date.now()) + DEADLINE_GRACE_MS);
+    child.on('close', () => clearTimeout(timer));
+}
+
+function admissionStats() {
+    return {
+        running: admission.running,
+        waiting: admission.waiting.length,
+        maxGenerations: MAX_GENERATIONS,
+        maxQueue: MAX_QUEUE,
+        avgRunMs: Math.round(admission.avgRunMs),
+        ...admission.counters
+    };
+}
+
+// Finished results keyed by normalized inputs, kept gzip-compressed (LRU with TTL);
+// "Cache-Control: no-cache" on the request forces a fresh recipe
+const RESULT_CACHE_TTL_MS = Number(process.env.RECIPE_CACHE_TTL_MS || 10 * 60 * 1000);
+const RESULT_CACHE_MAX = Number(process.env.RECIPE_CACHE_MAX || 500);
+const resultCache = new Map();
+
+function resultCacheKey(diet, cuisine, ingredients) {
+    return JSON.stringify([
+        diet.trim().toLowerCase(),
+        cuisine.trim().toLowerCase(),
+        ingredients.map(item => item.toLowerCase()).sort()
+    ]);
+}
+
+function resultCacheGet(key) {
+    const entry = resultCache.get(key);
+    if (!entry) return null;
+    resultCache.delete(key);
+    if (Date.now() > entry.expires) return null;
+    resultCache.set(key, entry); // most recently used goes last
+    return entry.gzipped;
+}
+
+function resultCacheSet(key, gzipped) {
+    resultCache.set(key, { gzipped, expires: Date.now() + RESULT_CACHE_TTL_MS });
+    while (resultCache.size > RESULT_CACHE_MAX) {
+        resultCache.delete(resultCache.keys().next().value);
+    }
+}
+
+// Cache warming (warmup.py): RECIPE_WARMUP=1 runs it at startup and every RECIPE_WARMUP_INTERVAL_MS
+// (off-peak refreshes; 0 = startup only). Each line it prints is a finished result for one of the most
+// requested inputs and goes straight into the response cache. It is paused while live requests run.
+const WARMUP_ENABLED = process.env.RECIPE_WARMUP === '1';
+const WARMUP_INTERVAL_MS = Number(process.env.RECIPE_WARMUP_INTERVAL_MS || 0);
+let warmupProcess = null;
+let liveRequests = 0;
+
+function signalWarmup(signal) {
+    if (warmupProcess && warmupProcess.exitCode === null && process.platform !== 'win32') {
+        warmupProcess.kill(signal);
+    }
+}
+
+function startWarmup() {
+    if (warmupProcess) return;
+    warmupProcess = spawn('python', ['warmup.py', '--emit'], { stdio: ['ignore', 'pipe', 'inherit'] });
+    let warmed = 0;
+    readline.createInterface({ input: warmupProcess.stdout }).on('line', (line) => {
+        let message;
+        try {
+            message = JSON.parse(line);
+        } catch (e) {
+            return;
+        }
+        const { input, ...result } = message;
+        if (!input || result.status !== 'ok') return;
+        resultCacheSet(resultCacheKey(input.diet, input.cuisine, input.ingredients), zlib.gzipSync(JSON.stringify(result)));
+        warmed += 1;
+    });
+    warmupProcess.on('close', (code) => {
+        console.log(`Cache warm-up exited with code ${code}, ${warmed} results cached`);
+        warmupProcess = null;
+    });
+    // Started while requests are in flight: wait for them like any other pause
+    if (liveRequests > 0) signalWarmup('SIGUSR1');
+}
+
+// Live generations bracket themselves with these so the warm-up never competes with them
+function liveRequestStarted() {
+    liveRequests += 1;
+    if (liveRequests === 1) signalWarmup('SIGUSR1');
+}
+
+function liveRequestFinished() {
+    liveRequests -= 1;
+    if (liveRequests === 0) signalWarmup('SIGUSR2');
+}
+
+function escapeHtml(text) {
+    return String(text).replace(/[&<>"']/g, (c) => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' }[c]));
+}
+
+// HTML page for a result document written by agent.py (see result_channel.py)
+function renderRecipe(result) {
+    const { recipe, timing } = result;
+    const steps = recipe.steps.map((step, idx) => `<li>${escapeHtml(step)} (Time: ${escapeHtml(recipe.step_times[idx] || 'N/A')})</li>`).join('');
+    const added = result.new_ingredients.length
+        ? `<p>New ingredients added: ${result.new_ingredients.map(escapeHtml).join(', ')}</p>`
+        : '';
+    const total = timing
+        ? `<p>Total time: ${Math.round(timing.total_minutes)} min (about ${Math.round(timing.critical_path_minutes)} min with passive steps overlapped)</p>`
+        : '';
+    return `<h1>Generated Recipe</h1>
+<p><strong>Recipe Name:</strong> ${escapeHtml(recipe.recipe_name)}</p>
+<p><strong>Ingredients:</strong> ${recipe.ingredients.map(escapeHtml).join(', ')}</p>
+${added}<h2>Steps</h2><ol>${steps}</ol>${total}`;
+}
+
+// JSON (gzip as stored when the client takes it) for API clients, rendered HTML for the form
+function sendResult(req, res, gzipped, cacheStatus) {
+    res.set('X-Cache', cacheStatus);
+    res.vary('Accept').vary('Accept-Encoding');
+    if (req.accepts(['html', 'json']) === 'json') {
+        res.type('application/json');
+        if (req.acceptsEncodings('gzip')) {
+            res.set('Content-Encoding', 'gzip');
+            return res.send(gzipped);
+        }
+        return res.send(zlib.gunzipSync(gzipped));
+    }
+    res.send(renderRecipe(JSON.parse(zlib.gunzipSync(gzipped))));
+}
+
 // Handle form submissions
 app.post('/submit', (req, res) => {
-    const { diet, cuisine, ingredients } = req.body;
+    const { diet = '', cuisine = '', ingredients = '' } = req.body;
 
     // Prepare the specific ingredients by splitting the string
-    const specificIngredients = ingredients.split(',').map(item => item.trim());
+    const specificIngredients = ingredients.split(',').map(item => item.trim()).filter(Boolean);
+
+    const key = resultCacheKey(diet, cuisine, specificIngredients);
+    const cached = req.get('Cache-Control') === 'no-cache' ? null : resultCacheGet(key);
+    if (cached) {
+        recordCacheHit(diet, cuisine, specificIngredients);
+        return sendResult(req, res, cached, 'HIT');
+    }
 
-    // Spawn the Python process with arguments
+    admit(req, res, (release) => {
+        // An identical request may have finished while this one waited for a slot
+        const ready = req.get('Cache-Control') === 'no-cache' ? null : resultCacheGet(key);
+        if (ready) {
+            release();
+            recordCacheHit(diet, cuisine, specificIngredients);
+            return sendResult(req, res, ready, 'HIT');
+        }
+        generateResult(req, res, diet, cuisine, specificIngredients, key, release);
+    });
+});
+
+// The agent writes one JSON result document to fd 3 (RECIPE_RESULT_FD); stdout is not used
+function generateResult(req, res, diet, cuisine, specificIngredients, key, release) {
     const pythonProcess = spawn('python', [
         'agent.py',           // The Python script
         diet,                 // Diet (as a command-line argument)
         cuisine,              // Cuisine (as a command-line argument)
         specificIngredients.join(",")  // Ingredients (joined as a comma-separated string)
-    ]);
+    ], {
+        env: agentEnv(req, res, { RECIPE_RESULT_FD: '3' }),
+        stdio: ['ignore', 'ignore', 'pipe', 'pipe']
+    });
+    superviseChild(pythonProcess, req, res);
+    liveRequestStarted();
 
-    // Collect the output (recipe) from Python
-    let pythonOutput = '';
-    pythonProcess.stdout.on('data', (data) => {
-        pythonOutput += data.toString();
+    const resultChunks = [];
+    pythonProcess.stdio[3].on('data', (chunk) => {
+        resultChunks.push(chunk);
     });
 
     pythonProcess.stderr.on('data', (error) => {
@@ -41,13 +311,334 @@ app.post('/submit', (req, res) => {
 
     pythonProcess.on('close', (code) => {
         console.log(`Python script exited with code ${code}`);
-        res.send(`<h1>Generated Recipe</h1><pre>${pythonOutput}</pre>`);
+        liveRequestFinished();
+        release();
+        let result = null;
+        try {
+            result = JSON.parse(Buffer.concat(resultChunks).toString('utf8'));
+        } catch (e) {
+            // No (or a truncated) result document: the agent crashed before finishing
+        }
+        if (res.destroyed) {
+            return; // the client went away and the child was stopped for it
+        }
+        if (!result || result.status !== 'ok') {
+            const message = (result && result.error) || 'Recipe generation failed, please try again.';
+            return res.status(Date.now() >= req.deadline ? 504 : 502).format({
+                json: () => res.json({ status: 'failed', error: message }),
+                default: () => res.send(`<h1>Generated Recipe</h1><p>${escapeHtml(message)}</p>`)
+            });
+        }
+        const gzipped = zlib.gzipSync(JSON.stringify(result));
+        resultCacheSet(key, gzipped);
+        sendResult(req, res, gzipped, 'MISS');
+    });
+}
+
+// Stream the recipe to the browser as Server-Sent Events while it is generated
+app.get('/stream', (req, res) => {
+    const { diet = '', cuisine = '', ingredients = '' } = req.query;
+    const specificIngredients = ingredients.split(',').map(item => item.trim()).filter(Boolean);
+
+    admit(req, res, (release) => {
+        // RECIPE_EVENTS=1 makes agent.py print one JSON event per line instead of plain text
+        const env = agentEnv(req, res, { RECIPE_EVENTS: '1', PYTHONUNBUFFERED: '1' });
+        res.set({
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no'
+        });
+        res.flushHeaders();
+
+        const pythonProcess = spawn('python', ['agent.py', diet, cuisine, specificIngredients.join(',')], { env });
+        // Stops generating once the browser goes away or the deadline passes
+        superviseChild(pythonProcess, req, res);
+        liveRequestStarted();
+
+        const sendEvent = (event, data) => {
+            res.write(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`);
+        };
+
+        readline.createInterface({ input: pythonProcess.stdout }).on('line', (line) => {
+            let message;
+            try {
+                message = JSON.parse(line);
+            } catch (e) {
+                // Anything that is not an event (stray prints) stays out of the stream
+                console.log(`Python: ${line}`);
+                return;
+            }
+            sendEvent(message.event, message.data);
+        });
+
+        pythonProcess.stderr.on('data', (error) => {
+            console.error(`Error from Python script: ${error.toString()}`);
+        });
+
+        pythonProcess.on('close', (code) => {
+            console.log(`Python script exited with code ${code}`);
+            liveRequestFinished();
+            release();
+            sendEvent('end', { code });
+            res.end();
+        });
+    });
+});
+
+// Long-lived Python helper answering JSON-lines requests ({id, ...} in, {id, ...} out), so frequent small
+// requests don't pay an interpreter start each; it is restarted on the next request after it exits.
+function jsonLinesClient(script, args) {
+    let child = null;
+    let seq = 0;
+    const pending = new Map();
+    return function request(query) {
+        if (!child) {
+            child = spawn('python', [script, ...args], { stdio: ['pipe', 'pipe', 'inherit'] });
+            child.stdin.on('error', (err) => console.error(`${script}: ${err.message}`));
+            readline.createInterface({ input: child.stdout }).on('line', (line) => {
+                let response;
+                try {
+                    response = JSON.parse(line);
+                } catch (e) {
+                    return;
+                }
+                const resolve = pending.get(response.id);
+                if (resolve) {
+                    pending.delete(response.id);
+                    resolve(response);
+                }
+            });
+            child.on('close', () => {
+                child = null;
+                for (const resolve of pending.values()) resolve({ error: `${script} exited` });
+                pending.clear();
+            });
+        }
+        const id = ++seq;
+        return new Promise((resolve) => {
+            pending.set(id, resolve);
+            child.stdin.write(JSON.stringify({ id, ...query }) + '\n');
+        });
+    };
+}
+
+// Full-text search over stored recipes (recipe_store.py --serve)
+const searchQuery = jsonLinesClient('recipe_store.py', ['--serve']);
+
+// agent.py counts the requests it serves; cache hits never reach it, so they are counted here, or
+// warmup.py would stop refreshing exactly the requests the cache answers most
+function recordCacheHit(diet, cuisine, ingredients) {
+    searchQuery({ op: 'record', diet, cuisine, ingredients }).then((response) => {
+        if (response.error) console.error(`Could not record request: ${response.error}`);
+    });
+}
+
+// GET /search?q=dal+tadka[&prefix=1][&limit=10][&diet=vegan][&cuisine=Indian] -> BM25-ranked stored recipes
+app.get('/search', async (req, res) => {
+    const { q = '', prefix = '', limit = '10', diet = '', cuisine = '' } = req.query;
+    if (!q.trim()) {
+        return res.json({ matches: [] });
+    }
+    const response = await searchQuery({
+        q: String(q).slice(0, 200),
+        prefix: prefix === '1',
+        limit: Math.min(Math.max(Number(limit) || 10, 1), 50),
+        diet: String(diet),
+        cuisine: String(cuisine)
+    });
+    if (response.error) {
+        return res.status(500).json({ error: 'Search failed' });
+    }
+    res.json({ matches: response.matches, ms: response.ms });
+});
+
+// Asynchronous job API: POST /jobs answers 202 with a job ID at once; workers (job_worker.py) generate at
+// their own pace and the result is polled at GET /jobs/:id or pushed by GET /jobs/:id/events (SSE).
+// RECIPE_JOB_WORKERS starts that many worker processes with the server (0 = run them elsewhere).
+const JOB_WORKERS = Number(process.env.RECIPE_JOB_WORKERS ?? 1);
+const JOB_ID_RE = /^[0-9a-f]{32}$/;
+const jobsQuery = jsonLinesClient('job_queue.py', ['--serve']);
+// Job ID -> callbacks waiting for it to finish; woken by the workers' "finished" lines
+const jobWaiters = new Map();
+const jobWorkers = new Set();
+// A crashing worker is restarted after 1 s, 2 s, 4 s ... up to a minute, and given up on after
+// RECIPE_JOB_WORKER_MAX_RESTARTS crashes in a row; one that ran for a minute counts as healthy again
+const JOB_WORKER_MAX_RESTARTS = Number(process.env.RECIPE_JOB_WORKER_MAX_RESTARTS || 10);
+const JOB_WORKER_BACKOFF_MAX_MS = 60 * 1000;
+
+function startJobWorker(restarts = 0) {
+    const worker = spawn('python', ['job_worker.py'], { stdio: ['ignore', 'pipe', 'inherit'] });
+    const startedAt = Date.now();
+    jobWorkers.add(worker);
+    readline.createInterface({ input: worker.stdout }).on('line', (line) => {
+        let message;
+        try {
+            message = JSON.parse(line);
+        } catch (e) {
+            return;
+        }
+        for (const wake of jobWaiters.get(message.job) || []) wake();
+    });
+    worker.on('close', (code, signal) => {
+        console.log(`Job worker exited with ${signal || code}`);
+        jobWorkers.delete(worker);
+        if (signal === 'SIGTERM') return;
+        // Running jobs were returned to the queue (or their lease expires); a replacement picks them up
+        const crashes = Date.now() - startedAt >= JOB_WORKER_BACKOFF_MAX_MS ? 0 : restarts;
+        if (crashes >= JOB_WORKER_MAX_RESTARTS) {
+            console.error(`Job worker crashed ${crashes} times in a row, not restarting it`);
+            return;
+        }
+        setTimeout(() => startJobWorker(crashes + 1), Math.min(1000 * 2 ** crashes, JOB_WORKER_BACKOFF_MAX_MS));
+    });
+}
+
+// Workers return their unfinished jobs to the queue when the server stops
+process.on('exit', () => {
+    for (const worker of jobWorkers) worker.kill('SIGTERM');
+});
+process.on('SIGTERM', () => process.exit(0));
+
+app.post('/jobs', express.json(), async (req, res) => {
+    const { diet = '', cuisine = '', ingredients = '' } = req.body || {};
+    const list = Array.isArray(ingredients) ? ingredients : String(ingredients).split(',');
+    const response = await jobsQuery({
+        op: 'enqueue',
+        request: { diet: String(diet), cuisine: String(cuisine), ingredients: list.map(item => String(item).trim()).filter(Boolean) }
+    });
+    if (response.error) {
+        return res.status(500).json({ error: 'Could not queue the job' });
+    }
+    res.status(202).location(`/jobs/${response.job}`).json({ id: response.job, status: 'queued', events: `/jobs/${response.job}/events` });
+});
+
+app.get('/jobs/:id', async (req, res) => {
+    if (!JOB_ID_RE.test(req.params.id)) return res.status(404).json({ error: 'No such job' });
+    const response = await jobsQuery({ op: 'get', job: req.params.id });
+    if (response.error) return res.status(500).json({ error: 'Could not read the job' });
+    if (!response.job) return res.status(404).json({ error: 'No such job' });
+    const job = response.job;
+    if (job.status === 'done' && req.accepts(['html', 'json']) === 'html') {
+        return res.send(renderRecipe(job.result));
+    }
+    res.json(job);
+});
+
+// Status changes as "status" events, then one "result" event with the finished job. Workers started by this
+// server wake the stream as soon as a job finishes; a slow poll covers workers running elsewhere.
+app.get('/jobs/:id/events', (req, res) => {
+    const jobId = req.params.id;
+    if (!JOB_ID_RE.test(jobId)) return res.status(404).json({ error: 'No such job' });
+    res.set({
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'Connection': 'keep-alive',
+        'X-Accel-Buffering': 'no'
+    });
+    res.flushHeaders();
+    const sendEvent = (event, data) => {
+        res.write(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`);
+    };
+
+    let lastStatus = null;
+    let closed = false;
+    let timer = null;
+    let checking = false;
+    const check = async () => {
+        if (checking || closed) return;
+        checking = true;
+        clearTimeout(timer);
+        const response = await jobsQuery({ op: 'get', job: jobId });
+        checking = false;
+        if (closed) return;
+        const job = response.job;
+        if (!job) {
+            sendEvent('error', { error: response.error || 'No such job' });
+            return finish();
+        }
+        if (job.status !== lastStatus) {
+            lastStatus = job.status;
+            sendEvent('status', { status: job.status, position: job.position });
+        }
+        if (job.status === 'done' || job.status === 'failed') {
+            sendEvent('result', job);
+            return finish();
+        }
+        timer = setTimeout(check, 2000);
+    };
+    const waiters = jobWaiters.get(jobId) || new Set();
+    jobWaiters.set(jobId, waiters.add(check));
+    const finish = () => {
+        closed = true;
+        clearTimeout(timer);
+        waiters.delete(check);
+        if (!waiters.size) jobWaiters.delete(jobId);
+        res.end();
+    };
+    req.on('close', () => {
+        if (!closed) finish();
+    });
+    check();
+});
+
+// POST /shopping-list {"ids": [12, 40]} or {"recipes": [...]} -> what those recipes need beyond the pantry
+app.post('/shopping-list', express.json({ limit: '2mb' }), (req, res) => {
+    const { ids, recipes } = req.body || {};
+    if (!Array.isArray(ids) && !Array.isArray(recipes)) {
+        return res.status(400).json({ error: 'Send "ids" of stored recipes or a "recipes" list' });
+    }
+    const listProcess = spawn('python', ['shopping_list.py', '-', '--json'], { stdio: ['pipe', 'pipe', 'inherit'] });
+    let output = '';
+    listProcess.stdout.on('data', (data) => {
+        output += data.toString();
+    });
+    listProcess.on('close', (code) => {
+        // Exit code 2: the recipes sent were not valid; the process printed why
+        if (code === 2) {
+            let error = 'Invalid recipes';
+            try {
+                error = JSON.parse(output).error || error;
+            } catch (e) {}
+            return res.status(400).json({ error });
+        }
+        if (code !== 0) {
+            return res.status(500).json({ error: 'Could not build the shopping list' });
+        }
+        res.type('application/json').send(output);
+    });
+    listProcess.stdin.on('error', (err) => console.error(`Shopping list process: ${err.message}`));
+    listProcess.stdin.end(JSON.stringify(Array.isArray(ids) ? { ids: ids.map(Number).filter(Number.isInteger) } : { recipes }));
+});
+
+// Generation slots in use, queue depth and load-shedding counters since the server started
+app.get('/admission', (req, res) => {
+    res.json(admissionStats());
+});
+
+// Per-stage latency percentiles aggregated by the agent processes (see metrics.py)
+app.get('/metrics', (req, res) => {
+    const metricsProcess = spawn('python', ['metrics.py', '--json']);
+    let output = '';
+    metricsProcess.stdout.on('data', (data) => {
+        output += data.toString();
+    });
+    metricsProcess.on('close', (code) => {
+        if (code !== 0) {
+            return res.status(500).json({ error: 'Could not read metrics' });
+        }
+        res.type('application/json').send(output);
     });
 });
 
 // Start the server
 app.listen(PORT, () => {
     console.log(`Server running at http://localhost:${PORT}`);
+    for (let i = 0; i < JOB_WORKERS; i++) startJobWorker();
+    if (WARMUP_ENABLED) {
+        startWarmup();
+        if (WARMUP_INTERVAL_MS > 0) setInterval(startWarmup, WARMUP_INTERVAL_MS);
+    }
 });
 
 
@@ -0,0 +1,191 @@
+import argparse
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from normalize import normalize_ingredient
+from quantity import BASE_UNITS, InventoryIndex, Quantity, format_quantity, load_inventory, parse_quantity
+from recipe_store import get_store
+
+# python shopping_list.py recipes.json [--json]     -> what to buy for a list of recipes (or meal_plan.py --json output)
+# python shopping_list.py --ids 12,40,41 [--json]   -> the same for stored recipes
+# python shopping_list.py - --json                  -> recipes or {"ids": [...]} on stdin (server.js /shopping-list)
+
+_UNIT_INDEX = {unit: i for i, unit in enumerate(BASE_UNITS)}
+
+
+@dataclass
+class ShoppingItem:
+    name: str
+    # Amount still missing in `unit`; None when no recipe gave an amount
+    amount: Optional[float]
+    unit: str
+    recipes: int
+    # True when the pantry has some, just not enough
+    in_pantry: bool
+
+    def describe(self) -> str:
+        amount = format_quantity(self.amount, self.unit) if self.amount is not None else "as needed"
+        return f"{self.name}: {amount} ({self.recipes} recipe{'s' if self.recipes != 1 else ''})"
+
+
+def recipe_lines(recipe: dict) -> List[str]:
+    """Ingredient lines with their amounts; meal plans keep amounts in a separate 'quantities' list."""
+    quantities = recipe.get("quantities")
+    if quantities and len(quantities) == len(recipe["ingredients"]):
+        return [f"{amount} {ingredient}" for ingredient, amount in zip(recipe["ingredients"], quantities)]
+    return list(recipe["ingredients"])
+
+
+class ShoppingListBuilder:
+    """Sums what many recipes need per pantry item and unit, and subtracts what the pantry surely has.
+
+    Ingredient text is parsed once per distinct line (recipes repeat the same lines a lot); the sums,
+    stock subtraction and recipe counts are array operations over every line of every recipe.
+    """
+
+    def __init__(self, inventory: Dict[str, Optional[Quantity]]):
+        self.names = list(inventory)
+        self.index = InventoryIndex(self.names)
+        self._slots = {name: i for i, name in enumerate(self.names)}
+        self._pantry_size = len(self.names)
+        # (item, unit) -> the lower end of the pantry range; an item with no parsable amount counts as enough
+        self._stock_rows = [(self._slots[name], _UNIT_INDEX[quantity.unit], quantity.low)
+                            for name, quantity in inventory.items() if quantity is not None]
+        self._unlimited = [self._slots[name] for name, quantity in inventory.items() if quantity is None]
+        self._parsed: Dict[str, Tuple[int, int, float, bool]] = {}
+
+    def _slot(self, line: str) -> Optional[Tuple[int, int, float, bool]]:
+        parsed = self._parsed.get(line)
+        if parsed is None:
+            name = self.index.find(line)
+            if name is None:
+                # Not in the pantry at all: buy it, under its normalized name
+                name = normalize_ingredient(line)
+                if not name:
+                    return None
+                if name not in self._slots:
+                    self._slots[name] = len(self.names)
+                    self.names.append(name)
+            quantity = parse_quantity(line)
+            unit = _UNIT_INDEX[quantity.unit] if quantity else _UNIT_INDEX["count"]
+            parsed = (self._slots[name], unit, quantity.high if quantity else 0.0, quantity is not None)
+            self._parsed[line] = parsed
+        return parsed
+
+    def build(self, recipes: List[dict]) -> List[ShoppingItem]:
+        rows = [(number,) + parsed for number, recipe in enumerate(recipes) for line in recipe_lines(recipe)
+                for parsed in [self._slot(line)] if parsed is not None]
+        if not rows:
+            return []
+        recipe_ids, items, units, amounts, known = (np.array(column) for column in zip(*rows))
+        size, width = len(self.names), len(BASE_UNITS)
+
+        cells = items * width + units
+        needed = np.bincount(cells, weights=amounts, minlength=size * width).reshape(size, width)
+        quantified = np.bincount(cells, weights=known, minlength=size * width).reshape(size, width) > 0
+        # Distinct (recipe, item) pairs, so an ingredient listed twice in one recipe counts once
+        pairs = np.unique(recipe_ids * size + items)
+        used_by = np.bincount(pairs % size, minlength=size)
+
+        stock = np.zeros((size, width))
+        stocked = np.zeros((size, width), dtype=bool)
+        if self._stock_rows:
+            slots, stock_units, lows = (np.array(column) for column in zip(*self._stock_rows))
+            stock[slots, stock_units] = lows
+            stocked[slots, stock_units] = True
+        in_pantry = np.zeros(size, dtype=bool)
+        in_pantry[:self._pantry_size] = True
+        # Pantry items without an amount, or stocked in another unit (no density table), are assumed enough
+        comparable = stocked | ~in_pantry[:, None]
+        comparable[self._unlimited] = False
+        deficit = np.where(comparable, np.maximum(needed - stock, 0.0), 0.0)
+
+        missing = comparable & (deficit > 0)
+        # Items outside the pantry that no recipe gave an amount for still go on the list, amount unknown
+        unknown = ~in_pantry & (used_by > 0) & ~quantified.any(axis=1)
+        shopping = [ShoppingItem(self.names[i], float(deficit[i, u]), BASE_UNITS[u], int(used_by[i]), bool(in_pantry[i]))
+                    for i, u in zip(*np.nonzero(missing))]
+        shopping += [ShoppingItem(self.names[i], None, "count", int(used_by[i]), False) for i in np.nonzero(unknown)[0]]
+        return sorted(shopping, key=lambda item: (-item.recipes, item.name))
+
+
+def stored_recipes(ids: List[int]) -> List[dict]:
+    store = get_store()
+    return store.get_many(ids) if ids and store is not None else []
+
+
+def _checked_recipe(entry) -> Optional[dict]:
+    """The recipe of a recipe or result document (None for a failed result); ValueError for anything else."""
+    if not isinstance(entry, dict):
+        raise ValueError("each recipe must be a JSON object")
+    # Result documents wrap the recipe; failed ones have none
+    recipe = entry["recipe"] if "recipe" in entry else entry
+    if recipe is None:
+        return None
+    ingredients = recipe.get("ingredients", []) if isinstance(recipe, dict) else None
+    if not isinstance(ingredients, list) or not all(isinstance(line, str) for line in ingredients):
+        raise ValueError("a recipe needs an \"ingredients\" list of strings")
+    return recipe
+
+
+def load_recipes(source: str, ids: Optional[List[int]] = None) -> List[dict]:
+    """Recipes from stored IDs, a JSON file, '-' for stdin, or JSONL result documents (bulk_generate.py output).
+
+    Raises ValueError for input that is not recipes (bad JSON, non-object entries, IDs that aren't integers).
+    """
+    if ids:
+        return stored_recipes(ids)
+    text = sys.stdin.read() if source == "-" else open(source, encoding="utf-8").read()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict) and "ids" in data:
+        if not isinstance(data["ids"], list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in data["ids"]):
+            raise ValueError("\"ids\" must be a list of integer recipe IDs")
+        return stored_recipes(data["ids"])
+    if isinstance(data, dict):
+        data = data.get("recipes", [data])
+    if not isinstance(data, list):
+        raise ValueError("expected a recipe, a list of recipes or {\"ids\": [...]}")
+    recipes = [_checked_recipe(entry) for entry in data]
+    return [recipe for recipe in recipes if recipe and recipe.get("ingredients")]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Consolidated list of what a set of recipes needs beyond the pantry.")
+    parser.add_argument("recipes", nargs="?", default="-", help="JSON/JSONL file of recipes, or - for stdin")
+    parser.add_argument("--ids", default="", help="comma-separated stored recipe IDs instead of a file")
+    parser.add_argument("--inventory", default="ingredients.xlsx")
+    parser.add_argument("--json", action="store_true", help="print the list as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        recipes = load_recipes(args.recipes, [int(i) for i in args.ids.split(",") if i.strip()])
+    except ValueError as e:
+        # Exit code 2 is bad input (server.js answers 400), as for argparse's own errors
+        if args.json:
+            print(json.dumps({"error": str(e)}))
+        else:
+            print(f"Invalid recipes: {e}", file=sys.stderr)
+        return 2
+    builder = ShoppingListBuilder(load_inventory(args.inventory))
+    started = time.perf_counter()
+    items = builder.build(recipes)
+    elapsed = (time.perf_counter() - started) * 1000
+    if args.json:
+        print(json.dumps({"recipes": len(recipes), "items": [asdict(item) for item in items], "ms": elapsed}))
+    else:
+        for item in items:
+            print(item.describe())
+        print(f"{len(items)} items to buy for {len(recipes)} recipes in {elapsed:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import re
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+_NUMBER = r"(\d+(?:\.\d+)?)\s*(?:-|–|to)?\s*(\d+(?:\.\d+)?)?\s*"
+_HOURS = re.compile(_NUMBER + r"(?:hours?|hrs?|h)\b")
+_MINUTES = re.compile(_NUMBER + r"(?:minutes?|mins?|m)\b")
+_SECONDS = re.compile(_NUMBER + r"(?:seconds?|secs?|s)\b")
+_BARE_NUMBER = re.compile(r"^\s*(?:time\s*:\s*)?(\d+(?:\.\d+)?)\s*$")
+# "about 10", "approx. 5 min", "~20 minutes": the estimate is the number
+_APPROX = r"~|\b(?:about|approx(?:imately)?|around|roughly|nearly|almost)\b\.?"
+
+# Steps that run unattended and can overlap with the next active steps
+PASSIVE_STEP_RE = re.compile(
+    r"\b(?:simmer|marinat|rest|soak|bake|chill|refrigerat|ferment|proof|rise|cool|roast|slow[- ]cook|"
+    r"pressure[- ]cook|steep|set aside|leave|let it|whistle)",
+    re.IGNORECASE,
+)
+
+
+class RecipeTiming(BaseModel):
+    """Numeric timing derived from RecipeDetails.step_times."""
+    step_minutes: List[Optional[float]]
+    total_minutes: float
+    critical_path_minutes: float
+    unparsed_steps: List[int]
+
+
+def _component(times: pd.Series, pattern: re.Pattern) -> pd.Series:
+    parts = times.str.extract(pattern)
+    low = pd.to_numeric(parts[0], errors="coerce")
+    high = pd.to_numeric(parts[1], errors="coerce").fillna(low)
+    # "10-15 min" counts as the midpoint
+    return (low + high) / 2
+
+
+def parse_step_minutes(times: pd.Series) -> pd.Series:
+    """Vectorized: free-text step times ('5 min', 'Time: 1 hr 30 mins', '10-15 minutes') -> minutes.
+
+    Unparsable values come back as NaN so callers can flag them instead of retrying.
+    """
+    times = times.fillna("").astype(str).str.lower().str.replace(_APPROX, "", regex=True)
+    hours = _component(times, _HOURS)
+    minutes = _component(times, _MINUTES)
+    seconds = _component(times, _SECONDS)
+    total = hours.fillna(0) * 60 + minutes.fillna(0) + seconds.fillna(0) / 60
+    parsed = hours.notna() | minutes.notna() | seconds.notna()
+
+    # A bare number is taken to be minutes
+    bare = pd.to_numeric(times.str.extract(_BARE_NUMBER)[0], errors="coerce")
+    total = total.where(parsed, bare)
+    return total.astype(float)
+
+
+def critical_path_minutes(step_minutes: Sequence[float], passive: Sequence[bool]) -> float:
+    """Wall-clock time when passive steps (simmering, marinating, ...) overlap the following active work.
+
+    Active steps run back to back; a passive step starts when reached and runs in the background;
+    the final step waits for every passive step to finish.
+    """
+    cursor = 0.0
+    passive_end = 0.0
+    last = len(step_minutes) - 1
+    for idx, (minutes, is_passive) in enumerate(zip(step_minutes, passive)):
+        minutes = 0.0 if minutes is None or np.isnan(minutes) else float(minutes)
+        if idx == last:
+            cursor = max(cursor, passive_end) + minutes
+        elif is_passive:
+            passive_end = max(passive_end, cursor + minutes)
+        else:
+            cursor += minutes
+    return max(cursor, passive_end)
+
+
+def add_timing_columns(recipes: pd.DataFrame) -> pd.DataFrame:
+    """Bulk timing for many recipes: expects list columns `steps` and `step_times`.
+
+    Adds `step_minutes`, `total_minutes`, `critical_path_minutes` and `unparsed_steps` so that
+    filtering/sorting by time is a plain numeric operation.
+    """
+    recipes = recipes.copy()
+    # One row per step, each paired with its time by position (missing times stay NaN)
+    steps = recipes["steps"].explode().dropna().to_frame("step")
+    steps["position"] = steps.groupby(level=0).cumcount()
+    times = recipes["step_times"].explode().dropna().to_frame("time")
+    times["position"] = times.groupby(level=0).cumcount()
+    key = recipes.index.name or "index"
+    flat = steps.reset_index().merge(times.reset_index(), on=[key, "position"], how="left").set_index(key)
+    flat.index.name = recipes.index.name
+    flat["minutes"] = parse_step_minutes(flat["time"]).to_numpy()
+    flat["passive"] = flat["step"].fillna("").str.contains(PASSIVE_STEP_RE).to_numpy()
+
+    grouped = flat.groupby(level=0)
+    minutes = flat["minutes"].fillna(0.0)
+    is_last = flat["position"] == grouped["position"].transform("size") - 1
+    # Same schedule as critical_path_minutes(), as column operations: active steps (except the last) push the
+    # cursor, a passive step finishes at its start plus its length, the last step waits for both
+    active = minutes.where(~flat["passive"] & ~is_last, 0.0)
+    cursor_before = active.groupby(level=0).cumsum() - active
+    passive_end = (cursor_before + minutes).where(flat["passive"] & ~is_last, 0.0).groupby(level=0).max()
+    last = is_last.to_numpy()
+    recipes["critical_path_minutes"] = (
+        np.maximum(cursor_before[last], passive_end.reindex(cursor_before.index[last])) + minutes[last]
+    )
+    recipes["total_minutes"] = grouped["minutes"].sum(min_count=0)
+    recipes["step_minutes"] = flat["minutes"].astype(object).where(flat["minutes"].notna(), None).groupby(level=0).agg(list)
+    recipes["unparsed_steps"] = flat.loc[flat["minutes"].isna(), "position"].groupby(level=0).agg(list)
+    for column in ("total_minutes", "critical_path_minutes"):
+        recipes[column] = recipes[column].fillna(0.0)
+    # Recipes without steps (or without unparsed ones) have no rows in `flat`
+    for column in ("step_minutes", "unparsed_steps"):
+        recipes[column] = [value if isinstance(value, list) else [] for value in recipes[column]]
+    return recipes
+
+
+def recipe_timing(steps: List[str], step_times: List[str]) -> RecipeTiming:
+    """Timing for a single recipe."""
+    minutes = parse_step_minutes(pd.Series(list(step_times) + [""] * (len(steps) - len(step_times)), dtype=object))
+    minutes = minutes.iloc[:len(steps)].tolist()
+    passive = [bool(PASSIVE_STEP_RE.search(step)) for step in steps]
+    return RecipeTiming(
+        step_minutes=[None if np.isnan(m) else m for m in minutes],
+        total_minutes=float(np.nansum(minutes)) if minutes else 0.0,
+        critical_path_minutes=critical_path_minutes(minutes, passive),
+        unparsed_steps=[idx for idx, m in enumerate(minutes) if np.isnan(m)],
+    )
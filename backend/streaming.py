@@ -0,0 +1,131 @@
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic_core import from_json
+from pydantic_ai import ModelRetry
+from pydantic_ai.messages import ToolCallPart
+
+from normalize import ingredient_matches
+from repair import record_retry
+import failure_analytics
+
+logger = logging.getLogger()
+
+# Set RECIPE_STREAMING=0 to fall back to the blocking recipe_agent.run path
+STREAMING_ENABLED = os.getenv("RECIPE_STREAMING", "1") != "0"
+STREAM_DEBOUNCE = float(os.getenv("RECIPE_STREAM_DEBOUNCE", "0.05"))
+
+
+class EarlyAbort(Exception):
+    """Raised while streaming when the partial recipe can already be rejected."""
+
+    def __init__(self, reason: str, message: str, missing: Optional[List[str]] = None):
+        super().__init__(message)
+        self.reason = reason
+        self.missing = missing or []
+
+
+def _tool_args(part: ToolCallPart) -> Dict[str, Any]:
+    """Parse the (possibly incomplete) JSON arguments of a streamed result tool call."""
+    args = part.args
+    if isinstance(args, dict):
+        return args
+    raw = getattr(args, "args_dict", None) or getattr(args, "args_json", args)
+    if isinstance(raw, dict):
+        return raw
+    if not raw:
+        return {}
+    try:
+        # Only completed strings are kept, so a half-written ingredient is never checked
+        parsed = from_json(raw, allow_partial=True)
+    except ValueError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def _partial_recipe(message) -> Optional[Dict[str, Any]]:
+    for part in message.parts:
+        if isinstance(part, ToolCallPart) and part.tool_name.endswith("RecipeDetails"):
+            return _tool_args(part)
+    return None
+
+
+def check_partial_recipe(args: Dict[str, Any], deps) -> Optional[EarlyAbort]:
+    """Decide from a partial RecipeDetails whether finishing it is pointless."""
+    ingredients: List[str] = [i for i in args.get("ingredients") or [] if isinstance(i, str)]
+
+    violations = [
+        i for i in deps.diet_table.violations(ingredients, deps.diet_mask)
+        if i not in deps.specific_ingredients
+    ]
+    if violations:
+        return EarlyAbort("diet_violation", f"Do not use {', '.join(violations)}: they break the diet.")
+
+    # The ingredient list is only final once the model has moved on to the steps
+    if "steps" in args or "step_times" in args:
+        missing = [
+            required for required in deps.specific_ingredients
+            if required and not any(ingredient_matches(required, i) for i in ingredients)
+        ]
+        if missing:
+            return EarlyAbort("missing_ingredients", f"The recipe must include: {', '.join(missing)}.", missing)
+
+        session = getattr(deps, "session", None)
+        if session is not None and isinstance(args.get("recipe_name"), str):
+            duplicate = session.find_duplicate(args["recipe_name"], ingredients)
+            if duplicate:
+                return EarlyAbort("duplicate", f"Too similar to '{duplicate}', suggest a clearly different recipe.")
+    return None
+
+
+def _retry_cause(error: BaseException) -> Optional[ModelRetry]:
+    while error is not None:
+        if isinstance(error, ModelRetry):
+            return error
+        error = error.__cause__
+    return None
+
+
+async def stream_recipe(
+    agent,
+    prompt: str,
+    deps,
+    message_history=None,
+    on_partial: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+) -> Tuple[Any, Any, Any]:
+    """Run the agent with streamed structured output, aborting as soon as the partial recipe fails.
+
+    Returns (data, usage, streamed_result). Raises EarlyAbort or ModelRetry when the caller should
+    retry; the caller is expected to feed `str(error)` back into the next prompt.
+    """
+    async with agent.run_stream(prompt, deps=deps, message_history=message_history) as result:
+        stream = result.stream_structured(debounce_by=STREAM_DEBOUNCE)
+        async for message, last in stream:
+            args = _partial_recipe(message)
+            if args is None:
+                continue
+            abort = check_partial_recipe(args, deps)
+            if abort is not None:
+                # Leaving the context manager closes the response stream and stops generation
+                record_retry(abort.reason)
+                failure_analytics.record_event("early_abort", abort.reason, abort.missing, usage=result.usage())
+                logger.info(f"Aborting streamed recipe early ({abort.reason}): {abort}")
+                # Close in this task so tracing spans inside the generator detach cleanly. A stream that
+                # already delivered everything raises from aclose; the abort is what the caller must see
+                try:
+                    await stream.aclose()
+                except (RuntimeError, StopAsyncIteration):
+                    pass
+                raise abort
+            if on_partial is not None:
+                await on_partial(args)
+
+        try:
+            data = await result.get_data()
+        except Exception as e:
+            retry = _retry_cause(e)
+            if retry is None:
+                raise
+            raise retry from e
+        return data, result.usage(), result
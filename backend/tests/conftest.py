@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+# Offline and side-effect free: the mock model, no analytics or store, logs and metrics in a scratch directory.
+# Set before any backend module is imported, since they read their configuration at import time.
+_SCRATCH = tempfile.mkdtemp(prefix="recipe-tests-")
+os.environ.update({
+    "RECIPE_MOCK_MODEL": "1",
+    "RECIPE_MOCK_LATENCY_PER_TOKEN": "0",
+    "RECIPE_ANALYTICS": "0",
+    "RECIPE_STORE": "0",
+    "RECIPE_METRICS_FILE": os.path.join(_SCRATCH, "metrics.json"),
+    "RECIPE_LOG_FILE": os.path.join(_SCRATCH, "recipe_generation.log"),
+    "LOGFIRE_SEND_TO_LOGFIRE": "false",
+    "LOGFIRE_CONSOLE": "false",
+    "LOGFIRE_IGNORE_NO_CONFIG": "1",
+})
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+from pydantic_ai.messages import ModelResponse, RetryPromptPart
+from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+
+import engine
+from engine import RecipeEngine
+from mock_model import _tool_call
+from variants import DEFAULT_VARIANT, VARIANTS
+
+COMPLETE = {"recipe_name": "Tofu Stir Fry", "ingredients": ["tofu", "rice"], "steps": ["fry the tofu", "steam the rice"],
+            "step_times": ["10 min", "20 min"]}
+MISSING_TOFU = {**COMPLETE, "ingredients": ["rice"]}
+
+
+class ScriptedModel:
+    """Answers with MISSING_TOFU for the first `bad_calls` calls, then with COMPLETE."""
+
+    def __init__(self, bad_calls: int):
+        self.bad_calls = bad_calls
+        self.calls = 0
+
+    def _next(self) -> dict:
+        self.calls += 1
+        return MISSING_TOFU if self.calls <= self.bad_calls else COMPLETE
+
+    def respond(self, messages, info) -> ModelResponse:
+        return ModelResponse(parts=[_tool_call(info.result_tools[0].name, self._next())])
+
+    async def stream(self, messages, info):
+        # Burst delivery: every chunk arrives before the first debounced partial is checked, so the
+        # stream is already exhausted when the check aborts it
+        payload = json.dumps(self._next())
+        yield {0: DeltaToolCall(name=info.result_tools[0].name)}
+        for idx in range(0, len(payload), 16):
+            yield {0: DeltaToolCall(json_args=payload[idx:idx + 16])}
+
+    def model(self) -> FunctionModel:
+        return FunctionModel(self.respond, stream_function=self.stream)
+
+
+def generate(scripted: ScriptedModel, streaming: bool, monkeypatch):
+    monkeypatch.setattr(engine, "STREAMING_ENABLED", streaming)
+    recipe_engine = RecipeEngine(VARIANTS[DEFAULT_VARIANT], model=scripted.model())
+    deps = recipe_engine.make_deps("", "Thai", ["tofu"], ["Rice", "Salt"])
+    return asyncio.run(recipe_engine.generate(deps, lambda recipe: True))
+
+
+def test_early_abort_on_exhausted_stream_retries(monkeypatch):
+    scripted = ScriptedModel(bad_calls=1)
+    recipe, _ = generate(scripted, True, monkeypatch)
+    assert recipe is not None and "tofu" in recipe.ingredients
+    assert scripted.calls == 2
+
+
+def test_non_streaming_validation_failures_count_toward_max_attempts(monkeypatch):
+    monkeypatch.setattr(engine, "MAX_ATTEMPTS", 3)
+    scripted = ScriptedModel(bad_calls=10 ** 6)
+    recipe, _ = generate(scripted, False, monkeypatch)
+    assert recipe is None
+    # Each attempt is one call plus the validator's in-run retry, and no attempt after the third
+    assert scripted.calls == 3 * 2
+
+
+def test_non_streaming_retry_feeds_back_the_rejection(monkeypatch):
+    prompts = []
+
+    class Recording(ScriptedModel):
+        def respond(self, messages, info):
+            if not any(isinstance(p, RetryPromptPart) for p in messages[-1].parts):
+                prompts.append(messages[-1].parts[-1].content)
+            return super().respond(messages, info)
+
+    recipe, _ = generate(Recording(bad_calls=2), False, monkeypatch)
+    assert recipe is not None
+    assert "rejected:** Missing required ingredients: tofu" in prompts[-1]
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_first_valid_recipe_is_returned(streaming, monkeypatch):
+    recipe, usage = generate(ScriptedModel(bad_calls=0), streaming, monkeypatch)
+    assert recipe.recipe_name == COMPLETE["recipe_name"]
+    assert usage.requests == 1
@@ -0,0 +1,41 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from job_queue import JobQueue
+from variants import choose_variant
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_jobs_follow_the_variant_split(tmp_path):
+    weights = "agent=50,v14=50"
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    ids = [queue.enqueue({"diet": "vegetarian", "cuisine": "Indian", "ingredients": ["rice"]}) for _ in range(8)]
+    expected = {job_id: choose_variant(job_id, weights, "") for job_id in ids}
+    assert set(expected.values()) == {"agent", "v14"}
+
+    env = {**os.environ, "RECIPE_JOBS_PATH": str(tmp_path / "jobs.db"), "RECIPE_VARIANT_WEIGHTS": weights,
+           "RECIPE_METRICS_FILE": str(tmp_path / "metrics.json")}
+    env.pop("RECIPE_VARIANT", None)
+    worker = subprocess.Popen([sys.executable, "job_worker.py", "--concurrency", "4"], cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 60
+        while queue.stats()["done"] + queue.stats()["failed"] < len(ids) and time.monotonic() < deadline:
+            time.sleep(0.2)
+    finally:
+        worker.send_signal(signal.SIGTERM)
+        worker.wait(timeout=30)
+
+    for job_id in ids:
+        job = queue.get(job_id)
+        assert job["status"] == "done"
+        assert job["result"]["variant"] == expected[job_id]
+    # Stage timings are labelled with the job's variant, not the worker's
+    with open(tmp_path / "metrics.json") as f:
+        labels = {key.split("|", 1)[1] for key in json.load(f) if key.startswith("model_call|")}
+    assert labels == {"agent", "v14"}
@@ -0,0 +1,55 @@
+import asyncio
+import os
+
+import httpx
+import openai
+from pydantic_ai.models.function import FunctionModel
+
+from meal_plan import build_plan_agent, generate_meal_plan
+from mock_model import MockRecipeModel
+
+INVENTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ingredients.xlsx")
+
+
+def rate_limited(retry_after: str = "0.01") -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, request=request, headers={"retry-after": retry_after})
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def plan(model, meals: int = 9):
+    return asyncio.run(generate_meal_plan(meals, "vegetarian", "Indian", ["rice"], INVENTORY, build_plan_agent(model)))
+
+
+def test_rate_limit_backs_off_and_keeps_planning():
+    mock = MockRecipeModel(latency_per_token=0)
+    calls = []
+
+    async def respond(messages, info):
+        calls.append(len(messages))
+        # Calls 1-2 plan the first batch (the mock's first plan overdraws the pantry); the second batch's
+        # first call is rate limited
+        if len(calls) == 3:
+            raise rate_limited()
+        return await mock.respond(messages, info)
+
+    recipes, _, _ = plan(FunctionModel(respond))
+    assert len(recipes) == 9
+
+
+def test_batch_gives_up_after_max_attempts(monkeypatch):
+    monkeypatch.setattr("engine.MAX_ATTEMPTS", 2)
+    calls = []
+
+    async def respond(messages, info):
+        calls.append(1)
+        raise rate_limited()
+
+    recipes, _, _ = plan(FunctionModel(respond))
+    assert recipes == [] and len(calls) == 2
+
+
+def test_planned_recipes_are_repaired_like_single_recipes():
+    # The mock numbers its steps ("Step 1: ..."), a cosmetic problem the repair strips
+    recipes, _, _ = plan(FunctionModel(MockRecipeModel(latency_per_token=0).respond), meals=3)
+    assert recipes and not any(step.lower().startswith("step") for recipe in recipes for step in recipe.steps)
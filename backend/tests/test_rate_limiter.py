@@ -0,0 +1,42 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter
+
+
+@pytest.mark.skipif(rate_limiter.fcntl is None, reason="shared state needs flock")
+def test_acquire_waits_for_the_shared_lock_without_blocking_the_loop(tmp_path):
+    path = str(tmp_path / "limits.json")
+    limiter = RateLimiter(rpm=60, tpm=10000, shared_state_path=path)
+    held = open(path, "a+")
+    rate_limiter.fcntl.flock(held, rate_limiter.fcntl.LOCK_EX)
+    # Another agent process holding the lock for a while
+    threading.Timer(0.5, rate_limiter.fcntl.flock, (held, rate_limiter.fcntl.LOCK_UN)).start()
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.05)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        reservation = await limiter.acquire(100)
+        ticker.cancel()
+        return reservation, ticks
+
+    try:
+        reservation, ticks = asyncio.run(main())
+    finally:
+        held.close()
+    assert reservation.estimated_tokens == 100
+    assert ticks >= 5
+    # The reservation reached the shared file for the other processes
+    with open(path) as f:
+        assert json.load(f)["requests"][0] == pytest.approx(59, abs=0.1)
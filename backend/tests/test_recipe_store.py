@@ -0,0 +1,42 @@
+import sqlite3
+
+from recipe_store import RecipeStore
+
+QUICK = {"recipe_name": "Tofu Scramble", "ingredients": ["tofu", "turmeric"], "steps": ["crumble the tofu", "fry it"],
+         "step_times": ["5 min", "10 minutes"]}
+# The 30-minute marinade overlaps the 15 minutes of chopping
+MARINATED = {"recipe_name": "Tofu Tikka", "ingredients": ["tofu", "yogurt"],
+             "steps": ["marinate the tofu", "chop the onions", "grill"], "step_times": ["30 min", "15 min", "10 min"]}
+
+
+def minutes(store: RecipeStore) -> dict:
+    return {name: (total, critical) for name, total, critical in
+            store.conn.execute("SELECT name, total_minutes, critical_path_minutes FROM recipes")}
+
+
+def test_timing_is_stored_at_insert(tmp_path):
+    store = RecipeStore(str(tmp_path / "store.db"))
+    store.add(QUICK, "American")
+    store.add_many([(MARINATED, "Indian")])
+    assert minutes(store) == {"Tofu Scramble": (15.0, 15.0), "Tofu Tikka": (55.0, 40.0)}
+
+
+def test_search_filters_on_critical_path_minutes(tmp_path):
+    store = RecipeStore(str(tmp_path / "store.db"))
+    store.add_many([(QUICK, "Indian"), (MARINATED, "Indian")])
+    assert [m["recipe"]["recipe_name"] for m in store.search(["tofu"], max_minutes=20)] == ["Tofu Scramble"]
+    assert len(store.search(["tofu"], max_minutes=40)) == 2
+
+
+def test_store_without_timing_columns_is_backfilled(tmp_path):
+    path = str(tmp_path / "store.db")
+    store = RecipeStore(path)
+    store.add(MARINATED, "Indian")
+    store.close()
+    # A store written before the timing columns existed
+    conn = sqlite3.connect(path)
+    conn.execute("ALTER TABLE recipes DROP COLUMN total_minutes")
+    conn.execute("ALTER TABLE recipes DROP COLUMN critical_path_minutes")
+    conn.commit()
+    conn.close()
+    assert minutes(RecipeStore(path)) == {"Tofu Tikka": (55.0, 40.0)}
@@ -0,0 +1,42 @@
+import io
+import json
+
+import pytest
+
+import shopping_list
+from shopping_list import load_recipes
+
+
+def stdin(monkeypatch, payload) -> None:
+    monkeypatch.setattr("sys.stdin", io.StringIO(json.dumps(payload)))
+
+
+def test_empty_ids_is_an_empty_list(monkeypatch):
+    # What server.js sends when none of the posted IDs was an integer
+    stdin(monkeypatch, {"ids": []})
+    assert load_recipes("-") == []
+
+
+def test_result_documents_are_unwrapped_and_failed_ones_skipped(monkeypatch):
+    recipe = {"recipe_name": "Dal", "ingredients": ["1 cup toor dal", "salt"]}
+    stdin(monkeypatch, [{"status": "ok", "recipe": recipe}, {"status": "failed", "recipe": None}])
+    assert load_recipes("-") == [recipe]
+
+
+@pytest.mark.parametrize("payload", [
+    [1, "dal"],
+    {"ids": ["12"]},
+    {"ids": 12},
+    {"recipes": [{"ingredients": "salt"}]},
+    {"recipes": 5},
+])
+def test_invalid_input_is_a_value_error(monkeypatch, payload):
+    stdin(monkeypatch, payload)
+    with pytest.raises(ValueError):
+        load_recipes("-")
+
+
+def test_cli_reports_invalid_input_as_json_with_exit_code_2(monkeypatch, capsys):
+    stdin(monkeypatch, [1, 2])
+    assert shopping_list.main(["-", "--json"]) == 2
+    assert json.loads(capsys.readouterr().out) == {"error": "each recipe must be a JSON object"}
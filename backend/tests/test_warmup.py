@@ -0,0 +1,31 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from recipe_store import RecipeStore
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="live-traffic signals are POSIX only")
+def test_live_traffic_signal_during_startup_pauses_instead_of_killing(tmp_path):
+    store_path = str(tmp_path / "store.db")
+    RecipeStore(store_path).record_request("vegan", "Thai", ["tofu"])
+    env = {**os.environ, "RECIPE_STORE": "1", "RECIPE_STORE_PATH": store_path}
+    process = subprocess.Popen([sys.executable, "warmup.py", "--rpm", "0", "--emit"], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    # Still importing: the event loop and its signal handlers do not exist yet
+    time.sleep(0.3)
+    process.send_signal(signal.SIGUSR1)
+    with pytest.raises(subprocess.TimeoutExpired):
+        # Paused for the live request instead of generating (or dying of the default SIGUSR1 action)
+        process.wait(timeout=5)
+    process.send_signal(signal.SIGUSR2)
+    out, _ = process.communicate(timeout=60)
+    assert process.returncode == 0
+    assert json.loads(out.splitlines()[0])["status"] == "ok"
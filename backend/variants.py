@@ -0,0 +1,224 @@
+import os
+import zlib
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, List, Optional
+
+from diet import diet_names
+
+
+# A validation rule returns None to accept the recipe or a Rejection to send it back to the model
+@dataclass
+class Rejection:
+    reason: str
+    message: str
+    missing: List[str] = field(default_factory=list)
+
+
+def require_ingredients(deps, recipe) -> Optional[Rejection]:
+    missing = [i for i in deps.specific_ingredients if i not in recipe.ingredients]
+    if missing:
+        return Rejection("missing_ingredients", f"Missing required ingredients: {', '.join(missing)}", missing)
+    return None
+
+
+def require_complete(deps, recipe) -> Optional[Rejection]:
+    if not recipe.ingredients or not recipe.steps:
+        return Rejection("incomplete", "Incomplete recipe data detected.")
+    return None
+
+
+def respect_diet(deps, recipe) -> Optional[Rejection]:
+    # Ingredients the user asked for explicitly are never treated as violations
+    violations = [
+        i for i in deps.diet_table.violations(recipe.ingredients, deps.diet_mask)
+        if i not in deps.specific_ingredients
+    ]
+    if violations:
+        return Rejection("diet_violation", f"Ingredients not allowed for a {', '.join(diet_names(deps.diet_mask))} diet: {', '.join(violations)}")
+    return None
+
+
+def avoid_session_duplicates(deps, recipe) -> Optional[Rejection]:
+    # Near-duplicates of recipes already shown in this session are rejected locally
+    if deps.session is not None:
+        duplicate = deps.session.find_duplicate(recipe.recipe_name, recipe.ingredients, recipe.steps)
+        if duplicate:
+            return Rejection("duplicate", f"Too similar to '{duplicate}', suggest a clearly different recipe.")
+    return None
+
+
+DEFAULT_RULES = [require_ingredients, require_complete, respect_diet, avoid_session_duplicates]
+
+
+@dataclass
+class VariantConfig:
+    """Everything that differs between prompt variants; the engine runs any of them."""
+    name: str
+    system_prompt: str
+    # (diet, cuisine, specific_ingredients, available_ingredients) -> user prompt
+    build_prompt: Callable[[str, str, List[str], List[str]], str]
+    rules: List[Callable] = field(default_factory=lambda: list(DEFAULT_RULES))
+    # Fix cosmetic issues locally (repair.py) before the rules run
+    repair: bool = True
+    # "session": exclusion prompt built from recipes shown so far; "messages": replay the previous
+    # conversation; "none": every attempt starts fresh
+    history: str = "session"
+    # Append the last rejection reason to the next prompt
+    retry_feedback: bool = True
+    # Streamed early abort (streaming.py) applies the default rules, so only variants using them stream
+    streaming: bool = True
+    model: Optional[str] = None
+    # Close past recipes retrieved from the store (retrieval.py) and shown in the prompt; 0 disables
+    exemplars: int = 0
+
+
+def agent_prompt(diet: str, cuisine: str, specific_ingredients: List[str], available_ingredients: List[str]) -> str:
+    return f'''
+    **Diet:** {diet}
+    **Cuisine:** {cuisine}
+    **Specific Ingredients:** {", ".join(specific_ingredients)}
+    **Available Ingredients:** {", ".join(available_ingredients)}
+    '''
+
+
+def v10_2_prompt(diet: str, cuisine: str, specific_ingredients: List[str], available_ingredients: List[str]) -> str:
+    return f'''
+    You are an AI Chef tasked with creating recipes based on the specific ingredients and preferences provided by the user. Please ensure that ingredients provided by the user are included in the recipe. Additionally, respect the user's preferences (e.g., vegetarian, no eggs, etc.).
+
+    **Guidelines:**
+    1. Do **not** include any extra ingredients unless absolutely necessary. If you must include additional ingredients, list them separately and explain why they were required.
+    2. If additional ingredients are not needed, innovate using the available ingredients to create a unique recipe.
+    3. Always include all the ingredients provided by the user.
+    4. If new ingredients are added, explain their necessity and ensure they are not part of the provided list.
+    5. Format the steps as follows:
+       - 1. Step description (Time: x min)
+       - 2. Step description (Time: x min)
+       - 3. Step description (Time: x min)
+       Ensure there is no repetition of step numbers and time is only mentioned once for each step.
+    6. Keep the recipe simple, clear, and easy to follow while respecting the user preferences (e.g., vegetarian, no eggs, etc.).
+
+    **Specific Ingredients**: {', '.join(specific_ingredients)}
+    **Available Ingredients**: {', '.join(available_ingredients)}
+    **Diet**: {diet}
+    **Cuisine**: {cuisine}
+
+    Please make sure the recipe is creative, respects the given preferences, and uses the provided ingredients in an innovative way.
+    '''
+
+
+def v14_prompt(diet: str, cuisine: str, specific_ingredients: List[str], available_ingredients: List[str]) -> str:
+    return f'''
+    You are an AI Chef tasked with creating a recipe based on the available ingredients and preferences provided by the user. You do **not** need to use every ingredient given; instead, build a creative and unique recipe by selecting ingredients from the provided list that would work well together. Ensure the recipe respects the user's preferences (e.g., vegetarian, no eggs, etc.).
+
+    **Guidelines:**
+        1. You are free to choose a selection of ingredients from the provided list to create a balanced and innovative recipe.
+        2. You do **not** need to use all of the ingredients in the recipe. Instead, choose the ingredients that complement each other and the user's preferences.
+        3. If new ingredients are added, explain their necessity and ensure they align with the user's preferences (e.g., vegetarian, no eggs, etc.).
+        4. Format the steps as follows:
+        - 1. Step description (Time: x min)
+        - 2. Step description (Time: x min)
+        - 3. Step description (Time: x min)
+        Ensure there is no repetition of step numbers, and time is only mentioned once per step.
+        5. The recipe should be simple, clear, and easy to follow while respecting the user's preferences.
+        6. If any ingredient is not suitable or doesn’t fit with the preferences (e.g., vegetarian, no eggs), explain why and suggest an alternative if needed.
+
+    **Diet**: {diet}
+    **Cuisine**: {cuisine}
+    **Available Ingredients**: {', '.join(available_ingredients)}
+
+    Please ensure that the recipe is creative, respects the given preferences, and uses the provided ingredients in an innovative way. However, feel free to omit ingredients if they don't fit the recipe.
+    '''
+
+
+# Registered variants; agent_v10_2.py and agent_v14.py are the originals of the two legacy ones
+VARIANTS: Dict[str, VariantConfig] = {
+    "agent": VariantConfig(
+        name="agent",
+        system_prompt='''
+        You are an AI Chef creating recipes based on user preferences and available ingredients.
+        Select the best ingredients to craft an innovative, simple, and clear recipe respecting dietary requirements.
+    ''',
+        build_prompt=agent_prompt,
+    ),
+    "v10_2": VariantConfig(
+        name="v10_2",
+        system_prompt=(
+            "You are an AI Chef tasked with creating recipes based on the specific ingredients and preferences provided by the user. Please ensure that most of ingredients provided by the user are included in the recipe. Additionally, respect the user's preferences (e.g., vegetarian, no eggs, etc.). "
+            "**Guidelines:**"
+            "1. Do **not** include any extra ingredients unless absolutely necessary. If you must include additional ingredients, list them separately and explain why they are essential."
+            "2. If additional ingredients are not required, innovate using the available ingredients to create a unique recipe."
+            "3. Always include all the ingredients provided by the user."
+            "4. If new ingredients are added, explain their necessity and ensure they are not part of the provided list."
+            "5. Format the steps as follows: 1. Step description (Time: x minutes). Only mention time once per step and do not repeat step numbers."
+            "6. Keep the recipe clear, creative, and easy to follow."
+            "Do not repeat the number for each step, and ensure time is only mentioned once per step."
+        ),
+        build_prompt=v10_2_prompt,
+        rules=[require_complete, require_ingredients],
+        repair=False,
+        history="messages",
+        retry_feedback=False,
+        streaming=False,
+    ),
+    "v14": VariantConfig(
+        name="v14",
+        system_prompt='''
+        You are a skilled AI Chef capable of creating unique and creative recipes based on the user's preferences and available ingredients. Your goal is to build a recipe that respects the user's dietary requirements and ingredient list, but you do not have to use all the ingredients provided. Instead, carefully choose the ingredients that will work best together to create a balanced and innovative dish.
+
+        Guidelines:
+            1. Consider the dietary preferences (e.g., vegetarian, vegan, no eggs) when selecting the ingredients for the recipe.
+            2. You can choose any number of ingredients from the available list to craft a unique recipe.
+            3. You do not need to include every ingredient in the recipe. Choose those that complement each other and the given dietary constraints.
+            4. If any ingredients are unsuitable or not ideal for the recipe, explain why and suggest alternatives that fit the dietary needs.
+            5. Ensure the recipe is clear, easy to follow, and visually appealing.
+            6. For each step of the recipe, ensure the instructions are simple and concise with time estimates for each step.
+            7. Avoid repeating steps, and be mindful of the ingredient quantities and instructions.
+
+        Keep the recipe creative, straightforward, and focused on the available ingredients. Do not feel bound to use every ingredient in the list, but instead, build the best possible recipe based on the user's preferences.
+''',
+        build_prompt=v14_prompt,
+        rules=[require_complete, require_ingredients],
+        repair=False,
+        history="none",
+        retry_feedback=False,
+        streaming=False,
+    ),
+}
+# The default variant plus retrieved exemplars, to measure their effect on retries and output length
+VARIANTS["rag"] = replace(VARIANTS["agent"], name="rag", exemplars=2)
+
+DEFAULT_VARIANT = "agent"
+# RECIPE_VARIANT_WEIGHTS="agent=90,v14=10" routes that share of requests to each variant;
+# RECIPE_VARIANT pins one variant (e.g. for a debugging request)
+VARIANT_WEIGHTS = os.getenv("RECIPE_VARIANT_WEIGHTS", "")
+PINNED_VARIANT = os.getenv("RECIPE_VARIANT", "")
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """"agent=90,v14=10" -> {"agent": 90.0, "v14": 10.0}; unknown variants and bad weights are dropped."""
+    weights: Dict[str, float] = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        try:
+            value = float(weight)
+        except ValueError:
+            continue
+        if name in VARIANTS and value > 0:
+            weights[name] = value
+    return weights
+
+
+def choose_variant(request_id: str, spec: str = VARIANT_WEIGHTS, pinned: str = PINNED_VARIANT) -> str:
+    """Pick a variant for a request; the same request ID always lands on the same variant."""
+    if pinned in VARIANTS:
+        return pinned
+    weights = parse_weights(spec)
+    if not weights:
+        return DEFAULT_VARIANT
+    point = zlib.crc32(request_id.encode()) % 10_000 / 10_000 * sum(weights.values())
+    for name, weight in weights.items():
+        point -= weight
+        if point < 0:
+            return name
+    return name
@@ -0,0 +1,169 @@
+import metrics  # imported first so it can time the remaining imports
+import signal
+
+# server.js sends SIGUSR1/SIGUSR2 as soon as the process exists, long before the event loop runs; their
+# default action would kill it. Until LiveTraffic takes over, these only remember whether to start paused.
+_live_traffic = False
+
+
+def _remember_live_traffic(signum, frame) -> None:
+    global _live_traffic
+    _live_traffic = signum == signal.SIGUSR1
+
+
+if hasattr(signal, "SIGUSR1"):
+    signal.signal(signal.SIGUSR1, _remember_live_traffic)
+    signal.signal(signal.SIGUSR2, _remember_live_traffic)
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+
+import failure_analytics
+from agent import get_available_ingredients, logger
+from diet import parse_diet
+from engine import RecipeDetails, activate_variant, get_engine
+from rate_limiter import estimate_tokens
+from recipe_store import get_store
+from repair import log_repair_stats
+from result_channel import build_result, new_ingredients
+from step_timing import recipe_timing
+from variants import DEFAULT_VARIANT, VARIANTS
+
+# python warmup.py [--top 20] [--token-budget 50000] [--rpm 6] [--since-days 7] [--emit]
+#
+# Pre-generates recipes for the most frequent canonical requests (recipe_store.request_counts, recorded by
+# agent.py, job_worker.py and server.js for cache hits). A request that already has a stored recipe costs
+# nothing; the rest are generated one at a time, paced to --rpm, and stored. A generation only starts while
+# the tokens spent plus the costliest generation so far fit in --token-budget, and each is cut off after
+# RECIPE_WARMUP_TIMEOUT seconds. With --emit every warmed request is printed as one result document plus
+# "input", which server.js loads into its response cache.
+#
+# It runs at the lowest CPU priority and never competes with live traffic: server.js sends SIGUSR1 when
+# live requests start and SIGUSR2 when they are done, and no new generation starts in between.
+
+WARMUP_TOP = int(os.getenv("RECIPE_WARMUP_TOP", "20"))
+WARMUP_TOKEN_BUDGET = int(os.getenv("RECIPE_WARMUP_TOKEN_BUDGET", "50000"))
+WARMUP_RPM = float(os.getenv("RECIPE_WARMUP_RPM", "6"))
+# Seconds before a warm-up generation is cancelled and counted as failed
+WARMUP_TIMEOUT = float(os.getenv("RECIPE_WARMUP_TIMEOUT", "120"))
+
+
+class LiveTraffic:
+    """Open while the server is idle; SIGUSR1 closes it, SIGUSR2 opens it again."""
+
+    def __init__(self):
+        self.idle = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        if hasattr(signal, "SIGUSR1"):
+            loop.add_signal_handler(signal.SIGUSR1, self.idle.clear)
+            loop.add_signal_handler(signal.SIGUSR2, self.idle.set)
+        # Signals from here on reach the loop handlers; earlier ones were remembered at import
+        if not _live_traffic:
+            self.idle.set()
+
+    async def wait_idle(self) -> None:
+        if not self.idle.is_set():
+            logger.info("Warm-up paused for live traffic")
+            await self.idle.wait()
+
+
+def emit(request: dict, result: dict) -> None:
+    print(json.dumps({"input": {key: request[key] for key in ("diet", "cuisine", "ingredients")}, **result}), flush=True)
+
+
+async def warm(top: int, token_budget: int, rpm: float, since_days: Optional[float], variant: str, emit_results: bool) -> dict:
+    store = get_store()
+    if store is None:
+        logger.warning("Recipe store is disabled (RECIPE_STORE=0); nothing to warm")
+        return {}
+    activate_variant(variant)
+    engine = get_engine(variant)
+    available = get_available_ingredients("ingredients.xlsx")
+    traffic = LiveTraffic()
+    counts = {"stored": 0, "generated": 0, "failed": 0, "skipped": 0, "tokens": 0}
+    last_start = 0.0
+    # Expected cost of the next generation: the costliest so far, the rate limiter's estimate before the first
+    expected_tokens = estimate_tokens("")
+
+    for number, request in enumerate(store.popular_requests(top, since_days)):
+        diet, cuisine, ingredients = request["diet"], request["cuisine"], request["ingredients"]
+        started = time.perf_counter()
+        matches = store.search(ingredients, parse_diet(diet), cuisine, limit=1)
+        if matches:
+            # Already answerable from the store; only the response cache needs it
+            recipe = RecipeDetails(**matches[0]["recipe"])
+            counts["stored"] += 1
+            if emit_results:
+                emit(request, build_result(
+                    recipe, recipe_timing(recipe.steps, recipe.step_times), new_ingredients(recipe.ingredients, ingredients, available),
+                    None, {"request": time.perf_counter() - started}, variant=variant, request_id="warmup", source="store",
+                ))
+            continue
+        if counts["tokens"] + expected_tokens > token_budget:
+            counts["skipped"] += 1
+            continue
+
+        await traffic.wait_idle()
+        # Pace generations to the warm-up's own request rate, well below what live traffic gets
+        delay = last_start + 60.0 / rpm - time.monotonic() if rpm > 0 else 0.0
+        if delay > 0:
+            await asyncio.sleep(delay)
+            await traffic.wait_idle()
+        last_start = time.monotonic()
+
+        deps = engine.make_deps(diet, cuisine, ingredients, available)
+        # Validation events per warmed request, attempts counted from 1 for each
+        with failure_analytics.track_request(f"warmup-{os.getpid()}-{number}"):
+            try:
+                recipe, usage = await asyncio.wait_for(engine.generate(deps, lambda recipe: True), WARMUP_TIMEOUT or None)
+                spent = usage.total_tokens or 0
+            except asyncio.TimeoutError:
+                logger.warning(f"Warm-up generation timed out after {WARMUP_TIMEOUT:g} s")
+                # The usage of a cancelled run is lost; charge the estimate so the budget still holds
+                recipe, usage, spent = None, None, expected_tokens
+        counts["tokens"] += spent
+        expected_tokens = max(expected_tokens, spent)
+        if recipe is None:
+            counts["failed"] += 1
+            continue
+        store.add(recipe, cuisine)
+        counts["generated"] += 1
+        if emit_results:
+            emit(request, build_result(
+                recipe, recipe_timing(recipe.steps, recipe.step_times), new_ingredients(recipe.ingredients, ingredients, available),
+                usage, {"request": time.perf_counter() - started}, variant=variant, request_id="warmup",
+            ))
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pre-generate recipes for the most frequent requests.")
+    parser.add_argument("--top", type=int, default=WARMUP_TOP, help="how many of the most frequent requests to warm")
+    parser.add_argument("--token-budget", type=int, default=WARMUP_TOKEN_BUDGET, help="stop generating after this many tokens")
+    parser.add_argument("--rpm", type=float, default=WARMUP_RPM, help="at most this many generations per minute")
+    parser.add_argument("--since-days", type=float, default=None, help="only count requests seen in the last N days")
+    parser.add_argument("--variant", default=DEFAULT_VARIANT, choices=sorted(VARIANTS))
+    parser.add_argument("--emit", action="store_true", help="print each warmed request as a JSON result line")
+    args = parser.parse_args(argv)
+
+    # Lowest CPU priority: validation and store writes yield to agent.py processes serving users
+    if hasattr(os, "nice"):
+        os.nice(19)
+    metrics.record_process_start()
+    try:
+        counts = asyncio.run(warm(args.top, args.token_budget, args.rpm, args.since_days, args.variant, args.emit))
+    finally:
+        log_repair_stats()
+    if counts:
+        logger.info(f"Warm-up: {counts['stored']} already stored, {counts['generated']} generated, {counts['failed']} failed, "
+                    f"{counts['skipped']} over budget, {counts['tokens']} tokens")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())